@@ -1,15 +1,75 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, current_app, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import mysql.connector
+from mysql.connector import errorcode
 import os
+import io
+import csv
+import json
+import itertools
+import base64
+import hashlib
+import threading
+import time
+import random
+import functools
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from database import get_connection as get_db_connection
+from datetime import datetime, timedelta, timezone
+from database import get_connection, get_pool_stats, configurar_pool, cerrar_pool, verificar_conexion
+from consultas import (
+    SQL_DISPONIBILIDAD, SQL_CUOTA_ESTUDIANTE, SQL_EDIFICIO_POR_FACULTAD, SQL_TURNOS, SQL_SALAS,
+    sql_ocupacion, sql_turnos_ocupados, sql_slots_activos, sql_reservas_participante, sql_cuota_participantes, filtros_reservas,
+)
+from cache import CacheTTL, CacheGeneracional
+from resumenes import aplicar_reservas, aplicar_sanciones
+from metricas import instrumentar_app, instrumentar_conexiones, exportar_prometheus
+from eventos import BusEventos, evento_reserva
+from sanciones import IndiceSanciones
+from tareas import TareaPeriodica
+import cierre
+from asistencia import ColaAsistencias
+from ocupacion import IndiceOcupacion
+import importacion
 
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
+api = Blueprint('api', __name__)
+
+get_db_connection = instrumentar_conexiones(get_connection)
+
+# Las escrituras de reservas actualizan filas de resumen compartidas (ver
+# resumenes.py) y pueden chocar en un deadlock. InnoDB revierte entonces la
+# transacción completa, así que el endpoint se vuelve a ejecutar desde el
+# principio hasta DEADLOCK_REINTENTOS veces.
+DEADLOCK_REINTENTOS = int(os.getenv('DEADLOCK_REINTENTOS', '3'))
+deadlocks = {'reintentos': 0, 'agotados': 0}
+
+def es_deadlock(error):
+    return isinstance(error, mysql.connector.Error) and error.errno == errorcode.ER_LOCK_DEADLOCK
+
+def reintentar_deadlock(vista):
+    """Reintenta la vista si su transacción terminó en deadlock (la vista debe relanzarlo)."""
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        for intento in range(DEADLOCK_REINTENTOS + 1):
+            try:
+                return vista(*args, **kwargs)
+            except mysql.connector.Error as e:
+                if not es_deadlock(e):
+                    raise
+                if intento < DEADLOCK_REINTENTOS:
+                    deadlocks['reintentos'] += 1
+                    # Espera corta al azar para no volver a chocar con la otra transacción
+                    time.sleep(random.uniform(0.01, 0.05) * (intento + 1))
+        deadlocks['agotados'] += 1
+        return jsonify({'success': False, 'error': 'Conflicto con otra operación simultánea, reintente'}), 503
+    return envoltura
+
+# Se activa al empezar el apagado: /api/ready pasa a responder 503
+apagando = threading.Event()
+
+# Segundos durante los que un chequeo exitoso de la base se reutiliza en los health checks
+HEALTH_DB_TTL = float(os.getenv('HEALTH_DB_TTL', '10'))
 
 
 
@@ -25,7 +85,7 @@ def obtener_rol_por_email(email):
     - @docentes.ucu.edu.uy → Docente
     """
     email_lower = email.lower()
-    
+
     if '@docentes.ucu.edu.uy' in email_lower:
         return 'docente', 'docente'
     elif '@postgrado.ucu.edu.uy' in email_lower:
@@ -41,7 +101,7 @@ def obtener_rol_por_email(email):
 # ENDPOINTS BASE
 # ============================================
 
-@app.route('/')
+@api.route('/')
 def home():
     return jsonify({
         'message': 'API Sistema de Salas - UCU',
@@ -54,29 +114,143 @@ def home():
         }
     })
 
-@app.route('/api/health')
+@api.route('/api/health')
 def health():
+    # No abre una conexión por chequeo: reutiliza el último préstamo exitoso
+    # del pool o, si es viejo, prueba con una conexión del pool
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT DATABASE()")
-        db_name = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        verificar_conexion(HEALTH_DB_TTL)
         return jsonify({
             "database": "connected",
-            "db_name": db_name[0] if db_name else None,
-            "status": "healthy"
+            "db_name": os.getenv("DB_NAME", "ucu_salas"),
+            "status": "healthy",
+            "pool": get_pool_stats()
         })
     except Exception as e:
-        return jsonify({"database": "error", "error": str(e)}), 500
+        return jsonify({"database": "error", "error": str(e), "pool": get_pool_stats()}), 500
+
+
+@api.route('/api/ready')
+def ready():
+    """
+    Indica si esta instancia puede recibir tráfico: no se está apagando, la
+    base responde y el pool no está agotado. /api/health, en cambio, solo
+    informa el estado del proceso y de la base.
+    """
+    pool = get_pool_stats()
+    motivo = None
+    if apagando.is_set():
+        motivo = 'apagando'
+    elif pool['libres'] == 0 and pool['abiertas'] >= pool['size'] + pool['max_overflow']:
+        motivo = 'pool agotado'
+    else:
+        try:
+            verificar_conexion(HEALTH_DB_TTL)
+        except Exception as e:
+            motivo = f'base de datos: {e}'
+    if motivo:
+        return jsonify({'ready': False, 'motivo': motivo}), 503
+    return jsonify({'ready': True})
+
+
+# ============================================
+# CACHE DE CATÁLOGOS
+# ============================================
+# Turnos, salas, edificios, facultades y programas casi no cambian, así que
+# se cachean en memoria. Las respuestas llevan ETag y Last-Modified para que
+# el navegador revalide y reciba 304 sin volver a descargar el cuerpo.
+
+catalogo_cache = CacheTTL(
+    ttl=int(os.getenv('CATALOGO_CACHE_TTL', '300')),
+    max_entradas=32
+)
+
+def obtener_catalogo(nombre, cargar):
+    """
+    Devuelve la entrada cacheada del catálogo (datos, cuerpo JSON, ETag y
+    fecha de modificación). Si no está en cache la arma con cargar().
+    """
+    def armar():
+        datos = cargar()
+        cuerpo = current_app.json.dumps({'success': True, 'data': datos}).encode('utf-8')
+        return {
+            'datos': datos,
+            'cuerpo': cuerpo,
+            'etag': hashlib.sha1(cuerpo).hexdigest(),
+            'modificado': datetime.now(timezone.utc).replace(microsecond=0)
+        }
+    return catalogo_cache.obtener_o_cargar(nombre, armar)
+
+def respuesta_catalogo(nombre, cargar):
+    entrada = obtener_catalogo(nombre, cargar)
+    response = current_app.response_class(entrada['cuerpo'], mimetype='application/json')
+    response.set_etag(entrada['etag'])
+    response.last_modified = entrada['modificado']
+    # El navegador puede guardar la respuesta pero debe revalidarla siempre
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@api.route('/api/cache/estadisticas')
+def estadisticas_cache():
+    return jsonify({'success': True, 'data': {
+        'catalogos': catalogo_cache.estadisticas(),
+        'reportes': reportes_cache.estadisticas(),
+        'sanciones': {**indice_sanciones.estadisticas(), 'recarga': tarea_sanciones.estadisticas()},
+        'ocupacion': {**indice_ocupacion.estadisticas(), 'recarga': tarea_ocupacion.estadisticas()},
+    }})
+
+
+@api.route('/api/metrics')
+def metricas():
+    """Métricas de peticiones, consultas, pool y cache en formato de texto de Prometheus."""
+    pool = get_pool_stats()
+    cache = catalogo_cache.estadisticas()
+    reportes = reportes_cache.estadisticas()
+    eventos = bus_eventos.estadisticas()
+    cerradas = cierre.estadisticas.como_dict()
+    asistencias = cola_asistencias.estadisticas()
+    extras = [
+        ('db_pool_connections', 'gauge', 'Conexiones del pool por estado',
+         [({'estado': estado}, pool[estado]) for estado in ('abiertas', 'prestadas', 'libres')]),
+        ('db_pool_wait_seconds_total', 'counter', 'Tiempo total esperando una conexión libre',
+         [({}, pool['tiempo_espera_total'])]),
+        ('db_pool_timeouts_total', 'counter', 'Esperas de conexión que vencieron',
+         [({}, pool['timeouts'])]),
+        ('catalog_cache_requests_total', 'counter', 'Consultas al cache de catálogos por resultado',
+         [({'resultado': 'hit'}, cache['hits']), ({'resultado': 'miss'}, cache['misses'])]),
+        ('report_cache_requests_total', 'counter', 'Consultas al cache de reportes por resultado',
+         [({'resultado': resultado}, reportes[resultado]) for resultado in ('hits', 'misses', 'compartidas')]),
+        ('events_subscribers', 'gauge', 'Clientes suscriptos a eventos de reservas',
+         [({}, eventos['suscriptores'])]),
+        ('events_published_total', 'counter', 'Eventos de reservas publicados',
+         [({}, eventos['publicados'])]),
+        ('events_dropped_total', 'counter', 'Eventos descartados por colas llenas',
+         [({}, eventos['descartados'])]),
+        ('reservations_closed_total', 'counter', 'Reservas vencidas cerradas automáticamente',
+         [({'estado': 'finalizada'}, cerradas['finalizadas']),
+          ({'estado': 'sin_asistencia'}, cerradas['sin_asistencia'])]),
+        ('reservations_close_seconds_total', 'counter', 'Tiempo total del cierre automático de reservas',
+         [({}, cerradas['segundos'])]),
+        ('checkins_total', 'counter', 'Registros de asistencia por resultado',
+         [({'resultado': resultado}, asistencias[resultado])
+          for resultado in ('recibidos', 'escritos', 'ignorados', 'rechazados')]),
+        ('checkins_pending', 'gauge', 'Registros de asistencia sin escribir',
+         [({}, asistencias['pendientes'])]),
+        ('checkins_batches_total', 'counter', 'Lotes de asistencias escritos',
+         [({}, asistencias['lotes'])]),
+        ('checkins_write_seconds_total', 'counter', 'Tiempo total escribiendo lotes de asistencias',
+         [({}, asistencias['segundos_escritura'])]),
+        ('db_deadlock_retries_total', 'counter', 'Escrituras de reservas reintentadas o abandonadas por deadlock',
+         [({'resultado': 'reintento'}, deadlocks['reintentos']), ({'resultado': 'agotado'}, deadlocks['agotados'])]),
+    ]
+    return Response(exportar_prometheus(extras), mimetype='text/plain; version=0.0.4')
 
 
 # ============================================
 # ENDPOINT DE LOGIN (ROLES POR EMAIL)
 # ============================================
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
 def login():
     """
     Endpoint de login que asigna el rol según el dominio del email.
@@ -85,33 +259,32 @@ def login():
     try:
         data = request.get_json()
         email = data.get('email')
-        
+
         if not email:
             return jsonify({'success': False, 'error': 'Email requerido'}), 400
-        
+
         # Determinar rol y tipo por email
         rol, tipo = obtener_rol_por_email(email)
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Buscar usuario en la BD
-        query = """
-            SELECT l.correo, l.ci_participante, p.nombre, p.apellido
-            FROM login l
-            JOIN participante p ON l.ci_participante = p.ci
-            WHERE l.correo = %s
-            LIMIT 1
-        """
-        cursor.execute(query, (email,))
-        user = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            # Buscar usuario en la BD
+            query = """
+                SELECT l.correo, l.ci_participante, p.nombre, p.apellido
+                FROM login l
+                JOIN participante p ON l.ci_participante = p.ci
+                WHERE l.correo = %s
+                LIMIT 1
+            """
+            cursor.execute(query, (email,))
+            user = cursor.fetchone()
+
+            cursor.close()
+
         if not user:
             return jsonify({'success': False, 'error': 'Usuario no encontrado en el sistema'}), 404
-        
+
         # Construir respuesta
         return jsonify({
             'success': True,
@@ -125,7 +298,7 @@ def login():
                 'tipo_usuario': tipo
             }
         })
-        
+
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -135,179 +308,429 @@ def login():
 # ENDPOINTS PARA SALAS
 # ============================================
 
-@app.route('/api/salas', methods=['GET'])
-def get_salas():
-    try:
-        conn = get_db_connection()
+def cargar_salas():
+    with get_db_connection() as conn:
         cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                s.nombre_sala,
-                s.edificio,
-                s.capacidad,
-                s.tipo_sala,
-                e.direccion,
-                e.departamento
-            FROM sala s
-            LEFT JOIN edificio e
-                ON s.edificio = e.nombre_edificio
-            ORDER BY s.edificio, s.nombre_sala
-        """
-        
-        cursor.execute(query)
+
+        cursor.execute(SQL_SALAS)
         salas = cursor.fetchall()
         cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': salas})
+    return salas
+
+
+@api.route('/api/salas', methods=['GET'])
+def get_salas():
+    try:
+        return respuesta_catalogo('salas', cargar_salas)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/salas', methods=['POST'])
+@api.route('/api/salas', methods=['POST'])
 def crear_sala():
     try:
         data = request.get_json()
-        
+
         required = ['nombre_sala', 'edificio', 'capacidad', 'tipo_sala']
         for field in required:
             if field not in data or data[field] == '':
                 return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            INSERT INTO sala (nombre_sala, edificio, capacidad, tipo_sala)
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            data['nombre_sala'],
-            data['edificio'],
-            data['capacidad'],
-            data['tipo_sala']
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = """
+                INSERT INTO sala (nombre_sala, edificio, capacidad, tipo_sala)
+                VALUES (%s, %s, %s, %s)
+            """
+            cursor.execute(query, (
+                data['nombre_sala'],
+                data['edificio'],
+                data['capacidad'],
+                data['tipo_sala']
+            ))
+
+            conn.commit()
+            cursor.close()
+
+        catalogo_cache.invalidar('salas')
         return jsonify({'success': True, 'message': 'Sala creada correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/salas/<nombre_sala>/<edificio>', methods=['PUT'])
+@api.route('/api/salas/<nombre_sala>/<edificio>', methods=['PUT'])
 def actualizar_sala(nombre_sala, edificio):
     try:
         data = request.get_json()
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            UPDATE sala
-            SET capacidad = %s,
-                tipo_sala = %s
-            WHERE nombre_sala = %s AND edificio = %s
-        """
-        cursor.execute(query, (
-            data.get('capacidad'),
-            data.get('tipo_sala'),
-            nombre_sala,
-            edificio
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = """
+                UPDATE sala
+                SET capacidad = %s,
+                    tipo_sala = %s
+                WHERE nombre_sala = %s AND edificio = %s
+            """
+            cursor.execute(query, (
+                data.get('capacidad'),
+                data.get('tipo_sala'),
+                nombre_sala,
+                edificio
+            ))
+
+            conn.commit()
+            cursor.close()
+
+        catalogo_cache.invalidar('salas')
         return jsonify({'success': True, 'message': 'Sala actualizada correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/salas/<nombre_sala>/<edificio>', methods=['DELETE'])
+@api.route('/api/salas/<nombre_sala>/<edificio>', methods=['DELETE'])
 def eliminar_sala(nombre_sala, edificio):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "DELETE FROM sala WHERE nombre_sala = %s AND edificio = %s"
-        cursor.execute(query, (nombre_sala, edificio))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = "DELETE FROM sala WHERE nombre_sala = %s AND edificio = %s"
+            cursor.execute(query, (nombre_sala, edificio))
+
+            conn.commit()
+            cursor.close()
+
+        catalogo_cache.invalidar('salas')
         return jsonify({'success': True, 'message': 'Sala eliminada correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/salas/verificar-disponibilidad', methods=['POST'])
+@api.route('/api/salas/verificar-disponibilidad', methods=['POST'])
 def verificar_disponibilidad_sala():
     """
     Verifica si una sala está disponible para un turno y fecha específicos
     """
     try:
         data = request.get_json()
-        
+
         required_fields = ['nombre_sala', 'edificio', 'fecha', 'id_turno']
         for field in required_fields:
             if field not in data or not data[field]:
                 return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT COUNT(*) AS total
-            FROM reserva
-            WHERE nombre_sala = %s
-              AND edificio = %s
-              AND fecha = %s
-              AND id_turno = %s
-              AND estado = 'activa'
-        """
-        
-        cursor.execute(query, (data['nombre_sala'], data['edificio'], data['fecha'], data['id_turno']))
-        result = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            cursor.execute(SQL_DISPONIBILIDAD, (data['nombre_sala'], data['edificio'], data['fecha'], data['id_turno']))
+            result = cursor.fetchone()
+            cursor.close()
+
         disponible = result['total'] == 0
-        
+
         return jsonify({
-            'success': True, 
-            'disponible': disponible, 
+            'success': True,
+            'disponible': disponible,
             'message': 'Sala disponible' if disponible else 'Sala ocupada'
         })
-        
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+DISPONIBILIDAD_MAX_DIAS = int(os.getenv('DISPONIBILIDAD_MAX_DIAS', '31'))
+
+@api.route('/api/salas/disponibilidad', methods=['GET'])
+def grilla_disponibilidad():
+    """
+    Devuelve la ocupación de todas las salas en un rango de fechas, en una
+    sola consulta agrupada. Parámetros: desde, hasta (YYYY-MM-DD) y
+    opcionalmente edificio y tipo_sala.
+
+    Cada sala trae una lista 'ocupacion' con un entero por día del rango:
+    el bit i vale 1 si el turno con id_turno = i está reservado ese día.
+    """
+    try:
+        try:
+            desde = datetime.strptime(request.args.get('desde', ''), '%Y-%m-%d').date()
+            hasta = datetime.strptime(request.args.get('hasta', ''), '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Parámetros desde y hasta requeridos (YYYY-MM-DD)'}), 400
+
+        dias = (hasta - desde).days + 1
+        if dias < 1 or dias > DISPONIBILIDAD_MAX_DIAS:
+            return jsonify({'success': False, 'error': f'El rango debe tener entre 1 y {DISPONIBILIDAD_MAX_DIAS} días'}), 400
+
+        edificio = request.args.get('edificio')
+        tipo_sala = request.args.get('tipo_sala')
+
+        filtros = ""
+        params = [desde, hasta]
+        if edificio:
+            filtros += " AND s.edificio = %s"
+            params.append(edificio)
+        if tipo_sala:
+            filtros += " AND s.tipo_sala = %s"
+            params.append(tipo_sala)
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            cursor.execute(sql_turnos_ocupados(filtros), params)
+            ocupados = {
+                (row['nombre_sala'], row['edificio'], row['fecha']): int(row['ocupados'])
+                for row in cursor.fetchall()
+            }
+            cursor.close()
+
+        # Salas y turnos salen del catálogo cacheado, sin otra consulta
+        fechas = [desde + timedelta(days=i) for i in range(dias)]
+        salas = []
+        for sala in obtener_catalogo('salas', cargar_salas)['datos']:
+            if edificio and sala['edificio'] != edificio:
+                continue
+            if tipo_sala and sala['tipo_sala'] != tipo_sala:
+                continue
+            salas.append({
+                'nombre_sala': sala['nombre_sala'],
+                'edificio': sala['edificio'],
+                'tipo_sala': sala['tipo_sala'],
+                'capacidad': sala['capacidad'],
+                'ocupacion': [ocupados.get((sala['nombre_sala'], sala['edificio'], f), 0) for f in fechas]
+            })
+
+        turnos = obtener_catalogo('turnos', cargar_turnos)['datos']
+
+        return jsonify({
+            'success': True,
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'dias': [f.isoformat() for f in fechas],
+            'turnos': [t['id_turno'] for t in turnos],
+            'salas': salas
+        })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 
 # ============================================
-# ENDPOINTS DE TURNOS
+# EVENTOS DE RESERVAS EN VIVO (SERVER-SENT EVENTS)
 # ============================================
+# Las altas, cambios de estado y bajas de reservas se publican en un bus en
+# memoria después del commit. Cada cliente suscripto (por ejemplo la grilla
+# de disponibilidad) recibe por SSE los eventos de su edificio y rango de
+# fechas, sin volver a consultar la base. El bus es por proceso: con varios
+# workers cada stream recibe los cambios hechos a través de su worker.
+
+EVENTOS_MAX_COLA = int(os.getenv('EVENTOS_MAX_COLA', '100'))
+# Cada cuánto se manda un comentario para mantener viva la conexión
+EVENTOS_HEARTBEAT = float(os.getenv('EVENTOS_HEARTBEAT', '15'))
+# Duración máxima de un stream; el navegador se reconecta solo. Siempre
+# menor que GRACEFUL_TIMEOUT, para que un apagado no espere a un stream abierto
+EVENTOS_DURACION_MAX = min(float(os.getenv('EVENTOS_DURACION_MAX', '300')),
+                           max(1.0, float(os.getenv('GRACEFUL_TIMEOUT', '30')) - 5))
+
+# El tope de streams lo fija create_app() según los hilos del worker
+bus_eventos = BusEventos(max_suscriptores=0, max_eventos=EVENTOS_MAX_COLA)
+
+def max_suscriptores_eventos(hilos):
+    """
+    Cada stream retiene un hilo del servidor mientras dura, así que se
+    permiten a lo sumo la mitad de los hilos del worker (o
+    EVENTOS_MAX_SUSCRIPTORES, sin pasar de hilos - 1) y el resto queda
+    siempre libre para la API.
+    """
+    limite = hilos // 2
+    if os.getenv('EVENTOS_MAX_SUSCRIPTORES'):
+        limite = min(int(os.getenv('EVENTOS_MAX_SUSCRIPTORES')), hilos - 1)
+    return max(0, limite)
 
-@app.route('/api/turnos', methods=['GET'])
-def get_turnos():
+def publicar_reserva(tipo, reserva, estado, estado_anterior=None):
+    """
+    Publica el evento de una reserva ya confirmada (después del commit), lo
+    aplica al índice de ocupación de la búsqueda de salas libres e invalida
+    los reportes cacheados.
+    """
+    evento = evento_reserva(
+        tipo, reserva['id_reserva'], reserva['nombre_sala'], reserva['edificio'],
+        reserva['fecha'], reserva['id_turno'], estado, estado_anterior
+    )
+    indice_ocupacion.aplicar(evento)
+    invalidar_reportes()
+    bus_eventos.publicar(evento)
+
+@api.route('/api/eventos/reservas')
+def eventos_reservas():
+    """
+    Stream SSE con los eventos de reservas. Parámetros opcionales: edificio y
+    fecha, o desde y hasta (YYYY-MM-DD). Tipos de evento: creada, estado,
+    cancelada, eliminada y resync (el cliente perdió eventos y debe volver a
+    pedir la grilla).
+    """
+    try:
+        desde = request.args.get('desde') or request.args.get('fecha')
+        hasta = request.args.get('hasta') or request.args.get('fecha')
+        for valor in (desde, hasta):
+            if valor:
+                datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Fechas inválidas (YYYY-MM-DD)'}), 400
+
+    suscripcion = bus_eventos.suscribir(request.args.get('edificio'), desde, hasta)
+    if suscripcion is None:
+        return jsonify({'success': False, 'error': 'Demasiados clientes conectados, reintente más tarde'}), 503
+
+    def generar():
+        fin = time.monotonic() + EVENTOS_DURACION_MAX
+        try:
+            yield 'retry: 3000\n\n'
+            while not suscripcion.cerrada and time.monotonic() < fin:
+                eventos = suscripcion.esperar(EVENTOS_HEARTBEAT)
+                if not eventos:
+                    yield ': ping\n\n'
+                for evento in eventos:
+                    cuerpo = json.dumps(evento, ensure_ascii=False)
+                    yield f"id: {evento.get('id', '')}\nevent: {evento['tipo']}\ndata: {cuerpo}\n\n"
+        finally:
+            bus_eventos.desuscribir(suscripcion)
+
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Evita que un proxy (nginx) acumule el stream
+        'X-Accel-Buffering': 'no',
+    })
+
+
+
+# ============================================
+# BÚSQUEDA DE SALAS LIBRES
+# ============================================
+# La ocupación de los próximos OCUPACION_DIAS días se mantiene en memoria
+# (ocupacion.py): se carga al iniciar, se actualiza con cada evento de
+# reserva de este proceso y se recarga cada OCUPACION_RECARGA segundos para
+# ver las reservas hechas en otros procesos. La búsqueda es orientativa: al
+# reservar, la disponibilidad la sigue garantizando la base.
+
+OCUPACION_DIAS = int(os.getenv('OCUPACION_DIAS', '60'))
+OCUPACION_RECARGA = float(os.getenv('OCUPACION_RECARGA', '60'))
+BUSQUEDA_MAX_DIAS = int(os.getenv('BUSQUEDA_MAX_DIAS', '14'))
+BUSQUEDA_LIMITE_MAXIMO = 100
+
+indice_ocupacion = IndiceOcupacion(dias=OCUPACION_DIAS)
+
+def recargar_ocupacion():
+    with get_db_connection() as conn:
+        indice_ocupacion.recargar(conn)
+
+tarea_ocupacion = TareaPeriodica('ocupacion', OCUPACION_RECARGA, recargar_ocupacion)
+
+def tipos_sala_permitidos(rol, tipo_usuario):
+    """Tipos de sala que puede reservar cada rol (mismas reglas que crear_reserva)."""
+    if rol == 'docente':
+        return {'libre', 'posgrado', 'docente'}
+    if tipo_usuario == 'posgrado':
+        return {'libre', 'posgrado'}
+    return {'libre'}
+
+@api.route('/api/salas/buscar', methods=['GET'])
+def buscar_salas_libres():
+    """
+    Busca los próximos slots libres para un usuario, sin consultar la base.
+    Parámetros: email (define qué tipos de sala puede reservar), personas
+    (capacidad mínima, 1 por defecto), fecha o desde/hasta (YYYY-MM-DD, por
+    defecto hoy), hora_desde y hora_hasta (HH:MM, ventana horaria), edificio,
+    tipo_sala y limite (20 por defecto).
+
+    Los resultados van ordenados por fecha y hora de inicio y, dentro de un
+    mismo turno, por la sala más chica que alcanza.
+    """
     try:
-        conn = get_db_connection()
+        email = request.args.get('email')
+        if not email:
+            return jsonify({'success': False, 'error': 'Parámetro requerido: email'}), 400
+        try:
+            hoy = datetime.now().date()
+            desde = datetime.strptime(request.args.get('desde') or request.args.get('fecha') or hoy.isoformat(), '%Y-%m-%d').date()
+            hasta = datetime.strptime(request.args.get('hasta') or request.args.get('fecha') or desde.isoformat(), '%Y-%m-%d').date()
+            personas = int(request.args.get('personas', 1))
+            limite = min(int(request.args.get('limite', 20)), BUSQUEDA_LIMITE_MAXIMO)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+        desde = max(desde, hoy)
+        if hasta < desde or (hasta - desde).days + 1 > BUSQUEDA_MAX_DIAS:
+            return jsonify({'success': False, 'error': f'El rango debe tener entre 1 y {BUSQUEDA_MAX_DIAS} días a partir de hoy'}), 400
+
+        if not indice_ocupacion.cargado:
+            recargar_ocupacion()
+        if not indice_ocupacion.cubre(desde, hasta):
+            return jsonify({'success': False, 'error': f'Solo se puede buscar en los próximos {OCUPACION_DIAS} días'}), 400
+
+        rol, tipo_usuario = obtener_rol_por_email(email)
+        permitidos = tipos_sala_permitidos(rol, tipo_usuario)
+        tipo_sala = request.args.get('tipo_sala')
+        if tipo_sala:
+            permitidos &= {tipo_sala}
+        edificio = request.args.get('edificio')
+
+        salas = sorted(
+            (s for s in obtener_catalogo('salas', cargar_salas)['datos']
+             if s['tipo_sala'] in permitidos
+             and s['capacidad'] >= personas
+             and (not edificio or s['edificio'] == edificio)),
+            key=lambda s: (s['capacidad'], s['edificio'], s['nombre_sala'])
+        )
+
+        hora_desde = request.args.get('hora_desde', '00:00')
+        hora_hasta = request.args.get('hora_hasta', '23:59')
+        en_ventana = [
+            t for t in obtener_catalogo('turnos', cargar_turnos)['datos']
+            if t['hora_inicio'] >= hora_desde and t['hora_fin'] <= hora_hasta
+        ]
+        ahora = datetime.now().strftime('%H:%M')
+
+        def turnos(fecha):
+            # Hoy solo los turnos que todavía no empezaron
+            return [t for t in en_ventana if fecha != hoy or t['hora_inicio'] > ahora]
+
+        fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+        resultados = [{
+            'nombre_sala': sala['nombre_sala'],
+            'edificio': sala['edificio'],
+            'tipo_sala': sala['tipo_sala'],
+            'capacidad': sala['capacidad'],
+            'fecha': fecha.isoformat(),
+            'id_turno': turno['id_turno'],
+            'hora_inicio': turno['hora_inicio'],
+            'hora_fin': turno['hora_fin'],
+        } for sala, fecha, turno in indice_ocupacion.libres(salas, fechas, turnos, limite)]
+
+        return jsonify({'success': True, 'data': resultados})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+
+# ============================================
+# ENDPOINTS DE TURNOS
+# ============================================
+
+def cargar_turnos():
+    with get_db_connection() as conn:
         cursor = conn.cursor(dictionary=True)
-        
-        query = "SELECT id_turno, TIME_FORMAT(hora_inicio, '%H:%i') as hora_inicio, TIME_FORMAT(hora_fin, '%H:%i') as hora_fin FROM turno ORDER BY hora_inicio"
-        cursor.execute(query)
+
+        cursor.execute(SQL_TURNOS)
         turnos = cursor.fetchall()
-        
+
         cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': turnos})
+    return turnos
+
+
+@api.route('/api/turnos', methods=['GET'])
+def get_turnos():
+    try:
+        return respuesta_catalogo('turnos', cargar_turnos)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -317,41 +740,36 @@ def get_turnos():
 # FUNCIONES AUXILIARES PARA REGLAS DE NEGOCIO
 # ============================================
 
-def obtener_resumen_reservas_ci(conn, ci, fecha_reserva):
+def obtener_resumen_reservas_ci(conn, ci, fecha_reserva, id_turno):
     """
-    Devuelve el total de horas reservadas y la cantidad de reservas activas
-    en la semana de la fecha_reserva, para un participante dado.
-    Se consideran solo salas de uso libre.
+    Devuelve, en una sola consulta, la duración del turno pedido y el consumo
+    de cuota del participante: horas reservadas el día de fecha_reserva y
+    horas y cantidad de reservas activas en su semana (lunes a domingo).
+    Se consideran solo salas de uso libre. Devuelve None si el turno no existe.
     """
     cursor = conn.cursor(dictionary=True)
-    
+
     # Obtener el rango de la semana (lunes a domingo)
     fecha_dt = datetime.strptime(fecha_reserva, '%Y-%m-%d').date()
     inicio_semana = fecha_dt - timedelta(days=fecha_dt.weekday())
     fin_semana = inicio_semana + timedelta(days=6)
-    
-    query = """
-        SELECT 
-            COALESCE(SUM(TIMESTAMPDIFF(HOUR, t.hora_inicio, t.hora_fin)), 0) AS horas_semana,
-            COUNT(*) AS reservas_semana
-        FROM reserva r
-        JOIN turno t ON r.id_turno = t.id_turno
-        JOIN sala s ON r.nombre_sala = s.nombre_sala AND r.edificio = s.edificio
-        WHERE r.fecha BETWEEN %s AND %s
-          AND r.estado = 'activa'
-          AND s.tipo_sala = 'libre'
-          AND r.id_reserva IN (
-              SELECT rp.id_reserva
-              FROM reserva_participante rp
-              WHERE rp.ci_participante = %s
-          )
-    """
-    
-    cursor.execute(query, (inicio_semana, fin_semana, ci))
+
+    cursor.execute(SQL_CUOTA_ESTUDIANTE, {
+        'ci': ci,
+        'fecha': fecha_dt,
+        'inicio_semana': inicio_semana,
+        'fin_semana': fin_semana,
+        'id_turno': id_turno
+    })
     result = cursor.fetchone()
     cursor.close()
-    
+
+    if not result:
+        return None
+
     return {
+        'duracion': float(result['duracion']) if result['duracion'] else 0,
+        'horas_dia': float(result['horas_dia']) if result['horas_dia'] else 0,
         'horas_semana': float(result['horas_semana']) if result['horas_semana'] else 0,
         'reservas_semana': int(result['reservas_semana']) if result['reservas_semana'] else 0
     }
@@ -364,269 +782,1079 @@ def verificar_restricciones_estudiante(conn, ci, fecha, id_turno, tipo_usuario):
     - Máximo 3 reservas activas por semana
     Solo para estudiantes de GRADO y salas de uso libre.
     """
-    cursor = conn.cursor(dictionary=True)
-    
-    # 1) Duración de la nueva reserva
-    query_turno = "SELECT TIMESTAMPDIFF(HOUR, hora_inicio, hora_fin) as duracion FROM turno WHERE id_turno = %s"
-    cursor.execute(query_turno, (id_turno,))
-    turno = cursor.fetchone()
-    
-    if not turno:
-        cursor.close()
+    resumen = obtener_resumen_reservas_ci(conn, ci, fecha, id_turno)
+
+    if resumen is None:
         return False, "Turno no encontrado"
-    
-    # Duración de la nueva reserva en horas (convertir a float si es Decimal)
-    nueva_duracion = float(turno['duracion']) if turno['duracion'] else 0
-    
-    # 2) Total de horas reservadas ese día
-    query_horas_dia = """
-        SELECT 
-            COALESCE(SUM(TIMESTAMPDIFF(HOUR, t.hora_inicio, t.hora_fin)), 0) AS horas_dia
-        FROM reserva r
-        JOIN turno t ON r.id_turno = t.id_turno
-        JOIN sala s ON r.nombre_sala = s.nombre_sala AND r.edificio = s.edificio
-        WHERE r.fecha = %s
-          AND r.estado = 'activa'
-          AND s.tipo_sala = 'libre'
-          AND r.id_reserva IN (
-              SELECT rp.id_reserva
-              FROM reserva_participante rp
-              WHERE rp.ci_participante = %s
-          )
-    """
-    
-    cursor.execute(query_horas_dia, (fecha, ci))
-    result_dia = cursor.fetchone()
-    horas_dia_actuales = float(result_dia['horas_dia']) if result_dia['horas_dia'] else 0
-    
-    if horas_dia_actuales + nueva_duracion > 2:
-        cursor.close()
+
+    # 1) Máximo 2 horas diarias, contando la nueva reserva
+    if resumen['horas_dia'] + resumen['duracion'] > 2:
         return False, "Supera el máximo de 2 horas diarias para estudiantes de grado en salas de uso libre."
-    
-    # 3) Verificar máximo 3 reservas activas por semana
-    resumen = obtener_resumen_reservas_ci(conn, ci, fecha)
+
+    # 2) Máximo 3 reservas activas por semana
     if resumen['reservas_semana'] >= 3:
-        cursor.close()
         return False, "Supera el máximo de 3 reservas activas por semana para estudiantes de grado en salas de uso libre."
-    
-    cursor.close()
+
     return True, "OK"
 
 
+def participantes_reserva(data):
+    """
+    CI de los participantes de una reserva: quien reserva (ci_participante)
+    y los de la lista opcional 'participantes', sin repetir.
+    """
+    otros = data.get('participantes') or []
+    if not isinstance(otros, list) or not all(isinstance(ci, str) and ci.strip() for ci in otros):
+        raise ValueError('participantes debe ser una lista de CI')
+    return list(dict.fromkeys([data['ci_participante']] + [ci.strip() for ci in otros]))
+
+
+def verificar_participantes(conn, participantes, tipo_usuario, fecha, id_turno, tipo_sala):
+    """
+    Verifica en una sola consulta que existan todos los participantes y, en
+    salas de uso libre, los límites de cada estudiante de grado. El rol de
+    quien reserva sale del email del pedido y el de los demás de su email
+    registrado. Devuelve (status, mensaje) del primer error o None.
+    """
+    inicio_semana = fecha - timedelta(days=fecha.weekday())
+    params = {
+        'fecha': fecha,
+        'inicio_semana': inicio_semana,
+        'fin_semana': inicio_semana + timedelta(days=6),
+        'id_turno': id_turno,
+    }
+    params.update({f'ci{i}': ci for i, ci in enumerate(participantes)})
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(sql_cuota_participantes(len(participantes)), params)
+    filas = {fila['ci']: fila for fila in cursor.fetchall()}
+    cursor.close()
+
+    inexistentes = [ci for ci in participantes if ci not in filas]
+    if inexistentes:
+        return 404, f"Participantes inexistentes: {', '.join(inexistentes)}"
+    if filas[participantes[0]]['duracion'] is None:
+        return 404, 'Turno no encontrado'
+    if tipo_sala != 'libre':
+        return None
+
+    for ci in participantes:
+        fila = filas[ci]
+        tipo = tipo_usuario if ci == participantes[0] else obtener_rol_por_email(fila['email'])[1]
+        if tipo != 'grado':
+            continue
+        if float(fila['horas_dia']) + float(fila['duracion']) > 2:
+            return 403, f"{ci} supera el máximo de 2 horas diarias para estudiantes de grado en salas de uso libre."
+        if int(fila['reservas_semana']) >= 3:
+            return 403, f"{ci} supera el máximo de 3 reservas activas por semana para estudiantes de grado en salas de uso libre."
+    return None
+
+
+# ============================================
+# EXPORTACIÓN EN STREAMING (NDJSON / CSV)
+# ============================================
+# Con ?format=ndjson o ?format=csv los reportes y el historial de reservas
+# se envían a medida que se leen de MySQL: el cursor no usa buffer y las
+# filas se traen de a lotes, así la memoria no crece con la cantidad de filas.
+
+FORMATOS_EXPORTACION = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORTACION_LOTE = int(os.getenv('EXPORTACION_LOTE', '1000'))
+
+def valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, timedelta):
+        # Las columnas TIME llegan como timedelta
+        return str(valor)
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return valor
+
+def exportar_consulta(nombre, query, params, formato):
+    """Devuelve una respuesta que transmite el resultado de la consulta en el formato pedido."""
+    def generar():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()  # sin buffer: las filas se leen del socket a medida
+            cursor.execute(query, params)
+            columnas = cursor.column_names
+
+            if formato == 'csv':
+                salida = io.StringIO()
+                escritor = csv.writer(salida)
+                escritor.writerow(columnas)
+                yield salida.getvalue()
+            else:
+                yield ''
+
+            while True:
+                filas = cursor.fetchmany(EXPORTACION_LOTE)
+                if not filas:
+                    break
+                if formato == 'csv':
+                    salida = io.StringIO()
+                    escritor = csv.writer(salida)
+                    escritor.writerows([valor_csv(v) for v in fila] for fila in filas)
+                    yield salida.getvalue()
+                else:
+                    yield ''.join(current_app.json.dumps(dict(zip(columnas, fila))) + '\n' for fila in filas)
+            cursor.close()
+
+    filas = generar()
+    # Ejecutar la consulta antes de responder, para que un error se devuelva
+    # como 500 y no como un archivo cortado
+    primero = next(filas)
+
+    extension = 'csv' if formato == 'csv' else 'ndjson'
+    return Response(
+        stream_with_context(itertools.chain([primero], filas)),
+        mimetype=FORMATOS_EXPORTACION[formato],
+        headers={'Content-Disposition': f'attachment; filename={nombre}.{extension}'}
+    )
+
+def formato_exportacion():
+    """Formato de exportación pedido con ?format=, o None para la respuesta JSON habitual."""
+    formato = request.args.get('format')
+    return formato if formato in FORMATOS_EXPORTACION else None
+
+# Los resultados de los reportes se cachean por nombre y parámetros hasta la
+# próxima escritura que los afecta en este proceso (las que llaman a
+# invalidar_reportes), o a lo sumo REPORTES_CACHE_TTL segundos para las
+# escrituras de otros workers y las asistencias.
+reportes_cache = CacheGeneracional(
+    ttl=int(os.getenv('REPORTES_CACHE_TTL', '60')),
+    max_entradas=int(os.getenv('REPORTES_CACHE_MAX', '256'))
+)
+
+def invalidar_reportes():
+    reportes_cache.nueva_generacion()
+
+def ejecutar_reporte(nombre, query, params=()):
+    formato = formato_exportacion()
+    if formato:
+        return exportar_consulta(nombre, query, params, formato)
+
+    def cargar():
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(query, params)
+            data = cursor.fetchall()
+            cursor.close()
+        return current_app.json.dumps({'success': True, 'data': data}).encode('utf-8')
+
+    cuerpo = reportes_cache.obtener_o_cargar((nombre, tuple(params)), cargar)
+    return current_app.response_class(cuerpo, mimetype='application/json')
+
+
 
 # ============================================
 # ENDPOINTS DE RESERVAS
 # ============================================
 
-@app.route('/api/reservas', methods=['GET'])
+ESTADOS_RESERVA = ('activa', 'cancelada', 'sin_asistencia', 'finalizada')
+RESERVAS_LIMITE_DEFECTO = 50
+RESERVAS_LIMITE_MAXIMO = 500
+# Cantidad máxima de slots en una reserva en lote (un semestre semanal son ~15)
+LOTE_MAX_SLOTS = int(os.getenv('LOTE_MAX_SLOTS', '100'))
+
+def codificar_cursor(fecha, hora_inicio, id_reserva):
+    """Cursor opaco con la clave de orden (fecha, hora_inicio, id_reserva) de la última fila."""
+    crudo = json.dumps([fecha.isoformat(), hora_inicio, id_reserva])
+    return base64.urlsafe_b64encode(crudo.encode('utf-8')).decode('ascii')
+
+def decodificar_cursor(cursor_str):
+    fecha, hora_inicio, id_reserva = json.loads(base64.urlsafe_b64decode(cursor_str.encode('ascii')))
+    return datetime.strptime(fecha, '%Y-%m-%d').date(), str(hora_inicio), int(id_reserva)
+
+def pagina_reservas(reservas, limite, columna_fecha):
+    """
+    Respuesta de una página de GET /api/reservas. reservas trae hasta limite+1
+    filas; la fila extra indica que hay más y el cursor sale de la última
+    fila devuelta (columna_fecha y hora_orden, que no se envían).
+    """
+    hay_mas = len(reservas) > limite
+    reservas = reservas[:limite]
+    siguiente = None
+    if hay_mas:
+        ultima = reservas[-1]
+        siguiente = codificar_cursor(ultima[columna_fecha], ultima['hora_orden'], ultima['id_reserva'])
+    for reserva in reservas:
+        del reserva['hora_orden']
+        reserva.pop('fecha_orden', None)
+
+    return jsonify({
+        'success': True,
+        'data': reservas,
+        'paginacion': {'limite': limite, 'siguiente_cursor': siguiente}
+    })
+
+
+@api.route('/api/reservas', methods=['GET'])
 def get_reservas():
+    """
+    Lista reservas con filtros opcionales (desde, hasta, estado, edificio, sala).
+    Con ci_participante, solo las reservas de ese participante. Paginado por
+    cursor (keyset) sobre (fecha DESC, hora_inicio, id_reserva). Parámetros:
+    limite y cursor; la respuesta trae paginacion.siguiente_cursor mientras
+    haya más páginas.
+    """
     try:
         # Verificar si se solicita filtrar por CI
         ci_filtro = request.args.get('ci_participante')
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        if ci_filtro:
-            # Obtener solo las reservas del participante específico
-            query = """
-                SELECT 
+        estado = request.args.get('estado')
+        if estado and estado not in ESTADOS_RESERVA:
+            return jsonify({'success': False, 'error': f'Estado inválido: {estado}'}), 400
+        condiciones, params = filtros_reservas(request.args)
+
+        formato = formato_exportacion()
+        if formato:
+            # Historial completo en streaming, sin paginar
+            if ci_filtro:
+                condiciones.insert(0, """r.id_reserva IN (
+                    SELECT rp2.id_reserva FROM reserva_participante rp2
+                    WHERE rp2.ci_participante = %s)""")
+                params.insert(0, ci_filtro)
+            where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+            query = f"""
+                SELECT
                     r.id_reserva,
                     r.nombre_sala,
                     r.edificio,
-                    DATE_FORMAT(r.fecha, '%d/%m/%Y') as fecha,
+                    r.fecha,
                     TIME_FORMAT(t.hora_inicio, '%H:%i') as hora_inicio,
                     TIME_FORMAT(t.hora_fin, '%H:%i') as hora_fin,
                     r.estado,
-                    COUNT(rp.ci_participante) AS cantidad_participantes
+                    (SELECT COUNT(*) FROM reserva_participante rp
+                     WHERE rp.id_reserva = r.id_reserva) AS cantidad_participantes
                 FROM reserva r
                 JOIN turno t ON r.id_turno = t.id_turno
-                LEFT JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
-                WHERE r.id_reserva IN (
-                    SELECT rp2.id_reserva 
-                    FROM reserva_participante rp2 
-                    WHERE rp2.ci_participante = %s
+                {where}
+                ORDER BY r.fecha DESC, t.hora_inicio, r.id_reserva
+            """
+            return exportar_consulta('reservas', query, params, formato)
+
+        # De a una página
+        try:
+            limite = int(request.args.get('limite', RESERVAS_LIMITE_DEFECTO))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limite debe ser un número'}), 400
+        limite = max(1, min(limite, RESERVAS_LIMITE_MAXIMO))
+
+        if request.args.get('cursor'):
+            try:
+                fecha_c, hora_c, id_c = decodificar_cursor(request.args.get('cursor'))
+            except Exception:
+                return jsonify({'success': False, 'error': 'Cursor inválido'}), 400
+            # Continuar después de la última fila de la página anterior
+            condiciones.append("""
+                (r.fecha < %s
+                 OR (r.fecha = %s AND (t.hora_inicio > %s
+                                       OR (t.hora_inicio = %s AND r.id_reserva > %s))))
+            """)
+            params.extend([fecha_c, fecha_c, hora_c, hora_c, id_c])
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            if ci_filtro:
+                # Solo las reservas del participante, con la fecha como DD/MM/YYYY
+                cursor.execute(sql_reservas_participante(condiciones, paginado=True),
+                               [ci_filtro] + params + [limite + 1])
+                reservas = cursor.fetchall()
+                cursor.close()
+                return pagina_reservas(reservas, limite, 'fecha_orden')
+
+            where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+
+            # Primero se elige la página con el orden de la clave y recién
+            # después se cuentan participantes, solo para esas filas.
+            query = f"""
+                SELECT
+                    pagina.id_reserva,
+                    pagina.nombre_sala,
+                    pagina.edificio,
+                    pagina.fecha,
+                    TIME_FORMAT(pagina.hora_inicio, '%H:%i') as hora_inicio,
+                    TIME_FORMAT(pagina.hora_fin, '%H:%i') as hora_fin,
+                    TIME_FORMAT(pagina.hora_inicio, '%H:%i:%s') as hora_orden,
+                    pagina.estado,
+                    (SELECT COUNT(*) FROM reserva_participante rp
+                     WHERE rp.id_reserva = pagina.id_reserva) AS cantidad_participantes
+                FROM (
+                    SELECT r.id_reserva, r.nombre_sala, r.edificio, r.fecha,
+                           t.hora_inicio, t.hora_fin, r.estado
+                    FROM reserva r
+                    JOIN turno t ON r.id_turno = t.id_turno
+                    {where}
+                    ORDER BY r.fecha DESC, t.hora_inicio, r.id_reserva
+                    LIMIT %s
+                ) pagina
+                ORDER BY pagina.fecha DESC, pagina.hora_inicio, pagina.id_reserva
+            """
+            cursor.execute(query, params + [limite + 1])
+            reservas = cursor.fetchall()
+            cursor.close()
+
+        return pagina_reservas(reservas, limite, 'fecha')
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/reservas', methods=['POST'])
+@reintentar_deadlock
+def crear_reserva():
+    try:
+        data = request.get_json()
+
+        required_fields = ['nombre_sala', 'edificio', 'fecha', 'id_turno', 'ci_participante', 'email']
+        for field in required_fields:
+            if field not in data or not data[field]:
+                return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
+        if not isinstance(data['ci_participante'], str):
+            return jsonify({'success': False, 'error': 'ci_participante debe ser texto'}), 400
+
+        try:
+            fecha = datetime.strptime(data['fecha'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'fecha debe ser YYYY-MM-DD'}), 400
+        try:
+            participantes = participantes_reserva(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        email = data['email']
+        rol, tipo_usuario = obtener_rol_por_email(email)
+
+        with get_db_connection() as conn:
+            # Sanciones desde el índice en memoria, sin consultar la base
+            for ci in participantes:
+                sancion = sancion_vigente(conn, ci, fecha)
+                if sancion:
+                    quien = 'El participante' if ci == data['ci_participante'] else f'El participante {ci}'
+                    return jsonify({'success': False, 'error': f'{quien} está sancionado hasta el {sancion[1]:%d/%m/%Y}'}), 403
+
+            cursor = conn.cursor(dictionary=True)
+
+            # Verificar tipo y capacidad de la sala
+            query_sala = """
+                SELECT tipo_sala, capacidad
+                FROM sala
+                WHERE nombre_sala = %s AND edificio = %s
+            """
+            cursor.execute(query_sala, (data['nombre_sala'], data['edificio']))
+            sala = cursor.fetchone()
+
+            if not sala:
+                cursor.close()
+                return jsonify({'success': False, 'error': 'Sala no encontrada'}), 404
+
+            tipo_sala = sala['tipo_sala']
+
+            if len(participantes) > sala['capacidad']:
+                cursor.close()
+                return jsonify({'success': False, 'error': f"La sala admite hasta {sala['capacidad']} participantes"}), 400
+
+            # Reglas por tipo de usuario y tipo de sala
+            if tipo_sala == 'posgrado' and tipo_usuario != 'posgrado' and rol != 'docente':
+                cursor.close()
+                return jsonify({'success': False, 'error': 'Solo estudiantes de posgrado y docentes pueden reservar esta sala'}), 403
+
+            if tipo_sala == 'docente' and rol != 'docente':
+                cursor.close()
+                return jsonify({'success': False, 'error': 'Solo docentes pueden reservar esta sala'}), 403
+
+            if len(participantes) > 1:
+                # Existencia y límites de todos los participantes en una consulta
+                error = verificar_participantes(conn, participantes, tipo_usuario, fecha, data['id_turno'], tipo_sala)
+                if error:
+                    cursor.close()
+                    return jsonify({'success': False, 'error': error[1]}), error[0]
+
+            # Restricciones de estudiantes de grado en salas de uso libre
+            elif tipo_usuario == 'grado' and tipo_sala == 'libre':
+                ok, msg = verificar_restricciones_estudiante(
+                    conn,
+                    data['ci_participante'],
+                    data['fecha'],
+                    data['id_turno'],
+                    tipo_usuario
                 )
-                GROUP BY 
-                    r.id_reserva, r.nombre_sala, r.edificio, r.fecha,
-                    t.hora_inicio, t.hora_fin, r.estado
-                ORDER BY r.fecha DESC, t.hora_inicio
+                if not ok:
+                    cursor.close()
+                    return jsonify({'success': False, 'error': msg}), 403
+
+            # Crear la reserva. La disponibilidad la garantiza el índice único
+            # uq_reserva_slot_activo: si otra reserva activa ya ocupa el horario
+            # el INSERT falla con clave duplicada, sin bloquear la tabla.
+            query_reserva = """
+                INSERT INTO reserva (nombre_sala, edificio, fecha, id_turno, estado)
+                VALUES (%s, %s, %s, %s, 'activa')
             """
-            cursor.execute(query, (ci_filtro,))
+            try:
+                cursor.execute(query_reserva, (
+                    data['nombre_sala'],
+                    data['edificio'],
+                    data['fecha'],
+                    data['id_turno']
+                ))
+            except mysql.connector.IntegrityError as e:
+                if e.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+                conn.rollback()
+                cursor.close()
+                # Puede anotarse en POST /api/lista-espera en lugar de reintentar
+                return jsonify({'success': False, 'error': 'La sala ya está reservada para ese horario', 'lista_espera': True}), 409
+            id_reserva = cursor.lastrowid
+
+            # Asociar a todos los participantes con un solo INSERT
+            query_reserva_participante = """
+                INSERT INTO reserva_participante (ci_participante, id_reserva, fecha_solicitud_reserva, asistencia)
+                VALUES {valores}
+            """
+            cursor.execute(
+                query_reserva_participante.format(valores=', '.join(['(%s, %s, NOW(), NULL)'] * len(participantes))),
+                [v for ci in participantes for v in (ci, id_reserva)]
+            )
+
+            # Sumar la nueva reserva a los resúmenes de reportes
+            aplicar_reservas(cursor, [id_reserva], 1)
+
+            conn.commit()
+            cursor.close()
+
+        publicar_reserva('creada', {**data, 'id_reserva': id_reserva}, 'activa')
+        return jsonify({
+            'success': True,
+            'message': 'Reserva creada correctamente',
+            'id_reserva': id_reserva,
+            'participantes': len(participantes)
+        })
+
+    except Exception as e:
+        if es_deadlock(e):
+            raise
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/reservas/lote', methods=['POST'])
+@reintentar_deadlock
+def crear_reservas_lote():
+    """
+    Crea varias reservas para un participante en una sola transacción.
+    Los slots se indican con:
+    - slots: lista de {nombre_sala, edificio, fecha, id_turno}, o
+    - nombre_sala, edificio, id_turno y recurrencia: {desde, semanas | hasta,
+      cada (semanas entre reservas, por defecto 1)}.
+    La disponibilidad de todos los slots se verifica con una sola consulta y
+    los libres se insertan juntos. Con todo_o_nada=true, si algún slot falla
+    no se crea ninguno. La respuesta trae el resultado de cada slot.
+    """
+    try:
+        data = request.get_json()
+
+        for field in ('ci_participante', 'email'):
+            if not data.get(field):
+                return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
+        if not isinstance(data['ci_participante'], str):
+            return jsonify({'success': False, 'error': 'ci_participante debe ser texto'}), 400
+
+        try:
+            slots = slots_lote(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if not slots:
+            return jsonify({'success': False, 'error': 'No se indicó ningún slot'}), 400
+        if len(slots) > LOTE_MAX_SLOTS:
+            return jsonify({'success': False, 'error': f'Máximo {LOTE_MAX_SLOTS} slots por lote'}), 400
+
+        rol, tipo_usuario = obtener_rol_por_email(data['email'])
+        todo_o_nada = bool(data.get('todo_o_nada', False))
+        turnos = {t['id_turno'] for t in obtener_catalogo('turnos', cargar_turnos)['datos']}
+
+        resultados = [{**slot, 'fecha': slot['fecha'].isoformat()} for slot in slots]
+
+        with get_db_connection() as conn:
+            sancion = sancion_vigente(conn, data['ci_participante'])
+            if sancion:
+                return jsonify({'success': False, 'error': f'El participante está sancionado hasta el {sancion[1]:%d/%m/%Y}'}), 403
+
+            cursor = conn.cursor(dictionary=True)
+
+            # Tipo de cada sala pedida, en una consulta
+            salas_pedidas = sorted({(s['nombre_sala'], s['edificio']) for s in slots})
+            cursor.execute(
+                "SELECT nombre_sala, edificio, tipo_sala FROM sala WHERE (nombre_sala, edificio) IN ("
+                + ', '.join(['(%s, %s)'] * len(salas_pedidas)) + ")",
+                [v for sala in salas_pedidas for v in sala]
+            )
+            # La colación de MySQL no distingue mayúsculas: cada sala se busca
+            # por su nombre en minúsculas y se sigue con el nombre de la tabla
+            salas = {
+                (f['nombre_sala'].casefold(), f['edificio'].casefold()): f
+                for f in cursor.fetchall()
+            }
+
+            vistos = set()
+            candidatos = []
+            for slot, resultado in zip(slots, resultados):
+                sala = salas.get((slot['nombre_sala'].casefold(), slot['edificio'].casefold()))
+                tipo_sala = sala['tipo_sala'] if sala else None
+                if sala:
+                    resultado.update({'nombre_sala': sala['nombre_sala'], 'edificio': sala['edificio']})
+                    clave = (sala['nombre_sala'], sala['edificio'], slot['fecha'], slot['id_turno'])
+                error = None
+                if tipo_sala is None:
+                    error = 'Sala no encontrada'
+                elif slot['id_turno'] not in turnos:
+                    error = 'Turno no encontrado'
+                elif clave in vistos:
+                    error = 'Slot repetido en el lote'
+                elif sancion_vigente(conn, data['ci_participante'], slot['fecha']):
+                    error = 'El participante está sancionado en esa fecha'
+                elif tipo_sala == 'posgrado' and tipo_usuario != 'posgrado' and rol != 'docente':
+                    error = 'Solo estudiantes de posgrado y docentes pueden reservar esta sala'
+                elif tipo_sala == 'docente' and rol != 'docente':
+                    error = 'Solo docentes pueden reservar esta sala'
+                elif tipo_usuario == 'grado' and tipo_sala == 'libre':
+                    # Los límites diarios y semanales se controlan reserva por reserva
+                    error = 'Los estudiantes de grado no pueden reservar salas de uso libre en lote'
+                if error:
+                    resultado.update({'estado': 'invalido', 'error': error})
+                else:
+                    vistos.add(clave)
+                    candidatos.append((clave, resultado))
+
+            # Disponibilidad de todos los slots en una consulta. FOR UPDATE
+            # bloquea también los huecos del índice, así otra transacción no
+            # puede ocupar estos slots hasta el commit.
+            if candidatos:
+                cursor.execute(
+                    sql_slots_activos(len(candidatos)) + " FOR UPDATE",
+                    [v for clave, _ in candidatos for v in clave]
+                )
+                ocupados = {
+                    (f['nombre_sala'], f['edificio'], f['fecha'], f['id_turno'])
+                    for f in cursor.fetchall()
+                }
+            else:
+                ocupados = set()
+
+            libres = []
+            for clave, resultado in candidatos:
+                if clave in ocupados:
+                    resultado.update({'estado': 'conflicto', 'error': 'La sala ya está reservada para ese horario'})
+                else:
+                    libres.append((clave, resultado))
+
+            fallidos = len(slots) - len(libres)
+            if libres and not (todo_o_nada and fallidos):
+                try:
+                    cursor.executemany(
+                        "INSERT INTO reserva (nombre_sala, edificio, fecha, id_turno, estado) "
+                        "VALUES (%s, %s, %s, %s, 'activa')",
+                        [clave for clave, _ in libres]
+                    )
+                except mysql.connector.IntegrityError as e:
+                    # Solo si otra transacción ocupó un slot entre la verificación y el INSERT
+                    if e.errno != errorcode.ER_DUP_ENTRY:
+                        raise
+                    conn.rollback()
+                    cursor.close()
+                    return jsonify({'success': False, 'error': 'Otro usuario reservó uno de los slots, reintente'}), 409
+
+                # Ids de las reservas creadas: cada slot tiene una sola reserva activa
+                cursor.execute(
+                    sql_slots_activos(len(libres)),
+                    [v for clave, _ in libres for v in clave]
+                )
+                ids = {
+                    (f['nombre_sala'], f['edificio'], f['fecha'], f['id_turno']): f['id_reserva']
+                    for f in cursor.fetchall()
+                }
+                cursor.executemany(
+                    "INSERT INTO reserva_participante (ci_participante, id_reserva, fecha_solicitud_reserva, asistencia) "
+                    "VALUES (%s, %s, NOW(), NULL)",
+                    [(data['ci_participante'], ids[clave]) for clave, _ in libres]
+                )
+                aplicar_reservas(cursor, ids.values(), 1)
+                conn.commit()
+
+                for clave, resultado in libres:
+                    resultado.update({'estado': 'creada', 'id_reserva': ids[clave]})
+                    publicar_reserva('creada', resultado, 'activa')
+            else:
+                for _, resultado in libres:
+                    resultado.update({'estado': 'no_creada', 'error': 'Otro slot del lote falló (todo_o_nada)'})
+                conn.rollback()
+
+            cursor.close()
+
+        creadas = sum(1 for r in resultados if r['estado'] == 'creada')
+        cuerpo = {
+            'success': creadas > 0,
+            'creadas': creadas,
+            'fallidas': len(resultados) - creadas,
+            'resultados': resultados,
+        }
+        if creadas:
+            return jsonify(cuerpo), 200
+        # 409 solo si algún slot estaba ocupado; si todos eran inválidos, 400
+        conflicto = any(r['estado'] == 'conflicto' for r in resultados)
+        return jsonify(cuerpo), 409 if conflicto else 400
+
+    except Exception as e:
+        if es_deadlock(e):
+            raise
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def slots_lote(data):
+    """Lista de slots {nombre_sala, edificio, fecha (date), id_turno} del pedido en lote."""
+    if 'slots' in data:
+        slots = data['slots']
+        if not isinstance(slots, list):
+            raise ValueError('slots debe ser una lista')
+        try:
+            pedidos = [{
+                'nombre_sala': s['nombre_sala'],
+                'edificio': s['edificio'],
+                'fecha': datetime.strptime(s['fecha'], '%Y-%m-%d').date(),
+                'id_turno': int(s['id_turno']),
+            } for s in slots]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cada slot requiere nombre_sala, edificio, fecha (YYYY-MM-DD) e id_turno')
+    else:
+        pedidos = slots_recurrencia(data)
+    if not all(isinstance(s['nombre_sala'], str) and isinstance(s['edificio'], str) for s in pedidos):
+        raise ValueError('nombre_sala y edificio deben ser texto')
+    return pedidos
+
+
+def slots_recurrencia(data):
+    """Slots semanales de una sala a partir de recurrencia {desde, semanas | hasta, cada}."""
+    recurrencia = data.get('recurrencia')
+    if not recurrencia:
+        raise ValueError('Se requiere slots o recurrencia')
+    for field in ('nombre_sala', 'edificio', 'id_turno'):
+        if not data.get(field):
+            raise ValueError(f'Campo requerido: {field}')
+    try:
+        desde = datetime.strptime(recurrencia['desde'], '%Y-%m-%d').date()
+        cada = int(recurrencia.get('cada', 1))
+        if 'semanas' in recurrencia:
+            cantidad = int(recurrencia['semanas'])
         else:
-            # Obtener todas las reservas
+            hasta = datetime.strptime(recurrencia['hasta'], '%Y-%m-%d').date()
+            cantidad = (hasta - desde).days // (7 * cada) + 1
+        id_turno = int(data['id_turno'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('recurrencia requiere desde (YYYY-MM-DD) y semanas o hasta')
+    if cada < 1 or cantidad < 1:
+        raise ValueError('semanas/hasta y cada deben ser positivos')
+    if cantidad > LOTE_MAX_SLOTS:
+        raise ValueError(f'Máximo {LOTE_MAX_SLOTS} slots por lote')
+
+    return [{
+        'nombre_sala': data['nombre_sala'],
+        'edificio': data['edificio'],
+        'fecha': desde + timedelta(weeks=i * cada),
+        'id_turno': id_turno,
+    } for i in range(cantidad)]
+
+
+@api.route('/api/reservas/<int:id_reserva>', methods=['PUT'])
+@reintentar_deadlock
+def actualizar_reserva(id_reserva):
+    try:
+        data = request.get_json()
+
+        estado = data.get('estado', 'activa')
+        if estado not in ESTADOS_RESERVA:
+            return jsonify({'success': False, 'error': f'Estado inválido: {estado}'}), 400
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            # Bloquear la reserva para que el cambio de resúmenes sea consistente
+            cursor.execute(
+                "SELECT id_reserva, nombre_sala, edificio, fecha, id_turno, estado "
+                "FROM reserva WHERE id_reserva = %s FOR UPDATE",
+                (id_reserva,)
+            )
+            anterior = cursor.fetchone()
+
+            # Restar el aporte con el estado anterior y sumarlo con el nuevo
+            aplicar_reservas(cursor, [id_reserva], -1)
+
             query = """
-                SELECT 
-                    r.id_reserva,
-                    r.nombre_sala,
-                    r.edificio,
-                    r.fecha,
-                    TIME_FORMAT(t.hora_inicio, '%H:%i') as hora_inicio,
-                    TIME_FORMAT(t.hora_fin, '%H:%i') as hora_fin,
-                    r.estado,
-                    COUNT(rp.ci_participante) AS cantidad_participantes
-                FROM reserva r
-                JOIN turno t ON r.id_turno = t.id_turno
-                LEFT JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
-                GROUP BY 
-                    r.id_reserva, r.nombre_sala, r.edificio, r.fecha,
-                    t.hora_inicio, t.hora_fin, r.estado
-                ORDER BY r.fecha DESC, t.hora_inicio
+                UPDATE reserva
+                SET estado = %s
+                WHERE id_reserva = %s
             """
-            cursor.execute(query)
-        
-        reservas = cursor.fetchall()
+            try:
+                cursor.execute(query, (estado, id_reserva))
+            except mysql.connector.IntegrityError as e:
+                # Reactivar una reserva cuyo horario ya fue tomado por otra
+                if e.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+                conn.rollback()
+                cursor.close()
+                return jsonify({'success': False, 'error': 'La sala ya está reservada para ese horario'}), 409
+
+            aplicar_reservas(cursor, [id_reserva], 1)
+
+            # Si el slot quedó libre lo ocupa el primero de la lista de espera
+            promovida = None
+            if anterior and anterior['estado'] == 'activa' and estado != 'activa':
+                promovida = promover_lista_espera(conn, anterior)
+
+            conn.commit()
+            cursor.close()
+
+        if anterior and anterior['estado'] != estado:
+            publicar_reserva('cancelada' if estado == 'cancelada' else 'estado', anterior, estado, anterior['estado'])
+        if promovida:
+            publicar_reserva('creada', promovida, 'activa')
+        return jsonify({'success': True, 'message': 'Reserva actualizada correctamente'})
+    except Exception as e:
+        if es_deadlock(e):
+            raise
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/reservas/<int:id_reserva>', methods=['DELETE'])
+@reintentar_deadlock
+def eliminar_reserva(id_reserva):
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            cursor.execute(
+                "SELECT id_reserva, nombre_sala, edificio, fecha, id_turno, estado "
+                "FROM reserva WHERE id_reserva = %s FOR UPDATE",
+                (id_reserva,)
+            )
+            anterior = cursor.fetchone()
+
+            # Restar la reserva de los resúmenes antes de borrarla
+            aplicar_reservas(cursor, [id_reserva], -1)
+
+            # Primero los participantes, que referencian a la reserva
+            cursor.execute("DELETE FROM reserva_participante WHERE id_reserva = %s", (id_reserva,))
+
+            query = "DELETE FROM reserva WHERE id_reserva = %s"
+            cursor.execute(query, (id_reserva,))
+
+            promovida = None
+            if anterior and anterior['estado'] == 'activa':
+                promovida = promover_lista_espera(conn, anterior)
+
+            conn.commit()
+            cursor.close()
+
+        if anterior:
+            publicar_reserva('eliminada', anterior, anterior['estado'], anterior['estado'])
+        if promovida:
+            publicar_reserva('creada', promovida, 'activa')
+        return jsonify({'success': True, 'message': 'Reserva eliminada correctamente'})
+    except Exception as e:
+        if es_deadlock(e):
+            raise
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# Cierre automático de reservas vencidas (ver cierre.py). Cada worker corre
+# la tarea; SKIP LOCKED evita que se bloqueen entre sí.
+CIERRE_INTERVALO = float(os.getenv('CIERRE_INTERVALO', '300'))
+
+def cerrar_reservas_vencidas():
+    with get_db_connection() as conn:
+        resultado = cierre.cerrar_vencidas(conn)
+    if resultado['lotes']:
+        invalidar_reportes()
+
+tarea_cierre = TareaPeriodica('cierre', CIERRE_INTERVALO, cerrar_reservas_vencidas)
+
+
+
+# ============================================
+# ENDPOINTS DE LISTA DE ESPERA
+# ============================================
+# Quien no consigue un slot se anota en lista_espera (migración 006) en vez
+# de volver a consultar la disponibilidad. Cuando una reserva activa se
+# cancela o se elimina, promover_lista_espera() crea en la misma transacción
+# la reserva del primero en orden de llegada que cumpla las reglas.
+
+def motivo_no_elegible(conn, ci, email, slot, tipo_sala):
+    """Motivo por el que ci no puede reservar el slot ahora, o None."""
+    rol, tipo_usuario = obtener_rol_por_email(email)
+    if tipo_sala not in tipos_sala_permitidos(rol, tipo_usuario):
+        return 'No tiene permiso para reservar este tipo de sala'
+    sancion = sancion_vigente(conn, ci, slot['fecha'])
+    if sancion:
+        return f'Sanción vigente hasta el {sancion[1]:%d/%m/%Y}'
+    if tipo_usuario == 'grado' and tipo_sala == 'libre':
+        ok, msg = verificar_restricciones_estudiante(conn, ci, slot['fecha'].isoformat(), slot['id_turno'], tipo_usuario)
+        if not ok:
+            return msg
+    return None
+
+def tipo_de_sala(nombre_sala, edificio):
+    for sala in obtener_catalogo('salas', cargar_salas)['datos']:
+        if sala['nombre_sala'] == nombre_sala and sala['edificio'] == edificio:
+            return sala['tipo_sala']
+    return None
+
+def promover_lista_espera(conn, slot):
+    """
+    Dentro de la transacción que liberó el slot, crea la reserva del primero
+    de la lista de espera que cumple hoy las reglas de reserva (tipo de sala,
+    sanciones y límites de grado). Los que no las cumplen siguen esperando.
+    Devuelve la reserva creada, para publicarla después del commit, o None.
+    """
+    if slot['fecha'] < datetime.now().date():
+        return None
+    clave = (slot['nombre_sala'], slot['edificio'], slot['fecha'], slot['id_turno'])
+    tipo_sala = tipo_de_sala(slot['nombre_sala'], slot['edificio'])
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT id_espera, ci_participante, email
+        FROM lista_espera
+        WHERE nombre_sala = %s AND edificio = %s AND fecha = %s AND id_turno = %s
+          AND estado = 'esperando'
+        ORDER BY id_espera
+        FOR UPDATE
+        """,
+        clave
+    )
+    for espera in cursor.fetchall():
+        if motivo_no_elegible(conn, espera['ci_participante'], espera['email'], slot, tipo_sala):
+            continue
+        try:
+            cursor.execute(
+                "INSERT INTO reserva (nombre_sala, edificio, fecha, id_turno, estado) VALUES (%s, %s, %s, %s, 'activa')",
+                clave
+            )
+        except mysql.connector.IntegrityError as e:
+            # Otra transacción tomó el slot: se revierte solo este INSERT
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            break
+        id_reserva = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO reserva_participante (ci_participante, id_reserva, fecha_solicitud_reserva, asistencia) "
+            "VALUES (%s, %s, NOW(), NULL)",
+            (espera['ci_participante'], id_reserva)
+        )
+        aplicar_reservas(cursor, [id_reserva], 1)
+        cursor.execute(
+            "UPDATE lista_espera SET estado = 'promovida', id_reserva = %s WHERE id_espera = %s",
+            (id_reserva, espera['id_espera'])
+        )
         cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': reservas})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+        return {
+            'id_reserva': id_reserva,
+            'nombre_sala': slot['nombre_sala'],
+            'edificio': slot['edificio'],
+            'fecha': slot['fecha'],
+            'id_turno': slot['id_turno'],
+        }
+    cursor.close()
+    return None
 
 
-@app.route('/api/reservas', methods=['POST'])
-def crear_reserva():
+@api.route('/api/lista-espera', methods=['POST'])
+def anotar_lista_espera():
+    """
+    Anota a un participante en la lista de espera de un slot ocupado. Recibe
+    los mismos campos que POST /api/reservas y devuelve la posición.
+    """
     try:
         data = request.get_json()
-        
+
         required_fields = ['nombre_sala', 'edificio', 'fecha', 'id_turno', 'ci_participante', 'email']
         for field in required_fields:
             if field not in data or not data[field]:
                 return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
-        
-        email = data['email']
-        rol, tipo_usuario = obtener_rol_por_email(email)
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Verificar tipo de sala
-        query_sala = """
-            SELECT tipo_sala
-            FROM sala
-            WHERE nombre_sala = %s AND edificio = %s
-        """
-        cursor.execute(query_sala, (data['nombre_sala'], data['edificio']))
-        sala = cursor.fetchone()
-        
-        if not sala:
-            cursor.close()
-            conn.close()
+        if not isinstance(data['ci_participante'], str):
+            return jsonify({'success': False, 'error': 'ci_participante debe ser texto'}), 400
+
+        try:
+            fecha = datetime.strptime(data['fecha'], '%Y-%m-%d').date()
+            id_turno = int(data['id_turno'])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'fecha debe ser YYYY-MM-DD e id_turno un número'}), 400
+        if fecha < datetime.now().date():
+            return jsonify({'success': False, 'error': 'La fecha ya pasó'}), 400
+
+        tipo_sala = tipo_de_sala(data['nombre_sala'], data['edificio'])
+        if tipo_sala is None:
             return jsonify({'success': False, 'error': 'Sala no encontrada'}), 404
-        
-        tipo_sala = sala['tipo_sala']
-        
-        # Reglas por tipo de usuario y tipo de sala
-        if tipo_sala == 'posgrado' and tipo_usuario != 'posgrado' and rol != 'docente':
-            cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'error': 'Solo estudiantes de posgrado y docentes pueden reservar esta sala'}), 403
-        
-        if tipo_sala == 'docente' and rol != 'docente':
+
+        slot = {'nombre_sala': data['nombre_sala'], 'edificio': data['edificio'], 'fecha': fecha, 'id_turno': id_turno}
+        clave = (data['nombre_sala'], data['edificio'], fecha, id_turno)
+
+        with get_db_connection() as conn:
+            rol, tipo_usuario = obtener_rol_por_email(data['email'])
+            if tipo_sala not in tipos_sala_permitidos(rol, tipo_usuario):
+                return jsonify({'success': False, 'error': 'No tiene permiso para reservar este tipo de sala'}), 403
+            sancion = sancion_vigente(conn, data['ci_participante'], fecha)
+            if sancion:
+                return jsonify({'success': False, 'error': f'El participante está sancionado hasta el {sancion[1]:%d/%m/%Y}'}), 403
+
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(SQL_DISPONIBILIDAD, clave)
+            if cursor.fetchone()['total'] == 0:
+                cursor.close()
+                return jsonify({'success': False, 'error': 'La sala está disponible, puede reservarla directamente', 'disponible': True}), 409
+
+            try:
+                cursor.execute(
+                    """
+                    INSERT INTO lista_espera (nombre_sala, edificio, fecha, id_turno, ci_participante, email)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """,
+                    clave + (data['ci_participante'], data['email'])
+                )
+            except mysql.connector.IntegrityError as e:
+                # uq_lista_espera_activa: ya espera ese slot (migración 006)
+                if e.errno != errorcode.ER_DUP_ENTRY:
+                    raise
+                conn.rollback()
+                cursor.close()
+                return jsonify({'success': False, 'error': 'Ya está en la lista de espera de ese horario'}), 409
+            id_espera = cursor.lastrowid
+            cursor.execute(
+                """
+                SELECT COUNT(*) AS posicion FROM lista_espera
+                WHERE nombre_sala = %s AND edificio = %s AND fecha = %s AND id_turno = %s
+                  AND estado = 'esperando' AND id_espera <= %s
+                """,
+                clave + (id_espera,)
+            )
+            posicion = cursor.fetchone()['posicion']
+            conn.commit()
             cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'error': 'Solo docentes pueden reservar esta sala'}), 403
-        
-        # Restricciones de estudiantes de grado en salas de uso libre
-        if tipo_usuario == 'grado' and tipo_sala == 'libre':
-            ok, msg = verificar_restricciones_estudiante(
-                conn,
-                data['ci_participante'],
-                data['fecha'],
-                data['id_turno'],
-                tipo_usuario
+
+        return jsonify({'success': True, 'id_espera': id_espera, 'posicion': posicion})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/lista-espera', methods=['GET'])
+def get_lista_espera():
+    """Anotaciones de un participante (?ci_participante=), con su posición si sigue esperando."""
+    try:
+        ci = request.args.get('ci_participante')
+        if not ci:
+            return jsonify({'success': False, 'error': 'Parámetro requerido: ci_participante'}), 400
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(
+                """
+                SELECT
+                    le.id_espera,
+                    le.nombre_sala,
+                    le.edificio,
+                    le.fecha,
+                    le.id_turno,
+                    le.estado,
+                    le.id_reserva,
+                    le.fecha_solicitud,
+                    CASE WHEN le.estado = 'esperando' THEN (
+                        SELECT COUNT(*) FROM lista_espera otro
+                        WHERE otro.nombre_sala = le.nombre_sala
+                          AND otro.edificio = le.edificio
+                          AND otro.fecha = le.fecha
+                          AND otro.id_turno = le.id_turno
+                          AND otro.estado = 'esperando'
+                          AND otro.id_espera <= le.id_espera
+                    ) END AS posicion
+                FROM lista_espera le
+                WHERE le.ci_participante = %s AND le.fecha >= CURDATE()
+                ORDER BY le.fecha, le.id_turno
+                """,
+                (ci,)
             )
-            if not ok:
-                cursor.close()
-                conn.close()
-                return jsonify({'success': False, 'error': msg}), 403
-        
-        # Verificar disponibilidad antes de crear
-        query_check = """
-            SELECT COUNT(*) AS total
-            FROM reserva
-            WHERE nombre_sala = %s
-              AND edificio = %s
-              AND fecha = %s
-              AND id_turno = %s
-              AND estado = 'activa'
-        """
-        cursor.execute(query_check, (data['nombre_sala'], data['edificio'], data['fecha'], data['id_turno']))
-        result = cursor.fetchone()
-        
-        if result['total'] > 0:
+            anotaciones = cursor.fetchall()
             cursor.close()
-            conn.close()
-            return jsonify({'success': False, 'error': 'La sala ya está reservada para ese horario'}), 409
-        
-        # Crear la reserva
-        query_reserva = """
-            INSERT INTO reserva (nombre_sala, edificio, fecha, id_turno, estado)
-            VALUES (%s, %s, %s, %s, 'activa')
-        """
-        cursor.execute(query_reserva, (
-            data['nombre_sala'],
-            data['edificio'],
-            data['fecha'],
-            data['id_turno']
-        ))
-        id_reserva = cursor.lastrowid
-        
-        # Asociar participante
-        query_reserva_participante = """
-            INSERT INTO reserva_participante (ci_participante, id_reserva, fecha_solicitud_reserva, asistencia)
-            VALUES (%s, %s, NOW(), NULL)
-        """
-        cursor.execute(query_reserva_participante, (data['ci_participante'], id_reserva))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Reserva creada correctamente', 'id_reserva': id_reserva})
-        
+
+        return jsonify({'success': True, 'data': anotaciones})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reservas/<int:id_reserva>', methods=['PUT'])
-def actualizar_reserva(id_reserva):
+@api.route('/api/lista-espera/<int:id_espera>', methods=['DELETE'])
+def retirar_lista_espera(id_espera):
     try:
-        data = request.get_json()
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            UPDATE reserva
-            SET estado = %s
-            WHERE id_reserva = %s
-        """
-        cursor.execute(query, (data.get('estado', 'activa'), id_reserva))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Reserva actualizada correctamente'})
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE lista_espera SET estado = 'retirada' WHERE id_espera = %s AND estado = 'esperando'",
+                (id_espera,)
+            )
+            retirada = cursor.rowcount
+            conn.commit()
+            cursor.close()
+
+        if not retirada:
+            return jsonify({'success': False, 'error': 'No hay una anotación en espera con ese id'}), 404
+        return jsonify({'success': True, 'message': 'Anotación retirada de la lista de espera'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reservas/<int:id_reserva>', methods=['DELETE'])
-def eliminar_reserva(id_reserva):
+
+# ============================================
+# ENDPOINTS DE ASISTENCIA
+# ============================================
+# Los registros de asistencia en la puerta de las salas llegan en ráfagas al
+# empezar cada turno. Se responden apenas se encolan y un hilo los escribe
+# en lotes (un UPDATE y un commit cada ASISTENCIA_FLUSH_MS milisegundos o
+# ASISTENCIA_FLUSH_FILAS registros). Al apagar se escribe lo pendiente.
+
+ASISTENCIA_MAX_REGISTROS = int(os.getenv('ASISTENCIA_MAX_REGISTROS', '500'))
+
+cola_asistencias = ColaAsistencias(
+    get_db_connection,
+    intervalo_ms=int(os.getenv('ASISTENCIA_FLUSH_MS', '200')),
+    max_filas=int(os.getenv('ASISTENCIA_FLUSH_FILAS', '500')),
+    max_pendientes=int(os.getenv('ASISTENCIA_MAX_PENDIENTES', '10000')),
+)
+
+@api.route('/api/asistencias', methods=['POST'])
+def registrar_asistencias():
+    """
+    Registra la asistencia de uno o varios participantes:
+    {id_reserva, ci_participante} o {registros: [{id_reserva, ci_participante}, ...]}.
+    Responde 202: la escritura es diferida. Los registros de reservas que no
+    están activas o de participantes que no son de la reserva se ignoran.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "DELETE FROM reserva WHERE id_reserva = %s"
-        cursor.execute(query, (id_reserva,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Reserva eliminada correctamente'})
+        data = request.get_json(silent=True) or {}
+        items = data.get('registros', [data]) if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({'success': False, 'error': 'Se requiere id_reserva y ci_participante o registros'}), 400
+        if len(items) > ASISTENCIA_MAX_REGISTROS:
+            return jsonify({'success': False, 'error': f'Máximo {ASISTENCIA_MAX_REGISTROS} registros por petición'}), 400
+
+        registros = []
+        for item in items:
+            try:
+                registro = (int(item['id_reserva']), str(item['ci_participante']).strip())
+            except (KeyError, TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'Cada registro requiere id_reserva y ci_participante'}), 400
+            if not registro[1]:
+                return jsonify({'success': False, 'error': 'Cada registro requiere id_reserva y ci_participante'}), 400
+            registros.append(registro)
+
+        if not cola_asistencias.encolar(registros):
+            return jsonify({'success': False, 'error': 'Demasiados registros pendientes, reintente'}), 503
+        return jsonify({'success': True, 'encolados': len(registros)}), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -636,130 +1864,162 @@ def eliminar_reserva(id_reserva):
 # ENDPOINTS DE PARTICIPANTES
 # ============================================
 
-@app.route('/api/participantes', methods=['GET'])
+@api.route('/api/participantes', methods=['GET'])
 def get_participantes():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT p.ci, p.nombre, p.apellido, p.email
-            FROM participante p
-            ORDER BY p.apellido, p.nombre
-        """
-        cursor.execute(query)
-        participantes = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            query = """
+                SELECT p.ci, p.nombre, p.apellido, p.email
+                FROM participante p
+                ORDER BY p.apellido, p.nombre
+            """
+            cursor.execute(query)
+            participantes = cursor.fetchall()
+
+            cursor.close()
+
         return jsonify({'success': True, 'data': participantes})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/participantes/<ci>', methods=['GET'])
+@api.route('/api/participantes/<ci>', methods=['GET'])
 def get_participante(ci):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT p.ci, p.nombre, p.apellido, p.email
-            FROM participante p
-            WHERE p.ci = %s
-        """
-        cursor.execute(query, (ci,))
-        participante = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            query = """
+                SELECT p.ci, p.nombre, p.apellido, p.email
+                FROM participante p
+                WHERE p.ci = %s
+            """
+            cursor.execute(query, (ci,))
+            participante = cursor.fetchone()
+
+            cursor.close()
+
         if not participante:
             return jsonify({'success': False, 'error': 'Participante no encontrado'}), 404
-        
+
         return jsonify({'success': True, 'data': participante})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/participantes', methods=['POST'])
+@api.route('/api/participantes', methods=['POST'])
 def crear_participante():
     try:
         data = request.get_json()
-        
+
         required = ['ci', 'nombre', 'apellido', 'email']
         for field in required:
             if field not in data or not data[field]:
                 return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            INSERT INTO participante (ci, nombre, apellido, email)
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            data['ci'],
-            data['nombre'],
-            data['apellido'],
-            data['email']
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = """
+                INSERT INTO participante (ci, nombre, apellido, email)
+                VALUES (%s, %s, %s, %s)
+            """
+            cursor.execute(query, (
+                data['ci'],
+                data['nombre'],
+                data['apellido'],
+                data['email']
+            ))
+
+            conn.commit()
+            cursor.close()
+
         return jsonify({'success': True, 'message': 'Participante creado correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/participantes/<ci>', methods=['PUT'])
+@api.route('/api/participantes/importar', methods=['POST'])
+def importar_participantes():
+    """
+    Importación masiva de participantes, logins e inscripciones a programas
+    (ver importacion.py). El archivo se envía como multipart en el campo
+    'archivo' o directamente como cuerpo; el formato (csv, json, ndjson) se
+    toma de ?formato=, de la extensión del archivo o del Content-Type.
+    Las filas con errores se informan sin cancelar la importación.
+    """
+    try:
+        archivo = request.files.get('archivo')
+        if archivo:
+            binario = archivo.stream
+            formato = request.args.get('formato') or importacion.detectar_formato(archivo.filename, archivo.mimetype)
+        else:
+            binario = request.stream
+            formato = request.args.get('formato') or importacion.detectar_formato(content_type=request.content_type)
+        if formato not in importacion.FORMATOS:
+            return jsonify({'success': False, 'error': 'Formato requerido: csv, json o ndjson'}), 400
+
+        try:
+            lote = int(request.args.get('lote', importacion.IMPORTACION_LOTE))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'lote debe ser un entero'}), 400
+
+        with get_db_connection() as conn:
+            try:
+                resultado = importacion.importar(conn, importacion.leer_filas(binario, formato), max(1, lote))
+            except (ValueError, UnicodeDecodeError) as e:
+                return jsonify({'success': False, 'error': f'Archivo inválido: {e}'}), 400
+
+        invalidar_reportes()
+        return jsonify({'success': True, 'data': resultado.como_dict()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/participantes/<ci>', methods=['PUT'])
 def actualizar_participante(ci):
     try:
         data = request.get_json()
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            UPDATE participante
-            SET nombre = %s,
-                apellido = %s,
-                email = %s
-            WHERE ci = %s
-        """
-        cursor.execute(query, (
-            data.get('nombre'),
-            data.get('apellido'),
-            data.get('email'),
-            ci
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = """
+                UPDATE participante
+                SET nombre = %s,
+                    apellido = %s,
+                    email = %s
+                WHERE ci = %s
+            """
+            cursor.execute(query, (
+                data.get('nombre'),
+                data.get('apellido'),
+                data.get('email'),
+                ci
+            ))
+
+            conn.commit()
+            cursor.close()
+
         return jsonify({'success': True, 'message': 'Participante actualizado correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/participantes/<ci>', methods=['DELETE'])
+@api.route('/api/participantes/<ci>', methods=['DELETE'])
 def eliminar_participante(ci):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "DELETE FROM participante WHERE ci = %s"
-        cursor.execute(query, (ci,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = "DELETE FROM participante WHERE ci = %s"
+            cursor.execute(query, (ci,))
+
+            conn.commit()
+            cursor.close()
+
         return jsonify({'success': True, 'message': 'Participante eliminado correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -769,90 +2029,126 @@ def eliminar_participante(ci):
 # ============================================
 # ENDPOINTS DE SANCIONES
 # ============================================
+# Las sanciones vigentes se mantienen en un índice en memoria por CI, para
+# que crear_reserva las verifique sin otra consulta. Se carga al iniciar, se
+# actualiza con cada alta o baja de este proceso y se recarga desde la tabla
+# cada SANCIONES_RECARGA segundos para ver los cambios de otros procesos.
 
-@app.route('/api/sanciones', methods=['GET'])
+SANCIONES_RECARGA = float(os.getenv('SANCIONES_RECARGA', '60'))
+
+indice_sanciones = IndiceSanciones()
+
+def recargar_sanciones():
+    with get_db_connection() as conn:
+        indice_sanciones.recargar(conn)
+
+tarea_sanciones = TareaPeriodica('sanciones', SANCIONES_RECARGA, recargar_sanciones)
+
+def sancion_vigente(conn, ci, *fechas):
+    """(fecha_inicio, fecha_fin) de la sanción que impide reservar, o None."""
+    if not indice_sanciones.cargado:
+        # Primera reserva antes de que termine la carga inicial
+        indice_sanciones.recargar(conn)
+    return indice_sanciones.vigente(ci, *fechas)
+
+
+@api.route('/api/sanciones', methods=['GET'])
 def get_sanciones():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                sp.id_sancion,
-                sp.ci_participante, 
-                p.nombre, 
-                p.apellido, 
-                p.email,
-                sp.fecha_inicio, 
-                sp.fecha_fin,
-                sp.motivo,
-                CASE 
-                    WHEN CURDATE() BETWEEN sp.fecha_inicio AND sp.fecha_fin THEN 'Activa'
-                    ELSE 'Finalizada'
-                END AS estado
-            FROM sancion_participante sp
-            JOIN participante p ON sp.ci_participante = p.ci
-            ORDER BY sp.fecha_inicio DESC
-        """
-        cursor.execute(query)
-        sanciones = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            query = """
+                SELECT
+                    sp.id_sancion,
+                    sp.ci_participante,
+                    p.nombre,
+                    p.apellido,
+                    p.email,
+                    sp.fecha_inicio,
+                    sp.fecha_fin,
+                    sp.motivo,
+                    CASE
+                        WHEN CURDATE() BETWEEN sp.fecha_inicio AND sp.fecha_fin THEN 'Activa'
+                        ELSE 'Finalizada'
+                    END AS estado
+                FROM sancion_participante sp
+                JOIN participante p ON sp.ci_participante = p.ci
+                ORDER BY sp.fecha_inicio DESC
+            """
+            cursor.execute(query)
+            sanciones = cursor.fetchall()
+
+            cursor.close()
+
         return jsonify({'success': True, 'data': sanciones})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/sanciones', methods=['POST'])
+@api.route('/api/sanciones', methods=['POST'])
 def crear_sancion():
     try:
         data = request.get_json()
-        
+
         required = ['ci_participante', 'fecha_inicio', 'fecha_fin']
         for field in required:
             if field not in data or not data[field]:
                 return jsonify({'success': False, 'error': f'Campo requerido: {field}'}), 400
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        motivo = data.get('motivo', 'No asistencia a reserva')
-        
-        query = """
-            INSERT INTO sancion_participante (ci_participante, fecha_inicio, fecha_fin, motivo)
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (
-            data['ci_participante'],
-            data['fecha_inicio'],
-            data['fecha_fin'],
-            motivo
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'message': 'Sanción creada correctamente'})
+        if not isinstance(data['ci_participante'], str):
+            return jsonify({'success': False, 'error': 'ci_participante debe ser texto'}), 400
+
+        try:
+            fecha_inicio = datetime.strptime(data['fecha_inicio'], '%Y-%m-%d').date()
+            fecha_fin = datetime.strptime(data['fecha_fin'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'fecha_inicio y fecha_fin deben ser YYYY-MM-DD'}), 400
+        if fecha_fin < fecha_inicio:
+            return jsonify({'success': False, 'error': 'fecha_fin es anterior a fecha_inicio'}), 400
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            motivo = data.get('motivo', 'No asistencia a reserva')
+
+            query = """
+                INSERT INTO sancion_participante (ci_participante, fecha_inicio, fecha_fin, motivo)
+                VALUES (%s, %s, %s, %s)
+            """
+            cursor.execute(query, (
+                data['ci_participante'],
+                fecha_inicio,
+                fecha_fin,
+                motivo
+            ))
+            id_sancion = cursor.lastrowid
+            aplicar_sanciones(cursor, [id_sancion], 1)
+
+            conn.commit()
+            cursor.close()
+
+        indice_sanciones.agregar(id_sancion, data['ci_participante'], fecha_inicio, fecha_fin)
+        invalidar_reportes()
+        return jsonify({'success': True, 'message': 'Sanción creada correctamente', 'id_sancion': id_sancion})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/sanciones/<int:id_sancion>', methods=['DELETE'])
+@api.route('/api/sanciones/<int:id_sancion>', methods=['DELETE'])
 def eliminar_sancion(id_sancion):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "DELETE FROM sancion_participante WHERE id_sancion = %s"
-        cursor.execute(query, (id_sancion,))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            aplicar_sanciones(cursor, [id_sancion], -1)
+            query = "DELETE FROM sancion_participante WHERE id_sancion = %s"
+            cursor.execute(query, (id_sancion,))
+
+            conn.commit()
+            cursor.close()
+
+        indice_sanciones.quitar(id_sancion)
+        invalidar_reportes()
         return jsonify({'success': True, 'message': 'Sanción eliminada correctamente'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -863,324 +2159,213 @@ def eliminar_sancion(id_sancion):
 # ENDPOINTS DE REPORTES / MÉTRICAS
 # ============================================
 
-@app.route('/api/reportes/salas-mas-reservadas')
+@api.route('/api/reportes/salas-mas-reservadas')
 def reporte_salas_mas_reservadas():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
-                r.nombre_sala,
-                r.edificio,
-                COUNT(*) AS total_reservas
-            FROM reserva r
-            GROUP BY r.nombre_sala, r.edificio
+            SELECT
+                rs.nombre_sala,
+                rs.edificio,
+                CAST(SUM(rs.reservas) AS SIGNED) AS total_reservas
+            FROM resumen_reserva_sala rs
+            GROUP BY rs.nombre_sala, rs.edificio
+            HAVING total_reservas > 0
             ORDER BY total_reservas DESC
             LIMIT 10
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('salas-mas-reservadas', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/turnos-demandados')
+@api.route('/api/reportes/turnos-demandados')
 def reporte_turnos_mas_demandados():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
+            SELECT
                 TIME_FORMAT(t.hora_inicio, '%H:%i') as hora_inicio,
                 TIME_FORMAT(t.hora_fin, '%H:%i') as hora_fin,
-                COUNT(*) AS total_reservas
-            FROM reserva r
-            JOIN turno t ON r.id_turno = t.id_turno
+                CAST(SUM(rs.reservas) AS SIGNED) AS total_reservas
+            FROM resumen_reserva_sala rs
+            JOIN turno t ON rs.id_turno = t.id_turno
             GROUP BY t.hora_inicio, t.hora_fin
+            HAVING total_reservas > 0
             ORDER BY total_reservas DESC
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('turnos-demandados', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/promedio-participantes')
+@api.route('/api/reportes/promedio-participantes')
 def reporte_promedio_participantes_por_sala():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
-                r.nombre_sala,
-                r.edificio,
+            SELECT
+                rs.nombre_sala,
+                rs.edificio,
                 s.capacidad,
-                AVG(subquery.cantidad) AS promedio_participantes
-            FROM reserva r
-            JOIN sala s ON r.nombre_sala = s.nombre_sala AND r.edificio = s.edificio
-            JOIN (
-                SELECT 
-                    rp.id_reserva,
-                    COUNT(*) AS cantidad
-                FROM reserva_participante rp
-                GROUP BY rp.id_reserva
-            ) subquery ON r.id_reserva = subquery.id_reserva
-            GROUP BY r.nombre_sala, r.edificio, s.capacidad
+                SUM(rs.participantes) / SUM(rs.reservas_con_participantes) AS promedio_participantes
+            FROM resumen_reserva_sala rs
+            JOIN sala s ON rs.nombre_sala = s.nombre_sala AND rs.edificio = s.edificio
+            GROUP BY rs.nombre_sala, rs.edificio, s.capacidad
+            HAVING SUM(rs.reservas_con_participantes) > 0
             ORDER BY promedio_participantes DESC
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('promedio-participantes', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/reservas-por-carrera')
+@api.route('/api/reportes/reservas-por-carrera')
 def reporte_reservas_por_carrera_facultad():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
+            SELECT
                 f.nombre AS facultad,
                 pa.nombre_programa AS carrera,
-                COUNT(DISTINCT r.id_reserva) AS total_reservas
-            FROM reserva r
-            JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
-            JOIN participante p ON rp.ci_participante = p.ci
-            JOIN participante_programa_academico ppa ON p.ci = ppa.ci_participante
-            JOIN programa_academico pa ON ppa.nombre_programa = pa.nombre_programa
+                CAST(SUM(rp.reservas) AS SIGNED) AS total_reservas
+            FROM resumen_reserva_programa rp
+            JOIN programa_academico pa ON rp.nombre_programa = pa.nombre_programa
             JOIN facultad f ON pa.id_facultad = f.id_facultad
             GROUP BY f.nombre, pa.nombre_programa
+            HAVING total_reservas > 0
             ORDER BY total_reservas DESC
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('reservas-por-carrera', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/ocupacion-edificios')
+# Rango por defecto y máximo del reporte de ocupación, en días
+OCUPACION_REPORTE_DIAS = int(os.getenv('OCUPACION_REPORTE_DIAS', '30'))
+OCUPACION_REPORTE_MAX_DIAS = min(int(os.getenv('OCUPACION_REPORTE_MAX_DIAS', '366')), 1000)
+
+@api.route('/api/reportes/ocupacion-edificios')
 def reporte_ocupacion_por_edificio():
+    """
+    Porcentaje de horas de turno reservadas sobre las disponibles entre desde
+    y hasta (por defecto los últimos OCUPACION_REPORTE_DIAS días hasta hoy).
+    Con ?por=sala devuelve una fila por sala en lugar de por edificio.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                e.nombre_edificio,
-                COUNT(DISTINCT s.nombre_sala) AS total_salas,
-                COUNT(r.id_reserva) AS total_reservas,
-                ROUND((COUNT(r.id_reserva) / (COUNT(DISTINCT s.nombre_sala) * 15 * 30)) * 100, 2) AS porcentaje
-            FROM edificio e
-            LEFT JOIN sala s ON e.nombre_edificio = s.edificio
-            LEFT JOIN reserva r ON s.nombre_sala = r.nombre_sala AND s.edificio = r.edificio
-            GROUP BY e.nombre_edificio
-            ORDER BY porcentaje DESC
-        """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        try:
+            hasta = datetime.strptime(request.args.get('hasta') or datetime.now().date().isoformat(), '%Y-%m-%d').date()
+            desde = request.args.get('desde')
+            desde = datetime.strptime(desde, '%Y-%m-%d').date() if desde else hasta - timedelta(days=OCUPACION_REPORTE_DIAS - 1)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'desde y hasta deben tener formato YYYY-MM-DD'}), 400
+        if hasta < desde or (hasta - desde).days + 1 > OCUPACION_REPORTE_MAX_DIAS:
+            return jsonify({'success': False, 'error': f'El rango debe tener entre 1 y {OCUPACION_REPORTE_MAX_DIAS} días'}), 400
+
+        por_sala = request.args.get('por') == 'sala'
+        nombre = 'ocupacion-salas' if por_sala else 'ocupacion-edificios'
+        return ejecutar_reporte(nombre, sql_ocupacion(por_sala), (desde, hasta, desde, hasta))
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/asistencias-por-rol')
+@api.route('/api/reportes/asistencias-por-rol')
 def reporte_reservas_asistencias():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
-                ppa.rol,
-                COUNT(DISTINCT r.id_reserva) AS total_reservas,
-                SUM(CASE WHEN rp.asistencia = 1 THEN 1 ELSE 0 END) AS asistencias,
-                SUM(CASE WHEN rp.asistencia = 0 THEN 1 ELSE 0 END) AS inasistencias
-            FROM reserva r
-            JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
-            JOIN participante p ON rp.ci_participante = p.ci
-            JOIN participante_programa_academico ppa ON p.ci = ppa.ci_participante
-            GROUP BY ppa.rol
+            SELECT
+                rol,
+                reservas AS total_reservas,
+                asistencias,
+                inasistencias
+            FROM resumen_reserva_rol
+            WHERE reservas > 0
+            ORDER BY rol
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('asistencias-por-rol', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/sanciones-por-rol')
+@api.route('/api/reportes/sanciones-por-rol')
 def reporte_sanciones_por_tipo_usuario():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
-                ppa.rol,
-                COUNT(*) AS total_sanciones,
-                SUM(CASE 
-                    WHEN CURDATE() BETWEEN sp.fecha_inicio AND sp.fecha_fin 
-                    THEN 1 ELSE 0 
-                END) AS activas
-            FROM sancion_participante sp
-            JOIN participante p ON sp.ci_participante = p.ci
-            JOIN participante_programa_academico ppa ON p.ci = ppa.ci_participante
-            GROUP BY ppa.rol
+            SELECT
+                rol,
+                CAST(SUM(sanciones) AS SIGNED) AS total_sanciones,
+                CAST(SUM(CASE
+                    WHEN CURDATE() BETWEEN fecha_inicio AND fecha_fin
+                    THEN sanciones ELSE 0
+                END) AS SIGNED) AS activas
+            FROM resumen_sancion_rol
+            GROUP BY rol
+            HAVING total_sanciones > 0
+            ORDER BY rol
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('sanciones-por-rol', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/reservas-por-estado')
+@api.route('/api/reportes/reservas-por-estado')
 def reporte_reservas_por_estado():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
+            SELECT
                 estado,
-                COUNT(*) AS cantidad,
-                ROUND((COUNT(*) * 100.0 / (SELECT COUNT(*) FROM reserva)), 2) AS porcentaje
-            FROM reserva
+                CAST(SUM(reservas) AS SIGNED) AS cantidad,
+                ROUND((SUM(reservas) * 100.0 / (SELECT SUM(reservas) FROM resumen_reserva_sala)), 2) AS porcentaje
+            FROM resumen_reserva_sala
             GROUP BY estado
+            HAVING cantidad > 0
             ORDER BY cantidad DESC
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('reservas-por-estado', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/edificio-por-facultad')
+@api.route('/api/reportes/edificio-por-facultad')
 def reporte_edificio_por_facultad():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                f.nombre AS facultad,
-                r.edificio AS nombre_edificio,
-                COUNT(*) AS total
-            FROM reserva r
-            JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
-            JOIN participante_programa_academico ppa ON rp.ci_participante = ppa.ci_participante
-            JOIN programa_academico pa ON ppa.nombre_programa = pa.nombre_programa
-            JOIN facultad f ON pa.id_facultad = f.id_facultad
-            GROUP BY f.nombre, r.edificio
-            HAVING COUNT(*) = (
-                SELECT COUNT(*) 
-                FROM reserva r2
-                JOIN reserva_participante rp2 ON r2.id_reserva = rp2.id_reserva
-                JOIN participante_programa_academico ppa2 ON rp2.ci_participante = ppa2.ci_participante
-                JOIN programa_academico pa2 ON ppa2.nombre_programa = pa2.nombre_programa
-                WHERE pa2.id_facultad = pa.id_facultad
-                GROUP BY r2.edificio
-                ORDER BY COUNT(*) DESC
-                LIMIT 1
-            )
-        """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('edificio-por-facultad', SQL_EDIFICIO_POR_FACULTAD)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/usuarios-mas-activos')
+@api.route('/api/reportes/usuarios-mas-activos')
 def reporte_usuarios_mas_activos():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
+            SELECT
                 p.nombre,
                 p.apellido,
                 p.email,
-                COUNT(DISTINCT r.id_reserva) AS total_reservas
-            FROM participante p
-            JOIN reserva_participante rp ON p.ci = rp.ci_participante
-            JOIN reserva r ON rp.id_reserva = r.id_reserva
-            GROUP BY p.ci, p.nombre, p.apellido, p.email
-            ORDER BY total_reservas DESC
+                rp.reservas AS total_reservas
+            FROM resumen_reserva_participante rp
+            JOIN participante p ON rp.ci_participante = p.ci
+            WHERE rp.reservas > 0
+            ORDER BY rp.reservas DESC
             LIMIT 10
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('usuarios-mas-activos', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-@app.route('/api/reportes/salas-cancelacion')
+@api.route('/api/reportes/salas-cancelacion')
 def reporte_tasa_cancelacion():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
-            SELECT 
-                r.nombre_sala,
-                r.edificio,
-                COUNT(*) AS total,
-                SUM(CASE WHEN r.estado = 'cancelada' THEN 1 ELSE 0 END) AS canceladas,
-                ROUND((SUM(CASE WHEN r.estado = 'cancelada' THEN 1 ELSE 0 END) * 100.0 / COUNT(*)), 2) AS tasa
-            FROM reserva r
-            GROUP BY r.nombre_sala, r.edificio
-            HAVING COUNT(*) > 0
+            SELECT
+                rs.nombre_sala,
+                rs.edificio,
+                CAST(SUM(rs.reservas) AS SIGNED) AS total,
+                CAST(SUM(CASE WHEN rs.estado = 'cancelada' THEN rs.reservas ELSE 0 END) AS SIGNED) AS canceladas,
+                ROUND((SUM(CASE WHEN rs.estado = 'cancelada' THEN rs.reservas ELSE 0 END) * 100.0 / SUM(rs.reservas)), 2) AS tasa
+            FROM resumen_reserva_sala rs
+            GROUP BY rs.nombre_sala, rs.edificio
+            HAVING total > 0
             ORDER BY tasa DESC
         """
-        cursor.execute(query)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return jsonify({'success': True, 'data': data})
+        return ejecutar_reporte('salas-cancelacion', query)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1190,38 +2375,26 @@ def reporte_tasa_cancelacion():
 # ENDPOINTS PARA CARGA DE DATOS MAESTROS
 # ============================================
 
-@app.route('/api/edificios')
-def get_edificios():
-    try:
-        conn = get_db_connection()
+def cargar_edificios():
+    with get_db_connection() as conn:
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM edificio ORDER BY nombre_edificio")
         data = cursor.fetchall()
         cursor.close()
-        conn.close()
-        return jsonify({'success': True, 'data': data})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return data
 
 
-@app.route('/api/facultades')
-def get_facultades():
-    try:
-        conn = get_db_connection()
+def cargar_facultades():
+    with get_db_connection() as conn:
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM facultad ORDER BY nombre")
         data = cursor.fetchall()
         cursor.close()
-        conn.close()
-        return jsonify({'success': True, 'data': data})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)}), 500
+    return data
 
 
-@app.route('/api/programas_academicos')
-def get_programas_academicos():
-    try:
-        conn = get_db_connection()
+def cargar_programas_academicos():
+    with get_db_connection() as conn:
         cursor = conn.cursor(dictionary=True)
         query = """
             SELECT pa.nombre_programa, pa.tipo, f.nombre AS facultad
@@ -1232,12 +2405,89 @@ def get_programas_academicos():
         cursor.execute(query)
         data = cursor.fetchall()
         cursor.close()
-        conn.close()
-        return jsonify({'success': True, 'data': data})
+    return data
+
+
+@api.route('/api/edificios')
+def get_edificios():
+    try:
+        return respuesta_catalogo('edificios', cargar_edificios)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/facultades')
+def get_facultades():
+    try:
+        return respuesta_catalogo('facultades', cargar_facultades)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@api.route('/api/programas_academicos')
+def get_programas_academicos():
+    try:
+        return respuesta_catalogo('programas_academicos', cargar_programas_academicos)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ============================================
+# APP FACTORY
+# ============================================
+
+def create_app(pool_size=None, pool_max_overflow=None, hilos=None, tareas=True):
+    """
+    Crea la aplicación Flask. pool_size y pool_max_overflow redefinen el pool
+    de conexiones del proceso; si no se pasan se usan DB_POOL_SIZE y
+    DB_POOL_MAX_OVERFLOW. hilos es la cantidad de hilos del servidor en este
+    proceso (por defecto WEB_THREADS) y limita los streams de eventos. Con
+    tareas=False no se inician los hilos de fondo (proceso que no atiende
+    tráfico). Para producción ver wsgi.py y gunicorn.conf.py.
+    """
+    if pool_size is not None or pool_max_overflow is not None:
+        configurar_pool(size=pool_size, max_overflow=pool_max_overflow)
+    bus_eventos.max_suscriptores = max_suscriptores_eventos(hilos or int(os.getenv('WEB_THREADS', '4')))
+
+    app = Flask(__name__)
+    CORS(app)
+    # Latencia por endpoint y tiempos por consulta, expuestos en /api/metrics
+    instrumentar_app(app)
+    app.register_blueprint(api)
+    if tareas:
+        # Carga el índice de sanciones y lo recarga periódicamente
+        tarea_sanciones.iniciar()
+        tarea_cierre.iniciar()
+        tarea_ocupacion.iniciar()
+        cola_asistencias.iniciar()
+    return app
+
+
+def iniciar_apagado():
+    """
+    Primera fase del apagado, apenas llega la señal y antes de esperar a las
+    peticiones en curso: /api/ready empieza a responder 503 y se cortan los
+    streams de eventos para no retener hilos del servidor.
+    """
+    apagando.set()
+    bus_eventos.cerrar()
+
+
+def apagar(espera=30):
+    """
+    Apagado ordenado: iniciar_apagado(), detener las tareas de fondo, escribir
+    las asistencias pendientes y cerrar el pool, esperando hasta `espera`
+    segundos a que se devuelvan las conexiones prestadas.
+    """
+    iniciar_apagado()
+    tarea_sanciones.detener()
+    tarea_cierre.detener()
+    tarea_ocupacion.detener()
+    # Antes de cerrar el pool: escribir las asistencias pendientes
+    cola_asistencias.detener()
+    cerrar_pool(espera)
+
+
 # ============================================
 # MAIN
 # ============================================
@@ -1257,5 +2507,9 @@ if __name__ == '__main__':
     print("     • Posgrado y docentes: sin límites")
     print("     • Restricciones por tipo de sala según rol")
     print("=" * 70)
-    
+
+    # Con debug, el reloader de Werkzeug vuelve a ejecutar este archivo en un
+    # proceso hijo que es el que atiende; el padre solo vigila los archivos y
+    # no debe iniciar las tareas de fondo ni abrir conexiones
+    app = create_app(tareas=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Servidor asíncrono (aiohttp + aiomysql) para los endpoints de solo lectura
+más consultados: disponibilidad de una sala, turnos, salas y reservas de un
+participante.
+
+Corre junto a la app Flask, en otro puerto: un proxy envía estas rutas a este
+servidor y el resto a Flask. Usa el mismo SQL (consultas.py), los mismos
+filtros y las mismas respuestas JSON que los endpoints de app.py, y un pool
+de conexiones asíncrono con los límites de DB_POOL_SIZE y DB_POOL_MAX_OVERFLOW.
+Un solo proceso atiende muchas peticiones concurrentes sin un hilo por cada una.
+
+Requiere las dependencias opcionales de requirements-async.txt. Desde backend/:
+    pip install -r requirements-async.txt
+    python asincrono.py            # puerto ASYNC_PORT, por defecto 5001
+"""
+import hashlib
+import json
+import os
+import re
+
+import aiomysql
+from aiohttp import web
+
+from cache import CacheTTL
+from consultas import SQL_DISPONIBILIDAD, SQL_TURNOS, SQL_SALAS, sql_reservas_participante, filtros_reservas
+from database import DB_CONFIG, POOL_CONFIG
+
+CATALOGO_CACHE_TTL = int(os.getenv('CATALOGO_CACHE_TTL', '300'))
+
+catalogo_cache = CacheTTL(ttl=CATALOGO_CACHE_TTL, max_entradas=8)
+
+_RE_PORCENTAJE = re.compile(r'%(?![s(])')
+
+
+def para_pymysql(sql):
+    """
+    aiomysql arma la consulta con el operador % de Python, así que los % que
+    no son parámetros (TIME_FORMAT, DATE_FORMAT) deben duplicarse cuando la
+    consulta lleva parámetros.
+    """
+    return _RE_PORCENTAJE.sub('%%', sql)
+
+
+def respuesta_json(datos, status=200):
+    return web.json_response(datos, status=status, dumps=lambda d: json.dumps(d, default=str))
+
+
+def error(mensaje, status):
+    return respuesta_json({'success': False, 'error': mensaje}, status)
+
+
+async def consultar(request, sql, params=None):
+    async with request.app['pool'].acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(para_pymysql(sql) if params else sql, params)
+            return await cursor.fetchall()
+
+
+# ============================================
+# HANDLERS
+# ============================================
+
+async def respuesta_catalogo(request, nombre, sql):
+    """
+    Igual que en app.py: catálogo cacheado con ETag para responder 304. Cada
+    proceso tiene su propio cache, así que un cambio hecho desde la app Flask
+    se ve aquí recién cuando vence CATALOGO_CACHE_TTL.
+    """
+    entrada = catalogo_cache.obtener(nombre)
+    if entrada is None:
+        datos = await consultar(request, sql)
+        cuerpo = json.dumps({'success': True, 'data': datos}, default=str).encode('utf-8')
+        entrada = {'cuerpo': cuerpo, 'etag': '"' + hashlib.sha1(cuerpo).hexdigest() + '"'}
+        catalogo_cache.guardar(nombre, entrada)
+
+    cabeceras = {'ETag': entrada['etag'], 'Cache-Control': 'no-cache'}
+    if entrada['etag'] in request.headers.get('If-None-Match', ''):
+        return web.Response(status=304, headers=cabeceras)
+    return web.Response(body=entrada['cuerpo'], content_type='application/json', headers=cabeceras)
+
+
+async def get_turnos(request):
+    try:
+        return await respuesta_catalogo(request, 'turnos', SQL_TURNOS)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_salas(request):
+    try:
+        return await respuesta_catalogo(request, 'salas', SQL_SALAS)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def verificar_disponibilidad_sala(request):
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return error('Cuerpo JSON requerido', 400)
+
+        for field in ('nombre_sala', 'edificio', 'fecha', 'id_turno'):
+            if field not in data or not data[field]:
+                return error(f'Campo requerido: {field}', 400)
+
+        filas = await consultar(request, SQL_DISPONIBILIDAD,
+                                (data['nombre_sala'], data['edificio'], data['fecha'], data['id_turno']))
+        disponible = filas[0]['total'] == 0
+        return respuesta_json({
+            'success': True,
+            'disponible': disponible,
+            'message': 'Sala disponible' if disponible else 'Sala ocupada'
+        })
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_reservas_participante(request):
+    try:
+        ci = request.query.get('ci_participante')
+        if not ci:
+            # El listado general paginado y las exportaciones los atiende app.py
+            return error('Parámetro requerido: ci_participante', 400)
+        condiciones, params = filtros_reservas(request.query)
+        reservas = await consultar(request, sql_reservas_participante(condiciones), [ci] + params)
+        return respuesta_json({'success': True, 'data': reservas})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def health(request):
+    pool = request.app['pool']
+    return respuesta_json({
+        'status': 'healthy',
+        'pool': {'size': pool.size, 'libres': pool.freesize, 'maxsize': pool.maxsize},
+        'cache': catalogo_cache.estadisticas(),
+    })
+
+
+# ============================================
+# APLICACIÓN
+# ============================================
+
+@web.middleware
+async def cors(request, handler):
+    # Las preflight se responden sin pasar por el router
+    if request.method == 'OPTIONS':
+        respuesta = web.Response()
+        respuesta.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        respuesta.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', 'Content-Type')
+    else:
+        respuesta = await handler(request)
+    respuesta.headers['Access-Control-Allow-Origin'] = '*'
+    return respuesta
+
+
+async def abrir_pool(app):
+    app['pool'] = await aiomysql.create_pool(
+        host=DB_CONFIG['host'],
+        port=DB_CONFIG['port'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        db=DB_CONFIG['database'],
+        charset=DB_CONFIG['charset'],
+        autocommit=True,
+        minsize=POOL_CONFIG['size'],
+        maxsize=POOL_CONFIG['size'] + POOL_CONFIG['max_overflow'],
+        pool_recycle=int(POOL_CONFIG['recycle']),
+    )
+
+
+async def cerrar_pool(app):
+    app['pool'].close()
+    await app['pool'].wait_closed()
+
+
+def create_app():
+    app = web.Application(middlewares=[cors])
+    app.on_startup.append(abrir_pool)
+    app.on_cleanup.append(cerrar_pool)
+    app.router.add_get('/api/health', health)
+    app.router.add_get('/api/turnos', get_turnos)
+    app.router.add_get('/api/salas', get_salas)
+    app.router.add_post('/api/salas/verificar-disponibilidad', verificar_disponibilidad_sala)
+    app.router.add_get('/api/reservas', get_reservas_participante)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_app(), host='0.0.0.0', port=int(os.getenv('ASYNC_PORT', '5001')))
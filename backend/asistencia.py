@@ -0,0 +1,147 @@
+import itertools
+import logging
+import threading
+import time
+
+from resumenes import aplicar_asistencias
+
+
+logger = logging.getLogger('asistencia')
+
+
+# ============================================
+# COLA DE ESCRITURA DIFERIDA DE ASISTENCIAS
+# ============================================
+
+# Solo se marca la asistencia de reservas activas
+SQL_MARCAR_ASISTENCIA = """
+    UPDATE reserva_participante rp
+    JOIN reserva r ON r.id_reserva = rp.id_reserva
+    SET rp.asistencia = 1
+    WHERE r.estado = 'activa'
+      AND (rp.id_reserva, rp.ci_participante) IN ({filas})
+"""
+
+
+class ColaAsistencias:
+    """
+    Acumula en memoria los registros de asistencia (id_reserva, ci) y los
+    escribe en lotes desde un hilo propio: un solo UPDATE y un commit cada
+    `intervalo_ms` milisegundos o cada `max_filas` registros, lo que ocurra
+    primero. Los registros repetidos se unifican antes de escribir. En la
+    misma transacción se actualiza resumen_reserva_rol (asistencias-por-rol).
+
+    Si la escritura falla los registros vuelven a la cola y se reintentan.
+    Con `max_pendientes` registros sin escribir, encolar() los rechaza para
+    no crecer sin límite mientras la base no responde. detener() escribe lo
+    pendiente antes de terminar.
+    """
+
+    def __init__(self, get_connection, intervalo_ms=200, max_filas=500, max_pendientes=10000):
+        self.get_connection = get_connection
+        self.intervalo = intervalo_ms / 1000
+        self.max_filas = max_filas
+        self.max_pendientes = max_pendientes
+        self._pendientes = {}  # (id_reserva, ci) -> momento del registro
+        self._cond = threading.Condition()
+        self._detener = False
+        self._hilo = None
+        self._stats = {
+            "recibidos": 0,
+            "escritos": 0,
+            "ignorados": 0,
+            "rechazados": 0,
+            "lotes": 0,
+            "errores": 0,
+            "segundos_escritura": 0.0,
+        }
+
+    def iniciar(self):
+        with self._cond:
+            if self._hilo is not None:
+                return
+            self._detener = False
+            self._hilo = threading.Thread(target=self._correr, name='cola-asistencias', daemon=True)
+            self._hilo.start()
+
+    def encolar(self, registros):
+        """
+        Agrega registros [(id_reserva, ci)]. Devuelve False, sin encolar
+        ninguno, si la cola está llena o detenida.
+        """
+        ahora = time.time()
+        with self._cond:
+            if self._detener or len(self._pendientes) + len(registros) > self.max_pendientes:
+                self._stats["rechazados"] += len(registros)
+                return False
+            for registro in registros:
+                self._pendientes.setdefault(registro, ahora)
+            self._stats["recibidos"] += len(registros)
+            if len(self._pendientes) >= self.max_filas:
+                self._cond.notify()
+        return True
+
+    def _correr(self):
+        while True:
+            with self._cond:
+                if not self._detener and len(self._pendientes) < self.max_filas:
+                    self._cond.wait(self.intervalo)
+                if self._detener and not self._pendientes:
+                    return
+                lote = dict(itertools.islice(self._pendientes.items(), self.max_filas))
+                for registro in lote:
+                    del self._pendientes[registro]
+            if lote and not self._escribir(lote):
+                with self._cond:
+                    if self._detener:
+                        # Sin base no hay forma de vaciar la cola al apagar
+                        logger.error("Se descartan %d asistencias sin escribir", len(lote) + len(self._pendientes))
+                        self._pendientes.clear()
+                        return
+                    # Reintentar en la próxima vuelta, sin pisar registros nuevos
+                    for registro, momento in lote.items():
+                        self._pendientes.setdefault(registro, momento)
+                time.sleep(self.intervalo)
+
+    def _escribir(self, lote):
+        inicio = time.monotonic()
+        registros = list(lote)
+        reservas = sorted({id_reserva for id_reserva, _ in registros})
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                aplicar_asistencias(cursor, reservas, -1)
+                cursor.execute(
+                    SQL_MARCAR_ASISTENCIA.format(filas=', '.join(['(%s, %s)'] * len(registros))),
+                    [v for registro in registros for v in registro]
+                )
+                escritos = cursor.rowcount
+                aplicar_asistencias(cursor, reservas, 1)
+                conn.commit()
+                cursor.close()
+        except Exception:
+            logger.exception("Error al escribir %d asistencias", len(registros))
+            with self._cond:
+                self._stats["errores"] += 1
+            return False
+        with self._cond:
+            self._stats["lotes"] += 1
+            self._stats["escritos"] += escritos
+            # Reserva inexistente o no activa, participante que no es de la
+            # reserva, o asistencia ya registrada
+            self._stats["ignorados"] += len(registros) - escritos
+            self._stats["segundos_escritura"] += time.monotonic() - inicio
+        return True
+
+    def detener(self, espera=10):
+        """Escribe los registros pendientes y termina el hilo."""
+        with self._cond:
+            hilo, self._hilo = self._hilo, None
+            self._detener = True
+            self._cond.notify()
+        if hilo is not None:
+            hilo.join(espera)
+
+    def estadisticas(self):
+        with self._cond:
+            return {**self._stats, "pendientes": len(self._pendientes)}
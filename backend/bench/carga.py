@@ -0,0 +1,277 @@
+"""
+Prueba de carga de la API.
+
+Lanza N hilos que durante un tiempo fijo eligen al azar (según pesos) una
+operación del escenario y la ejecutan contra la API: listado paginado de
+reservas, historial de un participante, creación de reservas, grilla de
+disponibilidad, catálogos y reportes. Al final informa por endpoint la
+cantidad de peticiones, errores, latencias p50/p95/p99 y throughput.
+
+Por defecto llama a la app en el mismo proceso (app.test_client(), sin red);
+con --url se prueba un servidor ya levantado. Los participantes y salas se
+toman de los datos sintéticos de bench.generar_datos, así que conviene
+generarlos antes. Las reservas creadas durante la prueba se borran al final.
+
+Uso (desde backend/):
+    python -m bench.generar_datos --reservas 100000
+    python -m bench.carga --hilos 16 --duracion 60
+    python -m bench.carga --url http://localhost:5000 --hilos 32 --salida resultado.json
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from database import get_connection
+from resumenes import aplicar_reservas
+from bench.generar_datos import PREFIJO_CI, PREFIJO_SALA
+
+REPORTES = [
+    'salas-mas-reservadas', 'turnos-demandados', 'promedio-participantes',
+    'reservas-por-carrera', 'ocupacion-edificios', 'asistencias-por-rol',
+    'sanciones-por-rol', 'reservas-por-estado', 'edificio-por-facultad',
+    'usuarios-mas-activos', 'salas-cancelacion',
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de prueba')
+    parser.add_argument('--url', default=None, help='URL base de un servidor (por defecto, en proceso)')
+    parser.add_argument('--sin-escritura', action='store_true', help='No crea reservas')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', default=None, help='Guarda los resultados en un archivo JSON')
+    return parser.parse_args()
+
+
+# ============================================
+# DATOS DEL ESCENARIO
+# ============================================
+
+def cargar_contexto():
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ci, email FROM participante WHERE ci LIKE %s ORDER BY ci", (PREFIJO_CI + '%',))
+        participantes = cursor.fetchall()
+        cursor.execute("SELECT nombre_sala, edificio FROM sala WHERE nombre_sala LIKE %s ORDER BY nombre_sala",
+                       (PREFIJO_SALA + '%',))
+        salas = cursor.fetchall()
+        cursor.execute("SELECT id_turno FROM turno")
+        turnos = [fila[0] for fila in cursor.fetchall()]
+        cursor.close()
+    if not (participantes and salas):
+        raise SystemExit("No hay datos sintéticos: correr antes python -m bench.generar_datos")
+    return {'participantes': participantes, 'salas': salas, 'turnos': turnos}
+
+
+def escenario(contexto, escritura):
+    """Devuelve [(endpoint, peso, armar(rnd) -> (método, ruta, cuerpo))]."""
+    participantes = contexto['participantes']
+    salas = contexto['salas']
+    turnos = contexto['turnos']
+    hoy = date.today()
+
+    def listar_reservas(rnd):
+        return 'GET', '/api/reservas?limite=50', None
+
+    def reservas_participante(rnd):
+        ci, _ = rnd.choice(participantes)
+        return 'GET', f'/api/reservas?ci_participante={ci}', None
+
+    def disponibilidad(rnd):
+        desde = hoy + timedelta(days=rnd.randint(0, 60))
+        return 'GET', f'/api/salas/disponibilidad?desde={desde}&hasta={desde + timedelta(days=6)}', None
+
+    def catalogo(rnd):
+        return 'GET', rnd.choice(('/api/salas', '/api/turnos', '/api/edificios')), None
+
+    def reporte(rnd):
+        return 'GET', f'/api/reportes/{rnd.choice(REPORTES)}', None
+
+    def crear_reserva(rnd):
+        ci, email = rnd.choice(participantes)
+        nombre_sala, edificio = rnd.choice(salas)
+        return 'POST', '/api/reservas', {
+            'nombre_sala': nombre_sala,
+            'edificio': edificio,
+            'fecha': (hoy + timedelta(days=rnd.randint(1, 365))).isoformat(),
+            'id_turno': rnd.choice(turnos),
+            'ci_participante': ci,
+            'email': email,
+        }
+
+    operaciones = [
+        ('GET /api/reservas', 25, listar_reservas),
+        ('GET /api/reservas?ci_participante', 20, reservas_participante),
+        ('GET /api/salas/disponibilidad', 15, disponibilidad),
+        ('GET catálogos', 15, catalogo),
+        ('GET /api/reportes/*', 10, reporte),
+    ]
+    if escritura:
+        operaciones.append(('POST /api/reservas', 15, crear_reserva))
+    return operaciones
+
+
+# ============================================
+# CLIENTES
+# ============================================
+
+class ClienteLocal:
+    def __init__(self, app):
+        self.cliente = app.test_client()
+
+    def pedir(self, metodo, ruta, cuerpo):
+        resp = self.cliente.open(ruta, method=metodo, json=cuerpo)
+        return resp.status_code, resp.get_json(silent=True)
+
+
+class ClienteHTTP:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def pedir(self, metodo, ruta, cuerpo):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+        req = urllib.request.Request(self.url + ruta, data=datos, method=metodo,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return resp.status, json.loads(resp.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+# ============================================
+# EJECUCIÓN Y RESULTADOS
+# ============================================
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    rango = max(1, math.ceil(p / 100 * len(valores_ordenados)))
+    return valores_ordenados[rango - 1]
+
+
+def ejecutar(args, operaciones):
+    latencias = defaultdict(list)
+    codigos = defaultdict(Counter)
+    creadas = []
+    lock = threading.Lock()
+    barrera = threading.Barrier(args.hilos + 1)
+    fin = [0.0]
+
+    nombres = [nombre for nombre, _, _ in operaciones]
+    pesos = [peso for _, peso, _ in operaciones]
+    armadores = {nombre: armar for nombre, _, armar in operaciones}
+    if not args.url:
+        from app import create_app
+        app = create_app()
+
+    def trabajador(indice):
+        rnd = random.Random(args.semilla + indice)
+        cliente = ClienteHTTP(args.url) if args.url else ClienteLocal(app)
+        propias_lat, propios_cod, propias_creadas = defaultdict(list), defaultdict(Counter), []
+        barrera.wait()
+        while time.monotonic() < fin[0]:
+            nombre = rnd.choices(nombres, weights=pesos)[0]
+            metodo, ruta, cuerpo = armadores[nombre](rnd)
+            inicio = time.perf_counter()
+            try:
+                codigo, respuesta = cliente.pedir(metodo, ruta, cuerpo)
+            except Exception:
+                codigo, respuesta = 'excepción', None
+            propias_lat[nombre].append(time.perf_counter() - inicio)
+            propios_cod[nombre][codigo] += 1
+            if metodo == 'POST' and codigo == 200 and respuesta:
+                propias_creadas.append(respuesta['id_reserva'])
+        with lock:
+            for nombre, valores in propias_lat.items():
+                latencias[nombre].extend(valores)
+            for nombre, contador in propios_cod.items():
+                codigos[nombre].update(contador)
+            creadas.extend(propias_creadas)
+
+    hilos = [threading.Thread(target=trabajador, args=(i,)) for i in range(args.hilos)]
+    for h in hilos:
+        h.start()
+    fin[0] = time.monotonic() + args.duracion
+    barrera.wait()
+    inicio = time.monotonic()
+    for h in hilos:
+        h.join()
+    transcurrido = time.monotonic() - inicio
+
+    return latencias, codigos, creadas, transcurrido
+
+
+def resumir(latencias, codigos, transcurrido):
+    resultados = []
+    for nombre in sorted(latencias):
+        valores = sorted(latencias[nombre])
+        errores = sum(n for codigo, n in codigos[nombre].items() if codigo == 'excepción' or codigo >= 500)
+        resultados.append({
+            'endpoint': nombre,
+            'peticiones': len(valores),
+            'errores': errores,
+            'codigos': {str(c): n for c, n in sorted(codigos[nombre].items(), key=lambda x: str(x[0]))},
+            'p50_ms': round(percentil(valores, 50) * 1000, 2),
+            'p95_ms': round(percentil(valores, 95) * 1000, 2),
+            'p99_ms': round(percentil(valores, 99) * 1000, 2),
+            'throughput': round(len(valores) / transcurrido, 2),
+        })
+    return resultados
+
+
+def limpiar(ids):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        for i in range(0, len(ids), 1000):
+            lote = ids[i:i + 1000]
+            marcadores = ', '.join(['%s'] * len(lote))
+            aplicar_reservas(cursor, lote, -1)
+            cursor.execute(f"DELETE FROM reserva_participante WHERE id_reserva IN ({marcadores})", lote)
+            cursor.execute(f"DELETE FROM reserva WHERE id_reserva IN ({marcadores})", lote)
+            conn.commit()
+        cursor.close()
+
+
+def main():
+    args = parse_args()
+    operaciones = escenario(cargar_contexto(), not args.sin_escritura)
+
+    print(f"Prueba de carga: {args.hilos} hilos, {args.duracion:.0f}s, "
+          f"{'servidor ' + args.url if args.url else 'en proceso'}")
+    latencias, codigos, creadas, transcurrido = ejecutar(args, operaciones)
+    resultados = resumir(latencias, codigos, transcurrido)
+
+    print(f"\n{'endpoint':<38}{'pet.':>8}{'err.':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for r in resultados:
+        print(f"{r['endpoint']:<38}{r['peticiones']:>8}{r['errores']:>6}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['throughput']:>10.1f}")
+    total = sum(r['peticiones'] for r in resultados)
+    print(f"\nTotal: {total} peticiones en {transcurrido:.1f}s ({total / transcurrido:.1f} req/s)")
+    for r in resultados:
+        print(f"  {r['endpoint']}: {r['codigos']}")
+
+    if creadas:
+        limpiar(creadas)
+        print(f"{len(creadas)} reservas creadas durante la prueba eliminadas")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'hilos': args.hilos,
+                'duracion': round(transcurrido, 2),
+                'modo': args.url or 'en proceso',
+                'resultados': resultados,
+            }, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Compara el servidor síncrono (Flask) con el asíncrono (asincrono.py) con la
+misma mezcla de lecturas: disponibilidad de una sala, reservas de un
+participante y catálogos de turnos y salas.
+
+El generador de carga es un cliente aiohttp con N peticiones concurrentes
+durante un tiempo fijo contra cada servidor, uno después del otro. Informa
+por servidor y endpoint las latencias p50/p95/p99 y el throughput, y al final
+los req/s por núcleo. Para que la comparación sea justa conviene limitar
+cada servidor a los mismos núcleos (taskset) e indicarlos con --nucleos-*.
+
+Uso (desde backend/, con datos de bench.generar_datos):
+    taskset -c 0 gunicorn -c gunicorn.conf.py -w 1 --threads 16 wsgi:app
+    taskset -c 1 python asincrono.py
+    python -m bench.comparar_async --concurrencia 64 --duracion 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import aiohttp
+
+from bench.carga import cargar_contexto, resumir
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sync-url', default='http://localhost:5000')
+    parser.add_argument('--async-url', default='http://localhost:5001')
+    parser.add_argument('--nucleos-sync', type=float, default=1, help='Núcleos asignados al servidor síncrono')
+    parser.add_argument('--nucleos-async', type=float, default=1, help='Núcleos asignados al servidor asíncrono')
+    parser.add_argument('--concurrencia', type=int, default=64, help='Peticiones simultáneas')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de medición por servidor')
+    parser.add_argument('--calentamiento', type=float, default=3, help='Segundos previos que no se miden')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', default=None, help='Guarda los resultados en un archivo JSON')
+    return parser.parse_args()
+
+
+def escenario_lectura(contexto):
+    """Mezcla de lecturas que atienden los dos servidores; mismo formato que carga.escenario."""
+    participantes = contexto['participantes']
+    salas = contexto['salas']
+    turnos = contexto['turnos']
+    hoy = date.today()
+
+    def disponibilidad(rnd):
+        nombre_sala, edificio = rnd.choice(salas)
+        return 'POST', '/api/salas/verificar-disponibilidad', {
+            'nombre_sala': nombre_sala,
+            'edificio': edificio,
+            'fecha': (hoy + timedelta(days=rnd.randint(0, 60))).isoformat(),
+            'id_turno': rnd.choice(turnos),
+        }
+
+    def reservas_participante(rnd):
+        ci, _ = rnd.choice(participantes)
+        return 'GET', f'/api/reservas?ci_participante={ci}', None
+
+    def catalogo(rnd):
+        return 'GET', rnd.choice(('/api/salas', '/api/turnos')), None
+
+    return [
+        ('POST /api/salas/verificar-disponibilidad', 50, disponibilidad),
+        ('GET /api/reservas?ci_participante', 30, reservas_participante),
+        ('GET catálogos', 20, catalogo),
+    ]
+
+
+async def medir(url, operaciones, args):
+    latencias = defaultdict(list)
+    codigos = defaultdict(Counter)
+    nombres = [nombre for nombre, _, _ in operaciones]
+    pesos = [peso for _, peso, _ in operaciones]
+    armadores = {nombre: armar for nombre, _, armar in operaciones}
+    url = url.rstrip('/')
+    inicio_medicion = time.monotonic() + args.calentamiento
+    fin = inicio_medicion + args.duracion
+
+    async def trabajador(sesion, indice):
+        rnd = random.Random(args.semilla + indice)
+        while time.monotonic() < fin:
+            nombre = rnd.choices(nombres, weights=pesos)[0]
+            metodo, ruta, cuerpo = armadores[nombre](rnd)
+            inicio = time.perf_counter()
+            try:
+                async with sesion.request(metodo, url + ruta, json=cuerpo) as resp:
+                    await resp.read()
+                    codigo = resp.status
+            except aiohttp.ClientError:
+                codigo = 'excepción'
+            if time.monotonic() >= inicio_medicion:
+                latencias[nombre].append(time.perf_counter() - inicio)
+                codigos[nombre][codigo] += 1
+
+    conector = aiohttp.TCPConnector(limit=args.concurrencia)
+    async with aiohttp.ClientSession(connector=conector, timeout=aiohttp.ClientTimeout(total=30)) as sesion:
+        await asyncio.gather(*(trabajador(sesion, i) for i in range(args.concurrencia)))
+    return latencias, codigos, time.monotonic() - inicio_medicion
+
+
+def imprimir(servidor, resultados, transcurrido):
+    total = sum(r['peticiones'] for r in resultados)
+    print(f"\n{servidor}: {total} peticiones en {transcurrido:.1f}s ({total / transcurrido:.1f} req/s)")
+    print(f"{'endpoint':<44}{'pet.':>8}{'err.':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for r in resultados:
+        print(f"{r['endpoint']:<44}{r['peticiones']:>8}{r['errores']:>6}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['throughput']:>10.1f}")
+
+
+def main():
+    args = parse_args()
+    operaciones = escenario_lectura(cargar_contexto())
+    servidores = [
+        ('síncrono', args.sync_url, args.nucleos_sync),
+        ('asíncrono', args.async_url, args.nucleos_async),
+    ]
+
+    print(f"Comparación: {args.concurrencia} peticiones concurrentes, {args.duracion:.0f}s por servidor")
+    salida = {'concurrencia': args.concurrencia, 'duracion': args.duracion, 'servidores': []}
+    for servidor, url, nucleos in servidores:
+        latencias, codigos, transcurrido = asyncio.run(medir(url, operaciones, args))
+        resultados = resumir(latencias, codigos, transcurrido)
+        imprimir(f"{servidor} ({url})", resultados, transcurrido)
+        req_s = sum(r['peticiones'] for r in resultados) / transcurrido
+        salida['servidores'].append({
+            'servidor': servidor,
+            'url': url,
+            'nucleos': nucleos,
+            'req_s': round(req_s, 2),
+            'req_s_por_nucleo': round(req_s / nucleos, 2),
+            'resultados': resultados,
+        })
+
+    print()
+    for s in salida['servidores']:
+        print(f"{s['servidor']:<10} {s['req_s']:>10.1f} req/s  {s['req_s_por_nucleo']:>10.1f} req/s por núcleo")
+    sincrono, asincrono = salida['servidores']
+    if sincrono['req_s_por_nucleo']:
+        print(f"Relación asíncrono/síncrono por núcleo: {asincrono['req_s_por_nucleo'] / sincrono['req_s_por_nucleo']:.2f}x")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(salida, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
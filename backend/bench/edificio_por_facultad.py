@@ -0,0 +1,152 @@
+"""
+Prueba de regresión del reporte edificio-por-facultad.
+
+Carga reservas sintéticas (con sus participantes) dentro de una transacción,
+recalcula los resúmenes y ejecuta la consulta original, con la subconsulta
+correlacionada en el HAVING, y la nueva (RANK() sobre resumen_reserva_programa).
+Compara los resultados fila por fila e informa el tiempo de cada una. Al
+terminar hace rollback, así que la base queda como estaba.
+
+Usa los participantes con programa académico, las salas y los turnos que ya
+existen en la base. Las reservas sintéticas se crean como finalizadas o
+canceladas para no chocar con el índice único de reservas activas.
+
+Uso (desde backend/):
+    python -m bench.edificio_por_facultad --reservas 5000 --repeticiones 3
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from consultas import SQL_EDIFICIO_POR_FACULTAD
+from database import get_connection
+from resumenes import recalcular
+
+# Consulta del reporte antes de pasar a resumen_reserva_programa
+SQL_EDIFICIO_POR_FACULTAD_ANTERIOR = """
+    SELECT
+        f.nombre AS facultad,
+        r.edificio AS nombre_edificio,
+        COUNT(*) AS total
+    FROM reserva r
+    JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
+    JOIN participante_programa_academico ppa ON rp.ci_participante = ppa.ci_participante
+    JOIN programa_academico pa ON ppa.nombre_programa = pa.nombre_programa
+    JOIN facultad f ON pa.id_facultad = f.id_facultad
+    GROUP BY f.nombre, r.edificio
+    HAVING COUNT(*) = (
+        SELECT COUNT(*)
+        FROM reserva r2
+        JOIN reserva_participante rp2 ON r2.id_reserva = rp2.id_reserva
+        JOIN participante_programa_academico ppa2 ON rp2.ci_participante = ppa2.ci_participante
+        JOIN programa_academico pa2 ON ppa2.nombre_programa = pa2.nombre_programa
+        WHERE pa2.id_facultad = pa.id_facultad
+        GROUP BY r2.edificio
+        ORDER BY COUNT(*) DESC
+        LIMIT 1
+    )
+"""
+
+FECHA_BASE = date(2098, 1, 1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservas', type=int, default=5000, help='Reservas sintéticas a insertar')
+    parser.add_argument('--max-participantes', type=int, default=4)
+    parser.add_argument('--repeticiones', type=int, default=3, help='Ejecuciones de cada consulta')
+    parser.add_argument('--semilla', type=int, default=42)
+    return parser.parse_args()
+
+
+def cargar_sinteticos(cursor, args, rnd):
+    cursor.execute("SELECT DISTINCT ci_participante FROM participante_programa_academico")
+    cis = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute("SELECT nombre_sala, edificio FROM sala")
+    salas = cursor.fetchall()
+    cursor.execute("SELECT id_turno FROM turno")
+    turnos = [fila[0] for fila in cursor.fetchall()]
+    if not (cis and salas and turnos):
+        sys.exit("La base necesita participantes con programa, salas y turnos")
+
+    cursor.execute("SELECT COALESCE(MAX(id_reserva), 0) FROM reserva")
+    ultimo_id = cursor.fetchone()[0]
+
+    # Algunas salas concentran la mayoría de las reservas
+    pesos = [1 / (i + 1) for i in range(len(salas))]
+    filas = []
+    for _ in range(args.reservas):
+        sala, edificio = rnd.choices(salas, weights=pesos)[0]
+        filas.append((
+            sala, edificio,
+            FECHA_BASE + timedelta(days=rnd.randint(0, 364)),
+            rnd.choice(turnos),
+            rnd.choice(('finalizada', 'finalizada', 'finalizada', 'cancelada')),
+        ))
+    cursor.executemany(
+        "INSERT INTO reserva (nombre_sala, edificio, fecha, id_turno, estado) VALUES (%s, %s, %s, %s, %s)",
+        filas
+    )
+
+    cursor.execute("SELECT id_reserva FROM reserva WHERE id_reserva > %s", (ultimo_id,))
+    ids = [fila[0] for fila in cursor.fetchall()]
+    participantes = []
+    for id_reserva in ids:
+        cantidad = rnd.randint(1, min(args.max_participantes, len(cis)))
+        participantes.extend((ci, id_reserva) for ci in rnd.sample(cis, cantidad))
+    cursor.executemany(
+        "INSERT INTO reserva_participante (ci_participante, id_reserva) VALUES (%s, %s)",
+        participantes
+    )
+    return len(ids), len(participantes)
+
+
+def medir(cursor, sql, repeticiones):
+    tiempos = []
+    filas = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cursor.execute(sql)
+        filas = cursor.fetchall()
+        tiempos.append(time.perf_counter() - inicio)
+    return sorted((str(f), str(e), int(t)) for f, e, t in filas), min(tiempos)
+
+
+def main():
+    args = parse_args()
+    rnd = random.Random(args.semilla)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            reservas, participantes = cargar_sinteticos(cursor, args, rnd)
+            print(f"Datos sintéticos: {reservas} reservas, {participantes} participantes")
+
+            inicio = time.perf_counter()
+            recalcular(cursor)
+            print(f"Resúmenes recalculados en {time.perf_counter() - inicio:.3f}s")
+
+            anterior, t_anterior = medir(cursor, SQL_EDIFICIO_POR_FACULTAD_ANTERIOR, args.repeticiones)
+            nueva, t_nueva = medir(cursor, SQL_EDIFICIO_POR_FACULTAD, args.repeticiones)
+        finally:
+            conn.rollback()
+            cursor.close()
+
+    print(f"Consulta anterior: {t_anterior * 1000:.1f} ms ({len(anterior)} filas)")
+    print(f"Consulta nueva:    {t_nueva * 1000:.1f} ms ({len(nueva)} filas)")
+    if t_nueva > 0:
+        print(f"Aceleración: x{t_anterior / t_nueva:.1f}")
+
+    if anterior != nueva:
+        print("ERROR: los resultados difieren")
+        for fila in sorted(set(anterior) ^ set(nueva)):
+            origen = 'anterior' if fila in anterior else 'nueva'
+            print(f"  solo en {origen}: {fila}")
+        sys.exit(1)
+    print("OK: mismos resultados")
+
+
+if __name__ == '__main__':
+    main()
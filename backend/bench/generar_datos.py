@@ -0,0 +1,259 @@
+"""
+Generador de datos sintéticos para pruebas de carga.
+
+Crea participantes (con login y programa académico), salas y reservas con
+sus participantes en volúmenes configurables y con distribuciones sesgadas:
+pocas salas concentran la mayoría de las reservas, los turnos de media mañana
+y de la tarde son los más pedidos y un grupo chico de participantes reserva
+mucho más que el resto.
+
+Todas las filas generadas se identifican por el prefijo de sus claves
+(CI 'SIN-…', salas 'Sala SIN-…'), así que pueden borrarse con --limpiar sin
+tocar los datos reales. Al terminar se reconstruyen las tablas de resumen.
+
+Uso (desde backend/):
+    python -m bench.generar_datos --participantes 2000 --salas 40 --reservas 100000
+    python -m bench.generar_datos --limpiar
+"""
+import argparse
+import hashlib
+import random
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+
+from database import get_connection
+from resumenes import aplicar_reservas, reconstruir
+
+PREFIJO_CI = 'SIN-'
+PREFIJO_SALA = 'Sala SIN-'
+
+NOMBRES = ['Ana', 'Luis', 'Sofía', 'Martín', 'Lucía', 'Diego', 'Valentina', 'Joaquín',
+           'Camila', 'Mateo', 'Florencia', 'Santiago', 'Agustina', 'Nicolás', 'Julieta']
+APELLIDOS = ['García', 'Pérez', 'Rodríguez', 'Silva', 'González', 'Fernández', 'López',
+             'Martínez', 'Sosa', 'Díaz', 'Suárez', 'Pereira', 'Castro', 'Núñez']
+
+# (dominio del email, rol en participante_programa_academico, tipo de programa, peso)
+PERFILES = [
+    ('correo.ucu.edu.uy', 'alumno', 'grado', 70),
+    ('postgrado.ucu.edu.uy', 'alumno', 'posgrado', 15),
+    ('docentes.ucu.edu.uy', 'docente', None, 15),
+]
+
+# (tipo_sala, peso)
+TIPOS_SALA = [('libre', 70), ('posgrado', 20), ('docente', 10)]
+
+CONTRASENA_HASH = hashlib.sha256(b'sintetico').hexdigest()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--participantes', type=int, default=2000)
+    parser.add_argument('--salas', type=int, default=40, help='Salas nuevas, repartidas entre los edificios')
+    parser.add_argument('--reservas', type=int, default=100000)
+    parser.add_argument('--max-participantes', type=int, default=6, help='Participantes por reserva')
+    parser.add_argument('--dias', type=int, default=365, help='Días hacia atrás y hacia adelante de hoy')
+    parser.add_argument('--sesgo', type=float, default=1.1, help='Exponente Zipf de salas y participantes')
+    parser.add_argument('--lote', type=int, default=5000, help='Filas por INSERT y commit')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--limpiar', action='store_true', help='Borra los datos sintéticos y termina')
+    return parser.parse_args()
+
+
+def pesos_zipf(n, sesgo):
+    """Pesos acumulados (para random.choices) de una distribución Zipf de n elementos."""
+    return list(accumulate(1 / (i + 1) ** sesgo for i in range(n)))
+
+
+def pesos_turnos(turnos):
+    """Picos a media mañana y a media tarde sobre los turnos existentes."""
+    pesos = []
+    for id_turno, hora_inicio in turnos:
+        hora = hora_inicio.seconds // 3600 if isinstance(hora_inicio, timedelta) else hora_inicio.hour
+        pico = max(0, 3 - abs(hora - 10)) + max(0, 3 - abs(hora - 16))
+        pesos.append(1 + 3 * pico)
+    return pesos
+
+
+def insertar_en_lotes(conn, cursor, sql, filas, lote):
+    for i in range(0, len(filas), lote):
+        cursor.executemany(sql, filas[i:i + lote])
+        conn.commit()
+
+
+def generar_participantes(rnd, args, programas):
+    participantes, logins, programas_participante = [], [], []
+    por_tipo = {
+        tipo: [nombre for nombre, t in programas if t == tipo]
+        for tipo in ('grado', 'posgrado')
+    }
+    todos = [nombre for nombre, _ in programas]
+
+    for i in range(args.participantes):
+        dominio, rol, tipo, _ = rnd.choices(PERFILES, weights=[p[3] for p in PERFILES])[0]
+        ci = f'{PREFIJO_CI}{i:06d}'
+        email = f'sin{i:06d}@{dominio}'
+        participantes.append((ci, rnd.choice(NOMBRES), rnd.choice(APELLIDOS), email))
+        logins.append((email, CONTRASENA_HASH, ci))
+
+        opciones = por_tipo.get(tipo) or todos
+        for programa in rnd.sample(opciones, min(len(opciones), rnd.choice((1, 1, 1, 2)))):
+            programas_participante.append((ci, programa, rol))
+    return participantes, logins, programas_participante
+
+
+def generar_salas(rnd, args, edificios):
+    salas = []
+    for i in range(args.salas):
+        tipo = rnd.choices([t for t, _ in TIPOS_SALA], weights=[p for _, p in TIPOS_SALA])[0]
+        salas.append((f'{PREFIJO_SALA}{i:03d}', edificios[i % len(edificios)], rnd.randint(4, 30), tipo))
+    return salas
+
+
+def generar_reservas(rnd, args, salas, turnos):
+    """Devuelve [(nombre_sala, edificio, fecha, id_turno, estado)] sin dos activas en el mismo slot."""
+    hoy = date.today()
+    pesos_sala = pesos_zipf(len(salas), args.sesgo)
+    ids_turno = [t for t, _ in turnos]
+    pesos_turno = pesos_turnos(turnos)
+    ocupados = set()
+    reservas = []
+
+    for _ in range(args.reservas):
+        nombre_sala, edificio = rnd.choices(salas, cum_weights=pesos_sala)[0][:2]
+        fecha = hoy + timedelta(days=rnd.randint(-args.dias, args.dias))
+        id_turno = rnd.choices(ids_turno, weights=pesos_turno)[0]
+
+        if fecha < hoy:
+            estado = rnd.choices(('finalizada', 'sin_asistencia', 'cancelada'), weights=(75, 10, 15))[0]
+        else:
+            estado = rnd.choices(('activa', 'cancelada'), weights=(85, 15))[0]
+
+        slot = (nombre_sala, edificio, fecha, id_turno)
+        if estado == 'activa':
+            if slot in ocupados:
+                estado = 'cancelada'
+            else:
+                ocupados.add(slot)
+        reservas.append(slot + (estado,))
+    return reservas
+
+
+def generar_participaciones(rnd, args, ids_reserva, estados, cis):
+    pesos_ci = pesos_zipf(len(cis), args.sesgo)
+    filas = []
+    for id_reserva, estado in zip(ids_reserva, estados):
+        cantidad = min(len(cis), 1 + int(rnd.expovariate(1.2)), args.max_participantes)
+        elegidos = set()
+        while len(elegidos) < cantidad:
+            elegidos.add(rnd.choices(cis, cum_weights=pesos_ci)[0])
+        for ci in elegidos:
+            if estado == 'finalizada':
+                asistencia = 1 if rnd.random() < 0.9 else 0
+            elif estado == 'sin_asistencia':
+                asistencia = 0
+            else:
+                asistencia = None
+            filas.append((ci, id_reserva, asistencia))
+    return filas
+
+
+def generar(args):
+    rnd = random.Random(args.semilla)
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT nombre_programa, tipo FROM programa_academico")
+        programas = cursor.fetchall()
+        cursor.execute("SELECT nombre_edificio FROM edificio")
+        edificios = [fila[0] for fila in cursor.fetchall()]
+        cursor.execute("SELECT id_turno, hora_inicio FROM turno ORDER BY id_turno")
+        turnos = cursor.fetchall()
+        if not (programas and edificios and turnos):
+            raise SystemExit("La base necesita programas académicos, edificios y turnos")
+
+        inicio = time.monotonic()
+        participantes, logins, ppa = generar_participantes(rnd, args, programas)
+        insertar_en_lotes(conn, cursor, "INSERT INTO participante (ci, nombre, apellido, email) VALUES (%s, %s, %s, %s)",
+                          participantes, args.lote)
+        insertar_en_lotes(conn, cursor, "INSERT INTO login (correo, contrasena_hash, ci_participante) VALUES (%s, %s, %s)",
+                          logins, args.lote)
+        insertar_en_lotes(conn, cursor, "INSERT INTO participante_programa_academico (ci_participante, nombre_programa, rol) "
+                                        "VALUES (%s, %s, %s)", ppa, args.lote)
+        print(f"{len(participantes)} participantes, {len(ppa)} inscripciones a programas")
+
+        salas = generar_salas(rnd, args, edificios)
+        insertar_en_lotes(conn, cursor, "INSERT INTO sala (nombre_sala, edificio, capacidad, tipo_sala) VALUES (%s, %s, %s, %s)",
+                          salas, args.lote)
+        print(f"{len(salas)} salas")
+
+        reservas = generar_reservas(rnd, args, salas, turnos)
+        cis = [fila[0] for fila in participantes]
+        total_participaciones = 0
+        for i in range(0, len(reservas), args.lote):
+            lote = reservas[i:i + args.lote]
+            cursor.execute("SELECT COALESCE(MAX(id_reserva), 0) FROM reserva")
+            ultimo_id = cursor.fetchone()[0]
+            cursor.executemany(
+                "INSERT INTO reserva (nombre_sala, edificio, fecha, id_turno, estado) VALUES (%s, %s, %s, %s, %s)",
+                lote
+            )
+            cursor.execute("SELECT id_reserva FROM reserva WHERE id_reserva > %s ORDER BY id_reserva", (ultimo_id,))
+            ids = [fila[0] for fila in cursor.fetchall()]
+            participaciones = generar_participaciones(rnd, args, ids, [r[4] for r in lote], cis)
+            cursor.executemany(
+                "INSERT INTO reserva_participante (ci_participante, id_reserva, asistencia) VALUES (%s, %s, %s)",
+                participaciones
+            )
+            conn.commit()
+            total_participaciones += len(participaciones)
+        print(f"{len(reservas)} reservas, {total_participaciones} participaciones")
+
+        reconstruir(conn)
+        cursor.close()
+        print(f"Datos generados en {time.monotonic() - inicio:.1f}s (resúmenes reconstruidos)")
+
+
+def limpiar(args):
+    patron_ci = PREFIJO_CI + '%'
+    patron_sala = PREFIJO_SALA + '%'
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Reservas en salas sintéticas o con algún participante sintético
+        cursor.execute(
+            """
+            SELECT id_reserva FROM reserva WHERE nombre_sala LIKE %s
+            UNION
+            SELECT id_reserva FROM reserva_participante WHERE ci_participante LIKE %s
+            """,
+            (patron_sala, patron_ci)
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+
+        for i in range(0, len(ids), args.lote):
+            lote = ids[i:i + args.lote]
+            marcadores = ', '.join(['%s'] * len(lote))
+            aplicar_reservas(cursor, lote, -1)
+            cursor.execute(f"DELETE FROM reserva_participante WHERE id_reserva IN ({marcadores})", lote)
+            cursor.execute(f"DELETE FROM reserva WHERE id_reserva IN ({marcadores})", lote)
+            conn.commit()
+
+        cursor.execute("DELETE FROM sancion_participante WHERE ci_participante LIKE %s", (patron_ci,))
+        cursor.execute("DELETE FROM participante_programa_academico WHERE ci_participante LIKE %s", (patron_ci,))
+        cursor.execute("DELETE FROM login WHERE ci_participante LIKE %s", (patron_ci,))
+        cursor.execute("DELETE FROM resumen_reserva_participante WHERE ci_participante LIKE %s", (patron_ci,))
+        cursor.execute("DELETE FROM participante WHERE ci LIKE %s", (patron_ci,))
+        cursor.execute("DELETE FROM resumen_reserva_sala WHERE nombre_sala LIKE %s", (patron_sala,))
+        cursor.execute("DELETE FROM sala WHERE nombre_sala LIKE %s", (patron_sala,))
+        conn.commit()
+        cursor.close()
+    print(f"Datos sintéticos eliminados ({len(ids)} reservas)")
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.limpiar:
+        limpiar(args)
+    else:
+        generar(args)
@@ -0,0 +1,114 @@
+"""
+Prueba de estrés de concurrencia para POST /api/reservas.
+
+Lanza N hilos que intentan reservar exactamente la misma sala, fecha y turno
+al mismo tiempo y verifica que haya un único ganador (200) y que el resto
+reciba 409. Al terminar comprueba en la base que quede una sola reserva activa
+para ese horario y borra las reservas creadas por la prueba.
+
+Uso (desde backend/):
+    python -m bench.stress_reserva --hilos 50
+"""
+import argparse
+import random
+import sys
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+from app import create_app, apagar
+from database import get_connection
+from resumenes import aplicar_reservas
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hilos', type=int, default=50)
+    parser.add_argument('--sala', default='Sala D1')
+    parser.add_argument('--edificio', default='Sede Pocitos')
+    parser.add_argument('--turno', type=int, default=1)
+    parser.add_argument('--ci', default='5.222.222-2', help='CI de un participante existente')
+    parser.add_argument('--email', default='stress@docentes.ucu.edu.uy',
+                        help='Email usado para determinar el rol (docente no tiene límites)')
+    parser.add_argument('--fecha', default=None, help='YYYY-MM-DD (por defecto una fecha lejana al azar)')
+    return parser.parse_args()
+
+
+def reservas_activas(args, fecha):
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT id_reserva FROM reserva
+            WHERE nombre_sala = %s AND edificio = %s AND fecha = %s
+              AND id_turno = %s AND estado = 'activa'
+            """,
+            (args.sala, args.edificio, fecha, args.turno)
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+        cursor.close()
+    return ids
+
+
+def limpiar(ids):
+    if not ids:
+        return
+    marcadores = ', '.join(['%s'] * len(ids))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        aplicar_reservas(cursor, ids, -1)
+        cursor.execute(f"DELETE FROM reserva_participante WHERE id_reserva IN ({marcadores})", ids)
+        cursor.execute(f"DELETE FROM reserva WHERE id_reserva IN ({marcadores})", ids)
+        conn.commit()
+        cursor.close()
+
+
+def main():
+    args = parse_args()
+    app = create_app()
+    fecha = args.fecha or (date(2099, 1, 1) + timedelta(days=random.randint(0, 3000))).isoformat()
+
+    payload = {
+        'nombre_sala': args.sala,
+        'edificio': args.edificio,
+        'fecha': fecha,
+        'id_turno': args.turno,
+        'ci_participante': args.ci,
+        'email': args.email,
+    }
+
+    barrera = threading.Barrier(args.hilos)
+    resultados = Counter()
+    ganadores = []
+    lock = threading.Lock()
+
+    def intentar():
+        cliente = app.test_client()
+        barrera.wait()
+        resp = cliente.post('/api/reservas', json=payload)
+        with lock:
+            resultados[resp.status_code] += 1
+            if resp.status_code == 200:
+                ganadores.append(resp.get_json()['id_reserva'])
+
+    hilos = [threading.Thread(target=intentar) for _ in range(args.hilos)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    activas = reservas_activas(args, fecha)
+    print(f"Slot: {args.sala} / {args.edificio} / {fecha} / turno {args.turno}")
+    print(f"Respuestas por código HTTP: {dict(sorted(resultados.items()))}")
+    print(f"Reservas activas en la base: {len(activas)}")
+
+    limpiar(sorted(set(activas) | set(ganadores)))
+    apagar()
+
+    ok = len(ganadores) == 1 and len(activas) == 1 and resultados[409] == args.hilos - 1
+    print("OK: un único ganador" if ok else "ERROR: se detectó doble reserva o fallos inesperados")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ============================================
+# CACHE EN MEMORIA CON TTL Y DESALOJO LRU
+# ============================================
+
+class CacheTTL:
+    """
+    Cache en memoria del proceso, segura entre hilos.
+
+    - Cada entrada vence a los `ttl` segundos de cargada.
+    - Si se supera `max_entradas` se desaloja la usada hace más tiempo (LRU).
+    - invalidar() descarta entradas; una carga que empezó antes de la
+      invalidación no llega a guardarse, así no se reinstalan datos viejos.
+    """
+
+    def __init__(self, ttl=300, max_entradas=128):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()  # clave -> (valor, vence_en)
+        self._generacion = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "expiradas": 0,
+            "desalojadas": 0,
+            "invalidaciones": 0,
+        }
+
+    def obtener(self, clave):
+        """Devuelve el valor cacheado o None si no está o venció."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, vence_en = entrada
+                if time.monotonic() < vence_en:
+                    self._datos.move_to_end(clave)
+                    self._stats["hits"] += 1
+                    return valor
+                del self._datos[clave]
+                self._stats["expiradas"] += 1
+            self._stats["misses"] += 1
+            return None
+
+    def guardar(self, clave, valor, generacion=None):
+        """
+        Guarda un valor. Si se pasa la generación leída antes de cargarlo y
+        hubo una invalidación en el medio, el valor se descarta.
+        """
+        with self._lock:
+            if generacion is not None and generacion != self._generacion:
+                return
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+                self._stats["desalojadas"] += 1
+
+    def obtener_o_cargar(self, clave, cargar):
+        """Devuelve el valor cacheado o lo calcula con cargar() y lo guarda."""
+        valor = self.obtener(clave)
+        if valor is not None:
+            return valor
+        with self._lock:
+            generacion = self._generacion
+        valor = cargar()
+        self.guardar(clave, valor, generacion)
+        return valor
+
+    def invalidar(self, *claves):
+        """Descarta las claves indicadas, o todo el cache si no se indica ninguna."""
+        with self._lock:
+            self._generacion += 1
+            self._stats["invalidaciones"] += 1
+            if not claves:
+                self._datos.clear()
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._datos)
+            stats["ttl"] = self.ttl
+            stats["max_entradas"] = self.max_entradas
+        consultas = stats["hits"] + stats["misses"]
+        stats["tasa_aciertos"] = round(stats["hits"] / consultas, 4) if consultas else 0
+        return stats
+
+
+# ============================================
+# CACHE DE RESULTADOS POR GENERACIÓN
+# ============================================
+
+class _Carga:
+    """Una carga en curso, compartida por los hilos que piden la misma clave."""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+class CacheGeneracional:
+    """
+    Cache de resultados que dependen de datos que cambian con las escrituras.
+
+    - Cada entrada se guarda con la generación vigente al cargarla.
+      nueva_generacion(), llamada después de cada escritura, descarta todas
+      las entradas anteriores.
+    - Si varios hilos piden la misma clave sin entrada, solo uno ejecuta
+      cargar(); el resto espera y recibe el mismo resultado (o el mismo error).
+    - Una carga que termina después de una nueva generación se entrega a
+      quienes la esperaban pero no se guarda.
+    - El `ttl` acota cuánto se sirve un resultado que no refleja escrituras
+      hechas por otros procesos.
+    """
+
+    def __init__(self, ttl=60, max_entradas=128):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.generacion = 0
+        self._datos = OrderedDict()  # clave -> (valor, vence_en)
+        self._en_curso = {}          # (clave, generación) -> _Carga
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "compartidas": 0,
+            "expiradas": 0,
+            "desalojadas": 0,
+            "generaciones": 0,
+            "errores": 0,
+        }
+
+    def obtener_o_cargar(self, clave, cargar):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                valor, vence_en = entrada
+                if time.monotonic() < vence_en:
+                    self._datos.move_to_end(clave)
+                    self._stats["hits"] += 1
+                    return valor
+                del self._datos[clave]
+                self._stats["expiradas"] += 1
+            generacion = self.generacion
+            carga = self._en_curso.get((clave, generacion))
+            lider = carga is None
+            if lider:
+                carga = self._en_curso[(clave, generacion)] = _Carga()
+                self._stats["misses"] += 1
+            else:
+                self._stats["compartidas"] += 1
+
+        if not lider:
+            carga.listo.wait()
+            if carga.error is not None:
+                raise carga.error
+            return carga.valor
+
+        try:
+            carga.valor = cargar()
+        except Exception as e:
+            carga.error = e
+            with self._lock:
+                self._stats["errores"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._en_curso[(clave, generacion)]
+                if carga.error is None and generacion == self.generacion:
+                    self._datos[clave] = (carga.valor, time.monotonic() + self.ttl)
+                    self._datos.move_to_end(clave)
+                    while len(self._datos) > self.max_entradas:
+                        self._datos.popitem(last=False)
+                        self._stats["desalojadas"] += 1
+            carga.listo.set()
+        return carga.valor
+
+    def nueva_generacion(self):
+        """Descarta todas las entradas; las cargas en curso ya no se guardan."""
+        with self._lock:
+            self.generacion += 1
+            self._stats["generaciones"] += 1
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entradas"] = len(self._datos)
+            stats["en_curso"] = len(self._en_curso)
+            stats["generacion"] = self.generacion
+            stats["ttl"] = self.ttl
+        consultas = stats["hits"] + stats["misses"] + stats["compartidas"]
+        stats["tasa_aciertos"] = round((stats["hits"] + stats["compartidas"]) / consultas, 4) if consultas else 0
+        return stats
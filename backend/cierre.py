@@ -0,0 +1,153 @@
+"""
+Cierre automático de reservas vencidas.
+
+Las reservas activas cuyo turno terminó hace más de CIERRE_MARGEN_MINUTOS
+pasan a 'finalizada' si algún participante tiene asistencia = 1, o a
+'sin_asistencia' si no; los participantes sin asistencia registrada quedan
+con asistencia = 0. Se procesan en lotes de CIERRE_LOTE reservas, cada
+uno en su propia transacción corta:
+    - SELECT ... LIMIT ... FOR UPDATE SKIP LOCKED toma las reservas del lote
+      sin esperar a las que otra transacción (u otro worker haciendo el
+      mismo cierre) tiene bloqueadas,
+    - se restan de los resúmenes, se actualizan estado y asistencias y se
+      vuelven a sumar,
+    - commit.
+Solo toca reservas que siguen activas, así que puede interrumpirse y volver
+a correr en cualquier momento. La app lo ejecuta cada CIERRE_INTERVALO
+segundos; también puede correrse a mano desde backend/:
+    python cierre.py
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from database import get_connection
+from resumenes import aplicar_reservas
+
+CIERRE_LOTE = int(os.getenv('CIERRE_LOTE', '500'))
+# Tiempo después del fin del turno para registrar la asistencia antes de cerrar
+CIERRE_MARGEN_MINUTOS = int(os.getenv('CIERRE_MARGEN_MINUTOS', '60'))
+
+logger = logging.getLogger('cierre')
+
+# Requiere idx_reserva_estado_fecha (migración 003)
+SQL_VENCIDAS = """
+    SELECT r.id_reserva
+    FROM reserva r
+    JOIN turno t ON r.id_turno = t.id_turno
+    WHERE r.estado = 'activa'
+      AND r.fecha <= %s
+      AND TIMESTAMP(r.fecha, t.hora_fin) <= %s
+    ORDER BY r.fecha, r.id_reserva
+    LIMIT %s
+    FOR UPDATE OF r SKIP LOCKED
+"""
+
+SQL_CERRAR = """
+    UPDATE reserva r
+    SET r.estado = IF(
+        EXISTS (
+            SELECT 1 FROM reserva_participante rp
+            WHERE rp.id_reserva = r.id_reserva AND rp.asistencia = 1
+        ),
+        'finalizada', 'sin_asistencia'
+    )
+    WHERE r.estado = 'activa' AND r.id_reserva IN ({marcadores})
+"""
+
+
+class EstadisticasCierre:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.corridas = 0
+        self.lotes = 0
+        self.finalizadas = 0
+        self.sin_asistencia = 0
+        self.segundos = 0.0
+        self.ultima_corrida = None
+
+    def registrar(self, resultado):
+        with self._lock:
+            self.corridas += 1
+            self.lotes += resultado['lotes']
+            self.finalizadas += resultado['finalizadas']
+            self.sin_asistencia += resultado['sin_asistencia']
+            self.segundos += resultado['segundos']
+            self.ultima_corrida = resultado
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                'corridas': self.corridas,
+                'lotes': self.lotes,
+                'finalizadas': self.finalizadas,
+                'sin_asistencia': self.sin_asistencia,
+                'segundos': round(self.segundos, 3),
+                'ultima_corrida': self.ultima_corrida,
+            }
+
+
+estadisticas = EstadisticasCierre()
+
+
+def cerrar_lote(conn, limite, lote=CIERRE_LOTE):
+    """
+    Cierra hasta `lote` reservas que terminaron antes de `limite` (datetime)
+    y hace commit. Devuelve {'finalizada': n, 'sin_asistencia': n}.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SQL_VENCIDAS, (limite.date(), limite, lote))
+    ids = [fila[0] for fila in cursor.fetchall()]
+    if not ids:
+        conn.rollback()
+        cursor.close()
+        return {'finalizada': 0, 'sin_asistencia': 0}
+
+    marcadores = ', '.join(['%s'] * len(ids))
+    aplicar_reservas(cursor, ids, -1)
+    cursor.execute(SQL_CERRAR.format(marcadores=marcadores), ids)
+    # Quien no registró asistencia hasta el cierre no asistió
+    cursor.execute(
+        f"UPDATE reserva_participante SET asistencia = 0 WHERE asistencia IS NULL AND id_reserva IN ({marcadores})",
+        ids
+    )
+    aplicar_reservas(cursor, ids, 1)
+    cursor.execute(
+        f"SELECT estado, COUNT(*) FROM reserva WHERE id_reserva IN ({marcadores}) GROUP BY estado",
+        ids
+    )
+    cantidades = dict(cursor.fetchall())
+    conn.commit()
+    cursor.close()
+    return {estado: cantidades.get(estado, 0) for estado in ('finalizada', 'sin_asistencia')}
+
+
+def cerrar_vencidas(conn, lote=CIERRE_LOTE, margen_minutos=CIERRE_MARGEN_MINUTOS, max_lotes=None):
+    """Cierra lotes hasta que no queden reservas vencidas (o max_lotes). Devuelve un resumen."""
+    inicio = time.monotonic()
+    limite = datetime.now().replace(microsecond=0) - timedelta(minutes=margen_minutos)
+    resultado = {'lotes': 0, 'finalizadas': 0, 'sin_asistencia': 0}
+    while max_lotes is None or resultado['lotes'] < max_lotes:
+        cerradas = cerrar_lote(conn, limite, lote)
+        if not any(cerradas.values()):
+            break
+        resultado['lotes'] += 1
+        resultado['finalizadas'] += cerradas['finalizada']
+        resultado['sin_asistencia'] += cerradas['sin_asistencia']
+        if sum(cerradas.values()) < lote:
+            break
+    resultado['segundos'] = round(time.monotonic() - inicio, 3)
+    estadisticas.registrar(resultado)
+    if resultado['lotes']:
+        logger.info("Cierre de reservas: %d finalizadas, %d sin asistencia en %d lotes (%.2fs)",
+                    resultado['finalizadas'], resultado['sin_asistencia'], resultado['lotes'], resultado['segundos'])
+    return resultado
+
+
+if __name__ == '__main__':
+    with get_connection() as conn:
+        resultado = cerrar_vencidas(conn)
+    print(f"{resultado['finalizadas']} reservas finalizadas, {resultado['sin_asistencia']} sin asistencia "
+          f"en {resultado['lotes']} lotes ({resultado['segundos']:.2f}s)")
@@ -0,0 +1,286 @@
+# ============================================
+# CONSULTAS SQL DE LOS CAMINOS CRÍTICOS
+# ============================================
+# Se definen en un solo lugar para que los endpoints, el servidor asíncrono
+# (asincrono.py) y las verificaciones de índices (migrate.py --explain) usen
+# exactamente el mismo SQL.
+
+# Disponibilidad de una sala para una fecha y turno.
+# slot_activo = 1 equivale a estado = 'activa' y completa la clave de
+# uq_reserva_slot_activo, así la consulta es una búsqueda única en el índice.
+SQL_DISPONIBILIDAD = """
+    SELECT COUNT(*) AS total
+    FROM reserva
+    WHERE nombre_sala = %s
+      AND edificio = %s
+      AND fecha = %s
+      AND id_turno = %s
+      AND slot_activo = 1
+"""
+
+# Consumo de cuota de un estudiante de grado (salas de uso libre), en una sola
+# consulta: duración del turno pedido, horas ya reservadas ese día y horas y
+# cantidad de reservas activas en la semana.
+# Parte de reserva_participante por su clave primaria (ci_participante, id_reserva)
+# y llega a reserva por PRIMARY, sin subconsultas IN dependientes. Si el turno
+# no existe no devuelve filas.
+SQL_CUOTA_ESTUDIANTE = """
+    SELECT
+        TIMESTAMPDIFF(HOUR, tn.hora_inicio, tn.hora_fin) AS duracion,
+        COALESCE(SUM(CASE WHEN r.fecha = %(fecha)s
+                          THEN TIMESTAMPDIFF(HOUR, t.hora_inicio, t.hora_fin) END), 0) AS horas_dia,
+        COALESCE(SUM(TIMESTAMPDIFF(HOUR, t.hora_inicio, t.hora_fin)), 0) AS horas_semana,
+        COUNT(r.id_reserva) AS reservas_semana
+    FROM turno tn
+    LEFT JOIN (
+        reserva_participante rp
+        JOIN reserva r ON r.id_reserva = rp.id_reserva
+        JOIN turno t ON t.id_turno = r.id_turno
+        JOIN sala s ON s.nombre_sala = r.nombre_sala AND s.edificio = r.edificio
+    ) ON rp.ci_participante = %(ci)s
+     AND r.fecha BETWEEN %(inicio_semana)s AND %(fin_semana)s
+     AND r.estado = 'activa'
+     AND s.tipo_sala = 'libre'
+    WHERE tn.id_turno = %(id_turno)s
+    GROUP BY tn.id_turno, tn.hora_inicio, tn.hora_fin
+"""
+
+# Lo mismo para varios participantes de una reserva, en una consulta: una fila
+# por CI existente con su email (para deducir el rol) y su consumo de cuota en
+# salas de uso libre, más la duración del turno pedido. Los CI que no
+# aparecen en el resultado no existen. Parámetros con nombre: ci0..ciN-1,
+# fecha, inicio_semana, fin_semana e id_turno.
+def sql_cuota_participantes(cantidad):
+    marcadores = ', '.join(f'%(ci{i})s' for i in range(cantidad))
+    return f"""
+        SELECT
+            p.ci,
+            p.email,
+            (SELECT TIMESTAMPDIFF(HOUR, tn.hora_inicio, tn.hora_fin)
+             FROM turno tn WHERE tn.id_turno = %(id_turno)s) AS duracion,
+            COALESCE(SUM(CASE WHEN r.fecha = %(fecha)s
+                              THEN TIMESTAMPDIFF(HOUR, t.hora_inicio, t.hora_fin) END), 0) AS horas_dia,
+            COUNT(r.id_reserva) AS reservas_semana
+        FROM participante p
+        LEFT JOIN (
+            reserva_participante rp
+            JOIN reserva r ON r.id_reserva = rp.id_reserva
+            JOIN turno t ON t.id_turno = r.id_turno
+            JOIN sala s ON s.nombre_sala = r.nombre_sala AND s.edificio = r.edificio
+        ) ON rp.ci_participante = p.ci
+         AND r.fecha BETWEEN %(inicio_semana)s AND %(fin_semana)s
+         AND r.estado = 'activa'
+         AND s.tipo_sala = 'libre'
+        WHERE p.ci IN ({marcadores})
+        GROUP BY p.ci, p.email
+    """
+
+# Edificio más usado por cada facultad (con empates), contando participaciones
+# participante × programa como el reporte original. Una sola pasada sobre
+# resumen_reserva_programa: RANK() por facultad en lugar de una subconsulta
+# correlacionada por cada grupo facultad × edificio.
+SQL_EDIFICIO_POR_FACULTAD = """
+    SELECT facultad, nombre_edificio, total
+    FROM (
+        SELECT
+            f.nombre AS facultad,
+            rp.edificio AS nombre_edificio,
+            CAST(SUM(rp.participaciones) AS SIGNED) AS total,
+            RANK() OVER (
+                PARTITION BY pa.id_facultad
+                ORDER BY SUM(rp.participaciones) DESC
+            ) AS posicion
+        FROM resumen_reserva_programa rp
+        JOIN programa_academico pa ON rp.nombre_programa = pa.nombre_programa
+        JOIN facultad f ON pa.id_facultad = f.id_facultad
+        GROUP BY pa.id_facultad, f.nombre, rp.edificio
+        HAVING SUM(rp.participaciones) > 0
+    ) ranking
+    WHERE posicion = 1
+    ORDER BY total DESC, facultad
+"""
+
+# Ocupación entre dos fechas: horas reservadas sobre horas disponibles.
+# - calendario × turno es la dimensión de slots del rango (un slot por día y
+#   turno de cada sala); sus horas son las disponibles de cada sala.
+# - Las horas reservadas salen de resumen_reserva_sala en una sola lectura
+#   del rango por idx_resumen_sala_fecha, sin recorrer reservas fuera de él.
+# Un slot está ocupado si tiene alguna reserva activa, finalizada o sin
+# asistencia; las canceladas liberaron el slot. Las horas se cuentan una vez
+# por slot ocupado, aunque tenga varias reservas, así el porcentaje no pasa
+# de 100. Parámetros: (desde, hasta, desde, hasta).
+# WITH RECURSIVE está limitado por cte_max_recursion_depth (1000 días).
+_SQL_OCUPACION = """
+    WITH RECURSIVE calendario (fecha) AS (
+        SELECT CAST(%s AS DATE)
+        UNION ALL
+        SELECT fecha + INTERVAL 1 DAY FROM calendario WHERE fecha < %s
+    ),
+    slots AS (
+        SELECT
+            COUNT(*) AS turnos,
+            SUM(TIME_TO_SEC(TIMEDIFF(t.hora_fin, t.hora_inicio))) / 3600 AS horas
+        FROM calendario c
+        CROSS JOIN turno t
+    ),
+    ocupado AS (
+        SELECT rs.nombre_sala, rs.edificio, rs.id_turno, SUM(rs.reservas) AS reservas
+        FROM resumen_reserva_sala rs
+        WHERE rs.fecha BETWEEN %s AND %s
+          AND rs.estado <> 'cancelada'
+        GROUP BY rs.nombre_sala, rs.edificio, rs.fecha, rs.id_turno
+        HAVING SUM(rs.reservas) > 0
+    ),
+    reservado AS (
+        SELECT
+            o.nombre_sala,
+            o.edificio,
+            SUM(o.reservas) AS reservas,
+            COUNT(*) AS slots,
+            SUM(TIME_TO_SEC(TIMEDIFF(t.hora_fin, t.hora_inicio))) / 3600 AS horas
+        FROM ocupado o
+        JOIN turno t ON o.id_turno = t.id_turno
+        GROUP BY o.nombre_sala, o.edificio
+    )
+    SELECT
+        {columnas},
+        CAST(COALESCE(SUM(r.reservas), 0) AS SIGNED) AS total_reservas,
+        CAST(COALESCE(SUM(r.slots), 0) AS SIGNED) AS slots_ocupados,
+        ROUND(COALESCE(SUM(r.horas), 0), 2) AS horas_reservadas,
+        COUNT(s.nombre_sala) * slots.turnos AS slots_disponibles,
+        ROUND(COUNT(s.nombre_sala) * slots.horas, 2) AS horas_disponibles,
+        ROUND(COALESCE(SUM(r.horas) / (COUNT(s.nombre_sala) * slots.horas), 0) * 100, 2) AS porcentaje
+    FROM {origen}
+    LEFT JOIN reservado r ON s.nombre_sala = r.nombre_sala AND s.edificio = r.edificio
+    CROSS JOIN slots
+    GROUP BY {grupo}, slots.turnos, slots.horas
+    ORDER BY porcentaje DESC, {grupo}
+"""
+
+# Ocupación por edificio o, con por_sala, por sala
+def sql_ocupacion(por_sala=False):
+    if por_sala:
+        return _SQL_OCUPACION.format(
+            columnas="s.nombre_sala, s.edificio, s.tipo_sala, s.capacidad",
+            origen="sala s",
+            grupo="s.nombre_sala, s.edificio, s.tipo_sala, s.capacidad",
+        )
+    return _SQL_OCUPACION.format(
+        columnas="e.nombre_edificio, COUNT(s.nombre_sala) AS total_salas",
+        origen="edificio e LEFT JOIN sala s ON e.nombre_edificio = s.edificio",
+        grupo="e.nombre_edificio",
+    )
+
+# Turnos ocupados por reservas activas en un rango de fechas, como un entero
+# por sala y día con el bit id_turno encendido. La usan la grilla de
+# disponibilidad y el índice de ocupación (ocupacion.py). Recorre
+# idx_reserva_estado_fecha (migración 003). Parámetros: desde, hasta y los de
+# filtros, condiciones sobre la sala s como " AND s.edificio = %s".
+def sql_turnos_ocupados(filtros=""):
+    sala = "JOIN sala s ON r.nombre_sala = s.nombre_sala AND r.edificio = s.edificio" if filtros else ""
+    return f"""
+        SELECT
+            r.nombre_sala,
+            r.edificio,
+            r.fecha,
+            BIT_OR(1 << r.id_turno) AS ocupados
+        FROM reserva r
+        {sala}
+        WHERE r.estado = 'activa'
+          AND r.fecha BETWEEN %s AND %s
+          {filtros}
+        GROUP BY r.nombre_sala, r.edificio, r.fecha
+    """
+
+# Reservas activas de un conjunto de slots (nombre_sala, edificio, fecha,
+# id_turno) en una sola consulta, para las reservas en lote. El IN de
+# constructores de fila se resuelve como búsquedas en uq_reserva_slot_activo.
+def sql_slots_activos(cantidad):
+    filas = ', '.join(['(%s, %s, %s, %s)'] * cantidad)
+    return f"""
+        SELECT id_reserva, nombre_sala, edificio, fecha, id_turno
+        FROM reserva
+        WHERE slot_activo = 1
+          AND (nombre_sala, edificio, fecha, id_turno) IN ({filas})
+    """
+
+# Catálogos de turnos y salas (GET /api/turnos y GET /api/salas)
+SQL_TURNOS = """
+    SELECT id_turno, TIME_FORMAT(hora_inicio, '%H:%i') as hora_inicio, TIME_FORMAT(hora_fin, '%H:%i') as hora_fin
+    FROM turno
+    ORDER BY hora_inicio
+"""
+
+SQL_SALAS = """
+    SELECT 
+        s.nombre_sala,
+        s.edificio,
+        s.capacidad,
+        s.tipo_sala,
+        e.direccion,
+        e.departamento
+    FROM sala s
+    LEFT JOIN edificio e
+        ON s.edificio = e.nombre_edificio
+    ORDER BY s.edificio, s.nombre_sala
+"""
+
+
+def filtros_reservas(args):
+    """
+    Arma las condiciones WHERE para los filtros opcionales de GET /api/reservas:
+    desde, hasta, estado, edificio y sala.
+    """
+    condiciones = []
+    params = []
+    if args.get('desde'):
+        condiciones.append("r.fecha >= %s")
+        params.append(args.get('desde'))
+    if args.get('hasta'):
+        condiciones.append("r.fecha <= %s")
+        params.append(args.get('hasta'))
+    if args.get('estado'):
+        condiciones.append("r.estado = %s")
+        params.append(args.get('estado'))
+    if args.get('edificio'):
+        condiciones.append("r.edificio = %s")
+        params.append(args.get('edificio'))
+    if args.get('sala'):
+        condiciones.append("r.nombre_sala = %s")
+        params.append(args.get('sala'))
+    return condiciones, params
+
+
+# Reservas de un participante (GET /api/reservas?ci_participante=...). El
+# primer parámetro es la CI; condiciones viene de filtros_reservas(). Con
+# paginado se agrega la clave de orden (fecha_orden, hora_orden) y un LIMIT
+# %s como último parámetro, para el mismo cursor que el listado general.
+def sql_reservas_participante(condiciones, paginado=False):
+    filtros = ''.join(f" AND {c}" for c in condiciones)
+    clave = """,
+            r.fecha AS fecha_orden,
+            TIME_FORMAT(t.hora_inicio, '%H:%i:%s') AS hora_orden""" if paginado else ""
+    return f"""
+        SELECT 
+            r.id_reserva,
+            r.nombre_sala,
+            r.edificio,
+            DATE_FORMAT(r.fecha, '%d/%m/%Y') as fecha,
+            TIME_FORMAT(t.hora_inicio, '%H:%i') as hora_inicio,
+            TIME_FORMAT(t.hora_fin, '%H:%i') as hora_fin,
+            r.estado,
+            COUNT(rp.ci_participante) AS cantidad_participantes{clave}
+        FROM reserva r
+        JOIN turno t ON r.id_turno = t.id_turno
+        LEFT JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
+        WHERE r.id_reserva IN (
+            SELECT rp2.id_reserva 
+            FROM reserva_participante rp2 
+            WHERE rp2.ci_participante = %s
+        ){filtros}
+        GROUP BY 
+            r.id_reserva, r.nombre_sala, r.edificio, r.fecha,
+            t.hora_inicio, t.hora_fin, r.estado
+        ORDER BY r.fecha DESC, t.hora_inicio, r.id_reserva
+        {"LIMIT %s" if paginado else ""}
+    """
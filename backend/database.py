@@ -1,6 +1,8 @@
 import mysql.connector
 import os
 import base64
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -25,5 +27,270 @@ DB_CONFIG = {
     "collation": "utf8mb4_unicode_ci",
 }
 
+POOL_CONFIG = {
+    # Conexiones que se mantienen abiertas de forma permanente
+    "size": int(os.getenv("DB_POOL_SIZE", "5")),
+    # Conexiones extra que se abren en picos y se cierran al devolverse
+    "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "10")),
+    # Segundos que se espera por una conexión libre antes de fallar
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    # Edad máxima (segundos) de una conexión antes de reciclarla
+    "recycle": float(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+
+
+# ============================================
+# POOL DE CONEXIONES
+# ============================================
+
+class PoolTimeoutError(Exception):
+    """No se obtuvo una conexión libre dentro del tiempo de espera del pool."""
+
+
+class PoolCerradoError(Exception):
+    """El pool se cerró (apagado del proceso) y ya no presta conexiones."""
+
+
+class ConexionPool:
+    """
+    Conexión prestada por el pool. Se comporta como la conexión de
+    mysql.connector, pero close() la devuelve al pool en vez de cerrarla.
+    Se puede usar como context manager:
+
+        with get_connection() as conn:
+            ...
+    """
+
+    def __init__(self, pool, raw, creada):
+        self._pool = pool
+        self._raw = raw
+        self._creada = creada
+
+    def __getattr__(self, nombre):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError("La conexión ya fue devuelta al pool")
+        return getattr(self._raw, nombre)
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        self._pool._devolver(raw, self._creada)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and self._raw is not None:
+            try:
+                self._raw.rollback()
+            except mysql.connector.Error:
+                pass
+        self.close()
+        return False
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones MySQL con tamaño fijo más un margen de desborde.
+    Las conexiones se verifican (ping) al prestarse y se reciclan cuando
+    superan la edad máxima configurada.
+    """
+
+    def __init__(self, config, size=5, max_overflow=10, timeout=5.0, recycle=1800.0):
+        self._config = config
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+
+        self._libres = []  # pila de (conexión, instante de creación)
+        self._abiertas = 0
+        self._prestadas = 0
+        self._cerrado = False
+        # Último instante en que se prestó una conexión verificada
+        self._ultimo_ok = None
+        self._cond = threading.Condition()
+
+        self._stats = {
+            "prestamos": 0,
+            "esperas": 0,
+            "tiempo_espera_total": 0.0,
+            "tiempo_espera_max": 0.0,
+            "timeouts": 0,
+            "creadas": 0,
+            "recicladas": 0,
+            "descartadas": 0,
+        }
+
+    def _crear(self):
+        raw = mysql.connector.connect(**self._config)
+        with self._cond:
+            self._stats["creadas"] += 1
+        return raw, time.monotonic()
+
+    def _cerrar(self, raw):
+        try:
+            raw.close()
+        except mysql.connector.Error:
+            pass
+
+    def _viva(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def obtener(self):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        espero = False
+
+        with self._cond:
+            while True:
+                if self._cerrado:
+                    raise PoolCerradoError("El pool de conexiones está cerrado")
+                if self._libres:
+                    raw, creada = self._libres.pop()
+                    break
+                if self._abiertas < self.size + self.max_overflow:
+                    raw, creada = None, None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"No hay conexiones libres en el pool tras {self.timeout}s"
+                    )
+                espero = True
+                self._cond.wait(restante)
+
+            # Reservar el lugar antes de soltar el lock
+            if raw is None:
+                self._abiertas += 1
+            self._prestadas += 1
+            self._stats["prestamos"] += 1
+            if espero:
+                esperado = time.monotonic() - inicio
+                self._stats["esperas"] += 1
+                self._stats["tiempo_espera_total"] += esperado
+                self._stats["tiempo_espera_max"] = max(self._stats["tiempo_espera_max"], esperado)
+
+        try:
+            if raw is not None and time.monotonic() - creada > self.recycle:
+                self._cerrar(raw)
+                raw = None
+                with self._cond:
+                    self._stats["recicladas"] += 1
+            elif raw is not None and not self._viva(raw):
+                self._cerrar(raw)
+                raw = None
+                with self._cond:
+                    self._stats["descartadas"] += 1
+
+            if raw is None:
+                raw, creada = self._crear()
+            self._ultimo_ok = time.monotonic()
+        except Exception:
+            # No se pudo abrir la conexión: liberar el lugar reservado
+            with self._cond:
+                self._abiertas -= 1
+                self._prestadas -= 1
+                self._cond.notify()
+            raise
+
+        return ConexionPool(self, raw, creada)
+
+    def _devolver(self, raw, creada):
+        try:
+            if raw.in_transaction:
+                raw.rollback()
+            reutilizable = raw.is_connected()
+        except mysql.connector.Error:
+            reutilizable = False
+
+        with self._cond:
+            self._prestadas -= 1
+            if reutilizable and not self._cerrado and len(self._libres) < self.size:
+                self._libres.append((raw, creada))
+                raw = None
+            else:
+                self._abiertas -= 1
+            self._cond.notify()
+
+        if raw is not None:
+            self._cerrar(raw)
+
+    def cerrar(self, espera=0):
+        """
+        Cierra el pool: deja de prestar conexiones, espera hasta `espera`
+        segundos a que se devuelvan las prestadas y cierra todas las libres.
+        Las que se devuelvan después se cierran al devolverse.
+        """
+        limite = time.monotonic() + espera
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+            while self._prestadas > 0:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                self._cond.wait(restante)
+            libres, self._libres = self._libres, []
+            self._abiertas -= len(libres)
+        for raw, _ in libres:
+            self._cerrar(raw)
+
+    def verificar(self, ttl=10.0):
+        """
+        Comprueba que la base responda. Si el pool prestó una conexión
+        verificada hace menos de `ttl` segundos no toca la base; si no, pide
+        una conexión al pool (que reutiliza una libre y le hace ping).
+        Lanza la excepción de conexión si la base no responde.
+        """
+        ultimo = self._ultimo_ok
+        if ultimo is not None and time.monotonic() - ultimo < ttl:
+            return
+        self.obtener().close()
+
+    def estadisticas(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "abiertas": self._abiertas,
+                "prestadas": self._prestadas,
+                "libres": len(self._libres),
+                "cerrado": self._cerrado,
+            })
+        stats["tiempo_espera_total"] = round(stats["tiempo_espera_total"], 4)
+        stats["tiempo_espera_max"] = round(stats["tiempo_espera_max"], 4)
+        return stats
+
+
+pool = PoolConexiones(DB_CONFIG, **POOL_CONFIG)
+
+def configurar_pool(**cambios):
+    """
+    Reemplaza el pool del proceso con otra configuración (por ejemplo el
+    tamaño según los hilos del servidor). Debe llamarse antes de atender
+    peticiones; los valores None mantienen la configuración actual.
+    """
+    global pool
+    config = dict(POOL_CONFIG, **{k: v for k, v in cambios.items() if v is not None})
+    anterior, pool = pool, PoolConexiones(DB_CONFIG, **config)
+    anterior.cerrar()
+
 def get_connection():
-    return mysql.connector.connect(**DB_CONFIG)
\ No newline at end of file
+    return pool.obtener()
+
+def get_pool_stats():
+    return pool.estadisticas()
+
+def verificar_conexion(ttl=10.0):
+    pool.verificar(ttl)
+
+def cerrar_pool(espera=0):
+    pool.cerrar(espera)
@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import deque
+
+
+# ============================================
+# PUB/SUB EN MEMORIA PARA EVENTOS DE RESERVAS
+# ============================================
+
+class Suscripcion:
+    """
+    Cola acotada de eventos de un suscriptor, con filtro por edificio y rango
+    de fechas. Si el cliente no consume a tiempo y la cola se llena, los
+    eventos nuevos se descartan y el próximo evento entregado es 'resync',
+    para que el cliente vuelva a pedir la grilla completa.
+    """
+
+    def __init__(self, edificio=None, desde=None, hasta=None, max_eventos=100):
+        self.edificio = edificio
+        self.desde = desde
+        self.hasta = hasta
+        self.max_eventos = max_eventos
+        self.descartados = 0
+        self.cerrada = False
+        self._cola = deque()
+        self._desbordada = False
+        self._cond = threading.Condition()
+
+    def acepta(self, evento):
+        if self.edificio and evento['edificio'] != self.edificio:
+            return False
+        if self.desde and evento['fecha'] < self.desde:
+            return False
+        if self.hasta and evento['fecha'] > self.hasta:
+            return False
+        return True
+
+    def encolar(self, evento):
+        with self._cond:
+            if len(self._cola) >= self.max_eventos:
+                self._desbordada = True
+                self.descartados += 1
+                return
+            self._cola.append(evento)
+            self._cond.notify()
+
+    def esperar(self, timeout):
+        """
+        Devuelve los eventos pendientes, esperando hasta `timeout` segundos a
+        que llegue alguno. Lista vacía si venció el tiempo o se cerró.
+        """
+        with self._cond:
+            if not self._cola and not self._desbordada and not self.cerrada:
+                self._cond.wait(timeout)
+            if self._desbordada:
+                # Lo encolado ya no alcanza para reconstruir el estado
+                self._cola.clear()
+                self._desbordada = False
+                return [{'tipo': 'resync'}]
+            eventos = list(self._cola)
+            self._cola.clear()
+            return eventos
+
+    def cerrar(self):
+        with self._cond:
+            self.cerrada = True
+            self._cond.notify_all()
+
+
+class BusEventos:
+    """
+    Distribuye eventos entre las suscripciones del proceso. publicar() no
+    bloquea: solo copia el evento a las colas de los suscriptores que lo
+    aceptan, así una conexión lenta no frena a quien escribe la reserva.
+    """
+
+    def __init__(self, max_suscriptores=200, max_eventos=100):
+        self.max_suscriptores = max_suscriptores
+        self.max_eventos = max_eventos
+        self._suscripciones = set()
+        self._secuencia = 0
+        self._cerrado = False
+        self._lock = threading.Lock()
+        self._stats = {"publicados": 0, "entregados": 0, "rechazadas": 0, "descartados": 0}
+
+    def suscribir(self, edificio=None, desde=None, hasta=None):
+        """Devuelve una Suscripcion, o None si se llegó al máximo de suscriptores."""
+        with self._lock:
+            if self._cerrado or len(self._suscripciones) >= self.max_suscriptores:
+                self._stats["rechazadas"] += 1
+                return None
+            suscripcion = Suscripcion(edificio, desde, hasta, self.max_eventos)
+            self._suscripciones.add(suscripcion)
+            return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            if suscripcion in self._suscripciones:
+                self._suscripciones.discard(suscripcion)
+                self._stats["descartados"] += suscripcion.descartados
+        suscripcion.cerrar()
+
+    def publicar(self, evento):
+        with self._lock:
+            self._secuencia += 1
+            evento = dict(evento, id=self._secuencia, ts=time.time())
+            destinos = [s for s in self._suscripciones if s.acepta(evento)]
+            self._stats["publicados"] += 1
+            self._stats["entregados"] += len(destinos)
+        for suscripcion in destinos:
+            suscripcion.encolar(evento)
+
+    def cerrar(self):
+        """Cierra todas las suscripciones (apagado) y no acepta nuevas."""
+        with self._lock:
+            self._cerrado = True
+            suscripciones, self._suscripciones = self._suscripciones, set()
+        for suscripcion in suscripciones:
+            suscripcion.cerrar()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "suscriptores": len(self._suscripciones),
+                "descartados": self._stats["descartados"] + sum(s.descartados for s in self._suscripciones),
+            }
+
+
+def evento_reserva(tipo, id_reserva, nombre_sala, edificio, fecha, id_turno, estado, estado_anterior=None):
+    """
+    Arma el evento de una reserva; fecha se normaliza a 'YYYY-MM-DD'. El slot
+    queda ocupado si tipo no es 'eliminada' y estado es 'activa', y se libera
+    si no lo es y estado_anterior es 'activa'.
+    """
+    return {
+        'tipo': tipo,
+        'id_reserva': id_reserva,
+        'nombre_sala': nombre_sala,
+        'edificio': edificio,
+        'fecha': fecha if isinstance(fecha, str) else fecha.isoformat(),
+        'id_turno': int(id_turno),
+        'estado': estado,
+        'estado_anterior': estado_anterior,
+    }
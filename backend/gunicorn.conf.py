@@ -0,0 +1,55 @@
+"""
+Configuración de gunicorn para producción (ver wsgi.py):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Cada worker es un proceso con su propio pool de conexiones, así que el pool
+se dimensiona por worker: una conexión permanente por hilo y un desborde
+acotado para que workers × (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW) no supere
+DB_MAX_CONEXIONES. Los valores de DB_POOL_SIZE y DB_POOL_MAX_OVERFLOW
+exportados en el entorno tienen prioridad sobre este cálculo y sobre .env.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', '4'))
+# Los workers lo leen para limitar los streams de eventos (ver app.create_app)
+os.environ.setdefault('WEB_THREADS', str(threads))
+worker_class = 'gthread'
+timeout = int(os.getenv('WEB_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+
+# Cada worker debe abrir sus conexiones después del fork, nunca heredarlas
+preload_app = False
+
+# Tope de conexiones a MySQL de todo el servidor (max_connections menos un margen)
+conexiones_por_worker = max(1, int(os.getenv('DB_MAX_CONEXIONES', '100')) // workers)
+os.environ.setdefault('DB_POOL_SIZE', str(min(threads, conexiones_por_worker)))
+os.environ.setdefault('DB_POOL_MAX_OVERFLOW',
+                      str(max(0, conexiones_por_worker - int(os.environ['DB_POOL_SIZE']))))
+
+
+def post_worker_init(worker):
+    # Con SIGTERM el worker deja de aceptar conexiones y espera hasta
+    # graceful_timeout a las peticiones en curso. Mientras tanto /api/ready
+    # debe responder 503 y los streams de eventos deben cortarse, así que se
+    # envuelve el manejador de gunicorn para iniciar el apagado enseguida.
+    # Se hace en otro hilo: el manejador no debe tomar los locks del bus.
+    from app import iniciar_apagado
+    anterior = signal.getsignal(signal.SIGTERM)
+
+    def al_terminar(signum, frame):
+        threading.Thread(target=iniciar_apagado, daemon=True).start()
+        if callable(anterior):
+            anterior(signum, frame)
+
+    signal.signal(signal.SIGTERM, al_terminar)
+
+
+def worker_exit(server, worker):
+    # Al terminar el worker (ya sin peticiones en curso) se cierra el pool
+    from app import apagar
+    apagar(graceful_timeout)
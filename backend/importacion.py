@@ -0,0 +1,310 @@
+"""
+Importación masiva de participantes, logins e inscripciones a programas.
+
+Lee un archivo CSV, JSON (lista de objetos) o NDJSON fila por fila. Cada fila
+tiene las columnas:
+    ci, nombre, apellido, email          (obligatorias)
+    correo, contrasena_hash              (login; correo vale email si falta)
+    programa, rol                        (inscripción; rol alumno o docente)
+
+Las filas válidas se agrupan en lotes y cada lote se guarda con un INSERT de
+varias filas con ON DUPLICATE KEY UPDATE por tabla, seguido de un commit.
+Si un lote falla se reintenta fila por fila para identificar las rechazadas
+sin perder el resto. Un participante con varios programas va en varias filas.
+Si se importaron inscripciones, al final se recalcula el resumen de reservas
+por programa (ver resumenes.py).
+
+Uso (desde backend/, con la migración 005 aplicada):
+    python importacion.py alumnos.csv
+    python importacion.py alumnos.json --lote 1000
+"""
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+import time
+
+import mysql.connector
+
+from database import get_connection
+from resumenes import recalcular_inscripciones
+
+IMPORTACION_LOTE = 500
+# Rechazos que se detallan en el resultado; el resto solo se cuenta
+MAX_RECHAZOS_DETALLADOS = 1000
+
+FORMATOS = ('csv', 'json', 'ndjson')
+ROLES = ('alumno', 'docente')
+
+_RE_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+SQL_PARTICIPANTES = """
+    INSERT INTO participante (ci, nombre, apellido, email)
+    VALUES {valores} AS nuevo
+    ON DUPLICATE KEY UPDATE
+        nombre = nuevo.nombre,
+        apellido = nuevo.apellido,
+        email = nuevo.email
+"""
+
+# Una fila sin contrasena_hash no borra la contraseña de un login existente
+SQL_LOGINS = """
+    INSERT INTO login (correo, contrasena_hash, ci_participante)
+    VALUES {valores} AS nuevo
+    ON DUPLICATE KEY UPDATE
+        correo = nuevo.correo,
+        contrasena_hash = IF(nuevo.contrasena_hash = '', login.contrasena_hash, nuevo.contrasena_hash)
+"""
+
+# Requiere uq_ppa_participante_programa (migración 005)
+SQL_INSCRIPCIONES = """
+    INSERT INTO participante_programa_academico (ci_participante, nombre_programa, rol)
+    VALUES {valores} AS nuevo
+    ON DUPLICATE KEY UPDATE
+        rol = nuevo.rol
+"""
+
+
+# ============================================
+# LECTURA Y VALIDACIÓN
+# ============================================
+
+def detectar_formato(nombre_archivo=None, content_type=None):
+    """Deduce el formato por la extensión o el Content-Type; None si no se reconoce."""
+    nombre = (nombre_archivo or '').lower()
+    for formato in FORMATOS:
+        if nombre.endswith('.' + formato):
+            return formato
+    tipo = (content_type or '').split(';')[0].strip().lower()
+    return {
+        'text/csv': 'csv',
+        'application/json': 'json',
+        'application/x-ndjson': 'ndjson',
+    }.get(tipo)
+
+
+def leer_filas(binario, formato):
+    """
+    Genera (número de fila, dict) a partir de un archivo binario. CSV y NDJSON
+    se leen de a una línea; JSON se carga entero porque es una sola lista.
+    """
+    texto = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        for numero, fila in enumerate(csv.DictReader(texto), start=1):
+            yield numero, fila
+    elif formato == 'ndjson':
+        for numero, linea in enumerate(texto, start=1):
+            if linea.strip():
+                try:
+                    yield numero, json.loads(linea)
+                except ValueError:
+                    yield numero, None
+    elif formato == 'json':
+        datos = json.load(texto)
+        if not isinstance(datos, list):
+            raise ValueError('El JSON debe ser una lista de objetos')
+        for numero, fila in enumerate(datos, start=1):
+            yield numero, fila
+    else:
+        raise ValueError(f'Formato no soportado: {formato}')
+
+
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    return str(valor).strip() if valor is not None else ''
+
+
+def validar_fila(fila, programas):
+    """Devuelve (registro, None) o (None, motivo del rechazo)."""
+    if not isinstance(fila, dict):
+        return None, 'Fila con formato inválido'
+
+    registro = {campo: _texto(fila, campo) for campo in
+                ('ci', 'nombre', 'apellido', 'email', 'correo', 'contrasena_hash', 'programa', 'rol')}
+    for campo in ('ci', 'nombre', 'apellido', 'email'):
+        if not registro[campo]:
+            return None, f'Campo requerido: {campo}'
+    registro['correo'] = registro['correo'] or registro['email']
+    for campo in ('email', 'correo'):
+        if not _RE_EMAIL.match(registro[campo]):
+            return None, f'{campo} inválido: {registro[campo]}'
+
+    if registro['programa']:
+        if registro['programa'] not in programas:
+            return None, f"Programa inexistente: {registro['programa']}"
+        # Sin rol explícito se usa el dominio del email, como en el login
+        registro['rol'] = registro['rol'] or ('docente' if '@docentes.ucu.edu.uy' in registro['email'].lower() else 'alumno')
+        if registro['rol'] not in ROLES:
+            return None, f"Rol inválido: {registro['rol']}"
+    return registro, None
+
+
+# ============================================
+# ESCRITURA POR LOTES
+# ============================================
+
+def _insertar_filas(cursor, sql, filas):
+    if not filas:
+        return
+    columnas = len(filas[0])
+    valores = ', '.join(['(' + ', '.join(['%s'] * columnas) + ')'] * len(filas))
+    cursor.execute(sql.format(valores=valores), [v for fila in filas for v in fila])
+
+
+def _conflictos(cursor, sql, claves):
+    """
+    {clave en minúsculas: ci} de las claves (email o correo) que ya existen en
+    la base. La intercalación de las columnas no distingue mayúsculas, así que
+    las comparaciones se hacen en minúsculas.
+    """
+    if not claves:
+        return {}
+    cursor.execute(sql.format(marcadores=', '.join(['%s'] * len(claves))), list(claves))
+    return {clave.lower(): ci for clave, ci in cursor.fetchall()}
+
+
+def _depurar_lote(cursor, lote):
+    """
+    Separa del lote las filas cuyo email o correo ya pertenece a otro
+    participante (en la base o antes en el mismo lote). Un upsert sobre esas
+    claves únicas modificaría al otro participante.
+    Devuelve (filas aceptadas, [(número, motivo)]).
+    """
+    emails = _conflictos(cursor, "SELECT email, ci FROM participante WHERE email IN ({marcadores})",
+                         {r['email'] for _, r in lote})
+    correos = _conflictos(cursor, "SELECT correo, ci_participante FROM login WHERE correo IN ({marcadores})",
+                          {r['correo'] for _, r in lote})
+    aceptadas, rechazadas = [], []
+    for numero, registro in lote:
+        if emails.setdefault(registro['email'].lower(), registro['ci']) != registro['ci']:
+            rechazadas.append((numero, f"El email {registro['email']} pertenece a otro participante"))
+        elif correos.setdefault(registro['correo'].lower(), registro['ci']) != registro['ci']:
+            rechazadas.append((numero, f"El correo {registro['correo']} pertenece a otro participante"))
+        else:
+            aceptadas.append((numero, registro))
+    return aceptadas, rechazadas
+
+
+def _guardar(cursor, registros):
+    # La última fila de cada CI define sus datos personales y su login
+    participantes = {r['ci']: (r['ci'], r['nombre'], r['apellido'], r['email']) for r in registros}
+    logins = {r['ci']: (r['correo'], r['contrasena_hash'], r['ci']) for r in registros}
+    inscripciones = {
+        (r['ci'], r['programa']): (r['ci'], r['programa'], r['rol'])
+        for r in registros if r['programa']
+    }
+    _insertar_filas(cursor, SQL_PARTICIPANTES, list(participantes.values()))
+    _insertar_filas(cursor, SQL_LOGINS, list(logins.values()))
+    _insertar_filas(cursor, SQL_INSCRIPCIONES, list(inscripciones.values()))
+
+
+def _guardar_lote(conn, cursor, lote, resultado):
+    aceptadas, rechazadas = _depurar_lote(cursor, lote)
+    for numero, motivo in rechazadas:
+        resultado.rechazar(numero, motivo)
+    try:
+        _guardar(cursor, [r for _, r in aceptadas])
+        conn.commit()
+        resultado.importadas += len(aceptadas)
+        return
+    except mysql.connector.Error:
+        conn.rollback()
+
+    # El lote falló: reintentar de a una fila para aislar las que fallan
+    for numero, registro in aceptadas:
+        try:
+            _guardar(cursor, [registro])
+            conn.commit()
+            resultado.importadas += 1
+        except mysql.connector.Error as e:
+            conn.rollback()
+            resultado.rechazar(numero, e.msg)
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.procesadas = 0
+        self.importadas = 0
+        self.rechazadas = 0
+        self.detalle_rechazos = []
+        self.lotes = 0
+
+    def rechazar(self, numero, motivo):
+        self.rechazadas += 1
+        if len(self.detalle_rechazos) < MAX_RECHAZOS_DETALLADOS:
+            self.detalle_rechazos.append({'fila': numero, 'error': motivo})
+
+    def como_dict(self):
+        return {
+            'procesadas': self.procesadas,
+            'importadas': self.importadas,
+            'rechazadas': self.rechazadas,
+            'lotes': self.lotes,
+            'rechazos': self.detalle_rechazos,
+        }
+
+
+def importar(conn, filas, lote=IMPORTACION_LOTE):
+    """
+    Importa las filas [(número, dict)] haciendo commit cada `lote` filas
+    válidas. Devuelve un ResultadoImportacion.
+    """
+    resultado = ResultadoImportacion()
+    cursor = conn.cursor()
+    cursor.execute("SELECT nombre_programa FROM programa_academico")
+    programas = {fila[0] for fila in cursor.fetchall()}
+
+    pendientes = []
+    inscripciones = False
+    for numero, fila in filas:
+        resultado.procesadas += 1
+        registro, error = validar_fila(fila, programas)
+        if error:
+            resultado.rechazar(numero, error)
+            continue
+        pendientes.append((numero, registro))
+        inscripciones = inscripciones or bool(registro['programa'])
+        if len(pendientes) >= lote:
+            _guardar_lote(conn, cursor, pendientes, resultado)
+            resultado.lotes += 1
+            pendientes = []
+    if pendientes:
+        _guardar_lote(conn, cursor, pendientes, resultado)
+        resultado.lotes += 1
+
+    # Las reservas y sanciones ya resumidas cuentan ahora para los programas
+    # y roles nuevos
+    if inscripciones and resultado.importadas:
+        recalcular_inscripciones(cursor)
+        conn.commit()
+
+    cursor.close()
+    return resultado
+
+
+# ============================================
+# MAIN
+# ============================================
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('archivo')
+    parser.add_argument('--formato', choices=FORMATOS, help='Por defecto, según la extensión del archivo')
+    parser.add_argument('--lote', type=int, default=IMPORTACION_LOTE, help='Filas por INSERT y commit')
+    args = parser.parse_args()
+
+    formato = args.formato or detectar_formato(args.archivo)
+    if not formato:
+        sys.exit("No se pudo deducir el formato; indicar --formato")
+
+    inicio = time.monotonic()
+    with open(args.archivo, 'rb') as f, get_connection() as conn:
+        resultado = importar(conn, leer_filas(f, formato), args.lote)
+
+    print(f"{resultado.procesadas} filas procesadas, {resultado.importadas} importadas, "
+          f"{resultado.rechazadas} rechazadas en {time.monotonic() - inicio:.1f}s")
+    for rechazo in resultado.detalle_rechazos:
+        print(f"  fila {rechazo['fila']}: {rechazo['error']}")
+    sys.exit(1 if resultado.rechazadas else 0)
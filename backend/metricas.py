@@ -0,0 +1,346 @@
+"""
+Instrumentación de peticiones y consultas.
+
+- instrumentar_app(app) registra hooks before/after/teardown_request que miden
+  la latencia de cada endpoint y cuántas consultas hizo la petición.
+- instrumentar_conexiones(get_connection) envuelve la función que entrega
+  conexiones: mide el tiempo de obtener la conexión del pool y devuelve
+  cursores que miden por consulta (SQL normalizado) el tiempo de ejecución,
+  el tiempo de lectura de filas y la cantidad de filas leídas.
+- exportar_prometheus() arma el texto para GET /api/metrics.
+
+Las consultas que tardan más de METRICAS_CONSULTA_LENTA_MS (por defecto 200)
+entre ejecución y lectura se registran con logging en el logger 'metricas'.
+Los datos son por proceso: con varios workers cada uno expone los suyos.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger('metricas')
+
+CONSULTA_LENTA_MS = float(os.getenv('METRICAS_CONSULTA_LENTA_MS', '200'))
+
+# Límites superiores (segundos) de los buckets de los histogramas de tiempo
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+FASES = ('conexion', 'ejecucion', 'lectura')
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+# ============================================
+# NORMALIZACIÓN DE SQL
+# ============================================
+
+_RE_ESPACIOS = re.compile(r'\s+')
+_RE_CADENAS = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_PARAMETROS = re.compile(r'%\(\w+\)s|%s')
+_RE_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Elemento de una lista ya normalizada: parámetro, NULL, función sin
+# argumentos (NOW()) o una lista ya colapsada
+_ELEMENTO = r'(?:\?|NULL|\w+\(\)|\(\?\.\.\.\))'
+_RE_LISTAS = re.compile(rf'\(\s*{_ELEMENTO}(?:\s*,\s*{_ELEMENTO})*\s*\)', re.IGNORECASE)
+_RE_GRUPOS = re.compile(r'\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+')
+
+
+def normalizar_sql(sql):
+    """
+    Reemplaza literales y parámetros por ? y colapsa a (?...) las listas
+    IN (?, ?, ...), las de tuplas IN ((?, ?), (?, ?)) y los VALUES de varias
+    filas, para que el tamaño de la lista o del lote no cree otra etiqueta.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _RE_ESPACIOS.sub(' ', sql).strip()
+    sql = _RE_CADENAS.sub('?', sql)
+    sql = _RE_PARAMETROS.sub('?', sql)
+    sql = _RE_NUMEROS.sub('?', sql)
+    # De adentro hacia afuera: cada vuelta colapsa un nivel de anidamiento
+    while True:
+        colapsado = _RE_GRUPOS.sub('(?...)', _RE_LISTAS.sub('(?...)', sql))
+        if colapsado == sql:
+            break
+        sql = colapsado
+    return sql[:300]
+
+
+# ============================================
+# REGISTRO DE MÉTRICAS
+# ============================================
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = defaultdict(lambda: Histograma(BUCKETS_SEGUNDOS))       # (endpoint, método)
+        self.codigos = defaultdict(int)                                          # (endpoint, método, código)
+        self.consultas_por_peticion = defaultdict(lambda: Histograma(BUCKETS_CONSULTAS))  # endpoint
+        self.fases = defaultdict(float)                                          # (endpoint, fase)
+        self.consultas = defaultdict(lambda: Histograma(BUCKETS_SEGUNDOS))       # sql
+        self.filas = defaultdict(int)                                            # sql
+        self.lentas = defaultdict(int)                                           # sql
+
+    def registrar_peticion(self, endpoint, metodo, codigo, duracion, consultas, fases):
+        with self._lock:
+            self.peticiones[(endpoint, metodo)].observar(duracion)
+            self.codigos[(endpoint, metodo, codigo)] += 1
+            self.consultas_por_peticion[endpoint].observar(consultas)
+            for fase, segundos in fases.items():
+                self.fases[(endpoint, fase)] += segundos
+
+    def registrar_consulta(self, sql, duracion, filas):
+        lenta = duracion * 1000 >= CONSULTA_LENTA_MS
+        with self._lock:
+            self.consultas[sql].observar(duracion)
+            self.filas[sql] += filas
+            if lenta:
+                self.lentas[sql] += 1
+        if lenta:
+            logger.warning("Consulta lenta (%.1f ms, %d filas): %s", duracion * 1000, filas, sql)
+
+
+registro = Registro()
+
+
+def _acumular_fase(fase, segundos):
+    if has_request_context() and 'metricas_fases' in g:
+        g.metricas_fases[fase] += segundos
+
+
+# ============================================
+# CONEXIONES Y CURSORES INSTRUMENTADOS
+# ============================================
+
+class CursorInstrumentado:
+    """Envuelve un cursor de mysql.connector midiendo cada sentencia."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._sql = None
+        self._tiempo = 0.0
+        self._filas = 0
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        fila = self.fetchone()
+        while fila is not None:
+            yield fila
+            fila = self.fetchone()
+
+    def _terminar_sentencia(self):
+        if self._sql is not None:
+            registro.registrar_consulta(self._sql, self._tiempo, self._filas)
+            self._sql = None
+
+    def _ejecutar(self, metodo, operacion, params):
+        self._terminar_sentencia()
+        self._sql = normalizar_sql(operacion)
+        self._filas = 0
+        if has_request_context() and 'metricas_consultas' in g:
+            g.metricas_consultas += 1
+        inicio = time.perf_counter()
+        try:
+            return metodo(operacion, params)
+        finally:
+            self._tiempo = time.perf_counter() - inicio
+            _acumular_fase('ejecucion', self._tiempo)
+
+    def execute(self, operacion, params=()):
+        return self._ejecutar(self._cursor.execute, operacion, params)
+
+    def executemany(self, operacion, seq_params):
+        return self._ejecutar(self._cursor.executemany, operacion, seq_params)
+
+    def _leer(self, metodo, *args):
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(*args)
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._tiempo += segundos
+            _acumular_fase('lectura', segundos)
+        if isinstance(resultado, list):
+            self._filas += len(resultado)
+        elif resultado is not None:
+            self._filas += 1
+        return resultado
+
+    def fetchone(self):
+        return self._leer(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._leer(self._cursor.fetchall)
+
+    def fetchmany(self, size=1):
+        return self._leer(self._cursor.fetchmany, size)
+
+    def close(self):
+        self._terminar_sentencia()
+        return self._cursor.close()
+
+
+class ConexionInstrumentada:
+    """Envuelve la conexión del pool para que sus cursores se midan."""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self._cursores = []
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self._terminar_cursores()
+        return self._conexion.__exit__(tipo, valor, traza)
+
+    def _terminar_cursores(self):
+        # Registra las sentencias de cursores que no se cerraron explícitamente
+        for cursor in self._cursores:
+            cursor._terminar_sentencia()
+        self._cursores = []
+
+    def cursor(self, *args, **kwargs):
+        cursor = CursorInstrumentado(self._conexion.cursor(*args, **kwargs))
+        self._cursores.append(cursor)
+        return cursor
+
+    def close(self):
+        self._terminar_cursores()
+        return self._conexion.close()
+
+
+def instrumentar_conexiones(get_connection):
+    """Devuelve una versión de get_connection que mide la espera y las consultas."""
+    def get_connection_instrumentada():
+        inicio = time.perf_counter()
+        conexion = get_connection()
+        _acumular_fase('conexion', time.perf_counter() - inicio)
+        return ConexionInstrumentada(conexion)
+    return get_connection_instrumentada
+
+
+# ============================================
+# HOOKS DE FLASK
+# ============================================
+
+def instrumentar_app(app):
+    @app.before_request
+    def iniciar_medicion():
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_consultas = 0
+        g.metricas_fases = dict.fromkeys(FASES, 0.0)
+
+    @app.after_request
+    def guardar_codigo(response):
+        g.metricas_codigo = response.status_code
+        return response
+
+    # teardown corre al terminar de enviar la respuesta, también en las
+    # exportaciones en streaming, así la latencia incluye todo el envío
+    @app.teardown_request
+    def terminar_medicion(error=None):
+        if 'metricas_inicio' not in g:
+            return
+        duracion = time.perf_counter() - g.metricas_inicio
+        endpoint = request.url_rule.rule if request.url_rule else 'sin_ruta'
+        codigo = g.get('metricas_codigo', 500)
+        fases = dict(g.metricas_fases)
+        fases['resto'] = max(0.0, duracion - sum(fases.values()))
+        registro.registrar_peticion(endpoint, request.method, codigo, duracion, g.metricas_consultas, fases)
+
+
+# ============================================
+# EXPORTACIÓN EN FORMATO PROMETHEUS
+# ============================================
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _etiquetas(**pares):
+    return '{' + ','.join(f'{k}="{_etiqueta(v)}"' for k, v in pares.items()) + '}'
+
+
+def _histograma(lineas, nombre, etiquetas, hist):
+    acumulado = 0
+    for limite, conteo in zip(hist.buckets, hist.conteos):
+        acumulado += conteo
+        lineas.append(f'{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}')
+    lineas.append(f'{nombre}_bucket{_etiquetas(**etiquetas, le="+Inf")} {hist.total}')
+    lineas.append(f'{nombre}_sum{_etiquetas(**etiquetas)} {hist.suma:.6f}')
+    lineas.append(f'{nombre}_count{_etiquetas(**etiquetas)} {hist.total}')
+
+
+def exportar_prometheus(extras=()):
+    """
+    Devuelve las métricas en formato de texto de Prometheus. extras es una
+    lista de (nombre, tipo, ayuda, [(etiquetas, valor)]) con métricas de
+    otros componentes (pool, cache).
+    """
+    lineas = []
+    with registro._lock:
+        lineas.append('# HELP http_request_duration_seconds Latencia de las peticiones por endpoint')
+        lineas.append('# TYPE http_request_duration_seconds histogram')
+        for (endpoint, metodo), hist in sorted(registro.peticiones.items()):
+            _histograma(lineas, 'http_request_duration_seconds', {'endpoint': endpoint, 'metodo': metodo}, hist)
+
+        lineas.append('# HELP http_requests_total Peticiones por endpoint y código HTTP')
+        lineas.append('# TYPE http_requests_total counter')
+        for (endpoint, metodo, codigo), total in sorted(registro.codigos.items()):
+            lineas.append(f'http_requests_total{_etiquetas(endpoint=endpoint, metodo=metodo, codigo=codigo)} {total}')
+
+        lineas.append('# HELP http_request_queries Consultas SQL por petición')
+        lineas.append('# TYPE http_request_queries histogram')
+        for endpoint, hist in sorted(registro.consultas_por_peticion.items()):
+            _histograma(lineas, 'http_request_queries', {'endpoint': endpoint}, hist)
+
+        lineas.append('# HELP http_request_phase_seconds_total Tiempo acumulado por fase (conexion, ejecucion, lectura, resto)')
+        lineas.append('# TYPE http_request_phase_seconds_total counter')
+        for (endpoint, fase), segundos in sorted(registro.fases.items()):
+            lineas.append(f'http_request_phase_seconds_total{_etiquetas(endpoint=endpoint, fase=fase)} {segundos:.6f}')
+
+        lineas.append('# HELP db_query_duration_seconds Tiempo de ejecución y lectura por consulta normalizada')
+        lineas.append('# TYPE db_query_duration_seconds histogram')
+        for sql, hist in sorted(registro.consultas.items()):
+            _histograma(lineas, 'db_query_duration_seconds', {'sql': sql}, hist)
+
+        lineas.append('# HELP db_query_rows_total Filas leídas por consulta normalizada')
+        lineas.append('# TYPE db_query_rows_total counter')
+        for sql, filas in sorted(registro.filas.items()):
+            lineas.append(f'db_query_rows_total{_etiquetas(sql=sql)} {filas}')
+
+        lineas.append('# HELP db_slow_queries_total Consultas por encima del umbral de consulta lenta')
+        lineas.append('# TYPE db_slow_queries_total counter')
+        for sql, total in sorted(registro.lentas.items()):
+            lineas.append(f'db_slow_queries_total{_etiquetas(sql=sql)} {total}')
+
+    for nombre, tipo, ayuda, muestras in extras:
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        for etiquetas, valor in muestras:
+            lineas.append(f'{nombre}{_etiquetas(**etiquetas) if etiquetas else ""} {valor}')
+
+    return '\n'.join(lineas) + '\n'
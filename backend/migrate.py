@@ -0,0 +1,194 @@
+"""
+Aplicador de migraciones de esquema.
+
+Las migraciones son archivos SQL en backend/migrations/ con nombre
+NNN_descripcion.sql. Se aplican en orden numérico y cada versión aplicada
+queda registrada en la tabla schema_version, por lo que correr el script
+varias veces es seguro.
+
+Uso (desde backend/):
+    python migrate.py                     # aplica las migraciones pendientes
+    python migrate.py --estado            # lista aplicadas y pendientes
+    python migrate.py --marcar-aplicada 1 # registra una versión aplicada a mano
+    python migrate.py --explain           # verifica con EXPLAIN que las consultas
+                                          # críticas usan los índices esperados
+"""
+import argparse
+import os
+import re
+import sys
+
+from database import get_connection
+from consultas import SQL_DISPONIBILIDAD, SQL_CUOTA_ESTUDIANTE
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+SQL_SCHEMA_VERSION = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT NOT NULL,
+        nombre VARCHAR(200) NOT NULL,
+        aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (version)
+    )
+"""
+
+
+# ============================================
+# MIGRACIONES
+# ============================================
+
+def listar_migraciones():
+    """Devuelve [(version, nombre, ruta)] ordenadas por versión."""
+    migraciones = []
+    for archivo in os.listdir(MIGRATIONS_DIR):
+        m = re.match(r'^(\d+)_.+\.sql$', archivo)
+        if m:
+            migraciones.append((int(m.group(1)), archivo, os.path.join(MIGRATIONS_DIR, archivo)))
+    migraciones.sort()
+
+    versiones = [v for v, _, _ in migraciones]
+    if len(versiones) != len(set(versiones)):
+        raise RuntimeError("Hay dos migraciones con el mismo número de versión")
+    return migraciones
+
+
+def separar_sentencias(sql):
+    """Separa un script en sentencias, ignorando comentarios de línea."""
+    lineas = [l for l in sql.splitlines() if not l.strip().startswith('--')]
+    sentencias = re.split(r';\s*(?:\n|$)', '\n'.join(lineas))
+    return [s.strip() for s in sentencias if s.strip()]
+
+
+def versiones_aplicadas(conn):
+    cursor = conn.cursor()
+    cursor.execute(SQL_SCHEMA_VERSION)
+    cursor.execute("SELECT version FROM schema_version")
+    versiones = {fila[0] for fila in cursor.fetchall()}
+    cursor.close()
+    return versiones
+
+
+def registrar_version(conn, version, nombre):
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO schema_version (version, nombre) VALUES (%s, %s)",
+        (version, nombre)
+    )
+    conn.commit()
+    cursor.close()
+
+
+def aplicar_pendientes(conn):
+    """Aplica las migraciones pendientes. Devuelve los nombres aplicados."""
+    aplicadas = versiones_aplicadas(conn)
+    nuevas = []
+
+    for version, nombre, ruta in listar_migraciones():
+        if version in aplicadas:
+            continue
+
+        with open(ruta, encoding='utf-8') as f:
+            sentencias = separar_sentencias(f.read())
+
+        print(f"→ Aplicando {nombre}")
+        cursor = conn.cursor()
+        for sentencia in sentencias:
+            cursor.execute(sentencia)
+        cursor.close()
+
+        # Las sentencias DDL hacen commit implícito en MySQL, por eso la
+        # versión se registra después de que todas terminaron bien.
+        registrar_version(conn, version, nombre)
+        nuevas.append(nombre)
+
+    return nuevas
+
+
+def mostrar_estado(conn):
+    aplicadas = versiones_aplicadas(conn)
+    for version, nombre, _ in listar_migraciones():
+        marca = 'aplicada ' if version in aplicadas else 'pendiente'
+        print(f"  [{marca}] {nombre}")
+
+
+# ============================================
+# VERIFICACIÓN DE ÍNDICES CON EXPLAIN
+# ============================================
+
+# (descripción, consulta, parámetros de ejemplo, {alias de tabla: índices aceptados})
+CONSULTAS_CRITICAS = [
+    (
+        'disponibilidad de sala',
+        SQL_DISPONIBILIDAD,
+        ('Sala A1', 'Campus Central', '2025-10-03', 1),
+        {'reserva': {'uq_reserva_slot_activo'}},
+    ),
+    (
+        'cuota diaria y semanal de estudiante de grado',
+        SQL_CUOTA_ESTUDIANTE,
+        {
+            'ci': '4.111.111-1',
+            'fecha': '2025-10-03',
+            'inicio_semana': '2025-09-29',
+            'fin_semana': '2025-10-05',
+            'id_turno': 1,
+        },
+        {'rp': {'PRIMARY'}, 'r': {'PRIMARY'}},
+    ),
+]
+
+
+def verificar_indices(conn):
+    """
+    Corre EXPLAIN sobre las consultas críticas y comprueba qué índice usa
+    el acceso a cada tabla controlada. Devuelve True si todas usan uno esperado.
+    Con pocas filas el optimizador puede preferir recorrer la tabla, por lo
+    que conviene correrlo sobre un volumen de datos realista.
+    """
+    cursor = conn.cursor(dictionary=True)
+    todo_ok = True
+
+    for descripcion, sql, params, esperados in CONSULTAS_CRITICAS:
+        cursor.execute("EXPLAIN " + sql, params)
+        filas = cursor.fetchall()
+        ok = True
+        for tabla, indices in esperados.items():
+            accesos = [f for f in filas if f['table'] == tabla]
+            ok = ok and bool(accesos) and all(f['key'] in indices for f in accesos)
+        todo_ok = todo_ok and ok
+
+        print(f"  [{'OK' if ok else 'FALLA'}] {descripcion}")
+        for f in filas:
+            print(f"        tabla={f['table']} tipo={f['type']} key={f['key']} filas={f['rows']} extra={f['Extra']}")
+
+    cursor.close()
+    return todo_ok
+
+
+# ============================================
+# MAIN
+# ============================================
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--estado', action='store_true', help='Lista migraciones aplicadas y pendientes')
+    parser.add_argument('--marcar-aplicada', type=int, metavar='VERSION',
+                        help='Registra una versión como aplicada sin ejecutarla')
+    parser.add_argument('--explain', action='store_true', help='Verifica el uso de índices con EXPLAIN')
+    args = parser.parse_args()
+
+    with get_connection() as conn:
+        if args.estado:
+            mostrar_estado(conn)
+        elif args.marcar_aplicada is not None:
+            nombres = {v: n for v, n, _ in listar_migraciones()}
+            if args.marcar_aplicada not in nombres:
+                sys.exit(f"No existe la migración {args.marcar_aplicada}")
+            if args.marcar_aplicada not in versiones_aplicadas(conn):
+                registrar_version(conn, args.marcar_aplicada, nombres[args.marcar_aplicada])
+            print(f"Versión {args.marcar_aplicada} registrada como aplicada")
+        elif args.explain:
+            sys.exit(0 if verificar_indices(conn) else 1)
+        else:
+            nuevas = aplicar_pendientes(conn)
+            print(f"{len(nuevas)} migración(es) aplicada(s)" if nuevas else "El esquema está al día")
@@ -0,0 +1,23 @@
+-- Garantiza a nivel de base de datos que exista a lo sumo una reserva
+-- activa por sala, fecha y turno.
+-- slot_activo vale 1 solo para reservas activas y NULL para el resto; como
+-- un índice UNIQUE admite varios NULL, las reservas canceladas, finalizadas
+-- o sin asistencia del mismo horario no chocan entre sí.
+-- Antes de crear el índice se cancelan las reservas activas repetidas que
+-- dejó la verificación previa al INSERT, conservando la más antigua.
+
+UPDATE reserva r1
+JOIN reserva r2
+  ON r1.nombre_sala = r2.nombre_sala
+ AND r1.edificio = r2.edificio
+ AND r1.fecha = r2.fecha
+ AND r1.id_turno = r2.id_turno
+ AND r2.estado = 'activa'
+ AND r1.id_reserva > r2.id_reserva
+SET r1.estado = 'cancelada'
+WHERE r1.estado = 'activa';
+
+ALTER TABLE reserva
+  ADD COLUMN slot_activo TINYINT
+    GENERATED ALWAYS AS (IF(estado = 'activa', 1, NULL)) STORED,
+  ADD UNIQUE KEY uq_reserva_slot_activo (nombre_sala, edificio, fecha, id_turno, slot_activo);
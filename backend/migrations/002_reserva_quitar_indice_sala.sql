@@ -0,0 +1,7 @@
+-- El índice (nombre_sala, edificio) del esquema original repite el prefijo de
+-- uq_reserva_slot_activo (001), que ya sostiene la clave foránea a sala y
+-- resuelve la disponibilidad con slot_activo = 1. Quitarlo abarata cada
+-- escritura en reserva.
+
+ALTER TABLE reserva
+  DROP INDEX nombre_sala;
@@ -0,0 +1,8 @@
+-- Índice para los recorridos por fecha de las reservas activas: el cierre
+-- automático (cierre.py), que busca las activas con fecha pasada, y la
+-- ocupación por turnos de la grilla y de la búsqueda de salas libres. Con
+-- estado primero recorre solo las activas, sin pasar por el historial de
+-- reservas ya cerradas.
+
+ALTER TABLE reserva
+  ADD INDEX idx_reserva_estado_fecha (estado, fecha);
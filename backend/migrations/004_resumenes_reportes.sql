@@ -0,0 +1,59 @@
+-- Tablas de resumen para los reportes. Se mantienen de forma incremental
+-- desde los endpoints que crean, modifican o eliminan reservas y sanciones
+-- (ver resumenes.py) y se pueden reconstruir con: python resumenes.py
+
+-- Reservas por sala, día, turno y estado
+CREATE TABLE resumen_reserva_sala (
+  nombre_sala varchar(80) NOT NULL,
+  edificio varchar(80) NOT NULL,
+  fecha date NOT NULL,
+  id_turno tinyint NOT NULL,
+  estado enum('activa','cancelada','sin_asistencia','finalizada') NOT NULL,
+  reservas int NOT NULL DEFAULT 0,
+  participantes int NOT NULL DEFAULT 0,
+  reservas_con_participantes int NOT NULL DEFAULT 0,
+  PRIMARY KEY (nombre_sala, edificio, fecha, id_turno, estado),
+  KEY idx_resumen_sala_fecha (fecha)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Reservas por participante
+CREATE TABLE resumen_reserva_participante (
+  ci_participante varchar(20) NOT NULL,
+  reservas int NOT NULL DEFAULT 0,
+  PRIMARY KEY (ci_participante),
+  KEY idx_resumen_participante_reservas (reservas)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Reservas por programa académico (y por lo tanto facultad) y edificio.
+-- reservas: reservas distintas con al menos un participante del programa.
+-- participaciones: filas participante × programa, como cuenta edificio-por-facultad.
+CREATE TABLE resumen_reserva_programa (
+  nombre_programa varchar(120) NOT NULL,
+  edificio varchar(80) NOT NULL,
+  reservas int NOT NULL DEFAULT 0,
+  participaciones int NOT NULL DEFAULT 0,
+  PRIMARY KEY (nombre_programa, edificio)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Reservas y asistencias por rol de los participantes (alumno o docente).
+-- reservas: reservas distintas con al menos un participante del rol.
+-- asistencias / inasistencias: filas participante × inscripción con
+-- asistencia 1 / 0, como cuenta asistencias-por-rol.
+CREATE TABLE resumen_reserva_rol (
+  rol enum('alumno','docente') NOT NULL,
+  reservas int NOT NULL DEFAULT 0,
+  asistencias int NOT NULL DEFAULT 0,
+  inasistencias int NOT NULL DEFAULT 0,
+  PRIMARY KEY (rol)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+-- Sanciones por rol y período (filas sanción × inscripción). Las vigentes
+-- dependen del día, así que se cuentan al leer comparando el período con
+-- CURDATE(); hay una fila por período distinto, no por sanción.
+CREATE TABLE resumen_sancion_rol (
+  rol enum('alumno','docente') NOT NULL,
+  fecha_inicio date NOT NULL,
+  fecha_fin date NOT NULL,
+  sanciones int NOT NULL DEFAULT 0,
+  PRIMARY KEY (rol, fecha_inicio, fecha_fin)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
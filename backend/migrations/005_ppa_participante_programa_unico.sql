@@ -0,0 +1,14 @@
+-- Un participante figura a lo sumo una vez en cada programa académico.
+-- Permite que la importación masiva (importacion.py) haga upsert de las
+-- inscripciones con INSERT ... ON DUPLICATE KEY UPDATE.
+-- Antes de crear el índice se eliminan las inscripciones repetidas,
+-- conservando la más antigua.
+
+DELETE p1 FROM participante_programa_academico p1
+JOIN participante_programa_academico p2
+  ON p1.ci_participante = p2.ci_participante
+ AND p1.nombre_programa = p2.nombre_programa
+ AND p1.id_alumno_programa > p2.id_alumno_programa;
+
+ALTER TABLE participante_programa_academico
+  ADD UNIQUE KEY uq_ppa_participante_programa (ci_participante, nombre_programa);
@@ -0,0 +1,31 @@
+-- Lista de espera por slot (sala, edificio, fecha, turno). Cuando una
+-- reserva activa se cancela o se elimina, el primero de la lista que cumpla
+-- las reglas de reserva la ocupa en la misma transacción (ver app.py); los
+-- que no las cumplen en ese momento siguen esperando.
+-- email se guarda para deducir el rol al promover, igual que al reservar.
+-- espera_activa vale 1 solo mientras se espera (NULL si fue promovida o
+-- retirada); con el índice UNIQUE un participante está a lo sumo una vez en
+-- la espera de cada slot, aunque se anote dos veces a la vez.
+
+CREATE TABLE lista_espera (
+  id_espera int NOT NULL AUTO_INCREMENT,
+  nombre_sala varchar(80) NOT NULL,
+  edificio varchar(80) NOT NULL,
+  fecha date NOT NULL,
+  id_turno tinyint NOT NULL,
+  ci_participante varchar(20) NOT NULL,
+  email varchar(150) NOT NULL,
+  fecha_solicitud datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  estado enum('esperando','promovida','retirada') NOT NULL DEFAULT 'esperando',
+  id_reserva int DEFAULT NULL,
+  espera_activa tinyint GENERATED ALWAYS AS (IF(estado = 'esperando', 1, NULL)) STORED,
+  PRIMARY KEY (id_espera),
+  UNIQUE KEY uq_lista_espera_activa (nombre_sala, edificio, fecha, id_turno, ci_participante, espera_activa),
+  -- Orden FIFO de los que esperan un slot
+  KEY idx_lista_espera_slot (nombre_sala, edificio, fecha, id_turno, estado, id_espera),
+  KEY idx_lista_espera_participante (ci_participante, estado),
+  CONSTRAINT lista_espera_sala FOREIGN KEY (nombre_sala, edificio) REFERENCES sala (nombre_sala, edificio),
+  CONSTRAINT lista_espera_turno FOREIGN KEY (id_turno) REFERENCES turno (id_turno),
+  CONSTRAINT lista_espera_participante FOREIGN KEY (ci_participante) REFERENCES participante (ci),
+  CONSTRAINT lista_espera_reserva FOREIGN KEY (id_reserva) REFERENCES reserva (id_reserva) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from consultas import sql_turnos_ocupados
+
+
+# ============================================
+# ÍNDICE EN MEMORIA DE OCUPACIÓN DE SALAS
+# ============================================
+
+# La misma consulta que la grilla de disponibilidad, sin filtros de sala
+SQL_OCUPACION = sql_turnos_ocupados()
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+class IndiceOcupacion:
+    """
+    Turnos ocupados por reservas activas, como un entero por (sala, edificio,
+    fecha) con el bit id_turno encendido (la misma codificación que la grilla
+    de disponibilidad), para los próximos `dias` días.
+
+    - recargar() lo reconstruye desde la tabla reserva.
+    - aplicar() lo actualiza con cada evento de reserva de este proceso; los
+      cambios de otros procesos se ven en la siguiente recarga.
+    - Un evento aplicado mientras corre una recarga se vuelve a aplicar sobre
+      el resultado.
+    """
+
+    def __init__(self, dias=60):
+        self.dias = dias
+        self.desde = None
+        self.hasta = None
+        self.actualizado = None
+        self._bits = {}      # (nombre_sala, edificio, fecha) -> turnos ocupados
+        self._diario = None  # eventos durante una recarga en curso
+        self._lock = threading.Lock()
+        self._stats = {"recargas": 0, "eventos": 0, "busquedas": 0}
+
+    @property
+    def cargado(self):
+        return self.desde is not None
+
+    def recargar(self, conn):
+        desde = date.today()
+        hasta = desde + timedelta(days=self.dias - 1)
+        with self._lock:
+            self._diario = []
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_OCUPACION, (desde, hasta))
+            bits = {(sala, edificio, fecha): int(ocupados) for sala, edificio, fecha, ocupados in cursor.fetchall()}
+            cursor.close()
+        except Exception:
+            with self._lock:
+                self._diario = None
+            raise
+
+        with self._lock:
+            self._bits, self.desde, self.hasta = bits, desde, hasta
+            for evento in self._diario:
+                self._aplicar(evento)
+            self._diario = None
+            self.actualizado = time.time()
+            self._stats["recargas"] += 1
+
+    def aplicar(self, evento):
+        """
+        Ocupa el slot de un evento de reserva activa o lo libera si la reserva
+        estaba activa (estado_anterior), ver eventos.evento_reserva.
+        """
+        with self._lock:
+            self._stats["eventos"] += 1
+            self._aplicar(evento)
+            if self._diario is not None:
+                self._diario.append(evento)
+
+    def _aplicar(self, evento):
+        clave = (evento['nombre_sala'], evento['edificio'], _fecha(evento['fecha']))
+        bit = 1 << evento['id_turno']
+        if evento['tipo'] != 'eliminada' and evento['estado'] == 'activa':
+            self._bits[clave] = self._bits.get(clave, 0) | bit
+        elif evento['estado_anterior'] == 'activa' and clave in self._bits:
+            # Solo libera el slot una reserva que lo ocupaba; otra reserva
+            # (cancelada, finalizada...) del mismo slot no lo toca
+            restantes = self._bits[clave] & ~bit
+            if restantes:
+                self._bits[clave] = restantes
+            else:
+                del self._bits[clave]
+
+    def cubre(self, desde, hasta):
+        return self.cargado and self.desde <= desde and hasta <= self.hasta
+
+    def libres(self, salas, fechas, turnos, limite):
+        """
+        Busca slots libres recorriendo fechas y turnos en orden y, para cada
+        uno, las salas en el orden dado. Devuelve hasta `limite` tuplas
+        (sala, fecha, turno) con los mismos objetos recibidos.
+        """
+        encontrados = []
+        with self._lock:
+            self._stats["busquedas"] += 1
+            for fecha in fechas:
+                for turno in turnos(fecha):
+                    bit = 1 << turno['id_turno']
+                    for sala in salas:
+                        if not self._bits.get((sala['nombre_sala'], sala['edificio'], fecha), 0) & bit:
+                            encontrados.append((sala, fecha, turno))
+                            if len(encontrados) >= limite:
+                                return encontrados
+        return encontrados
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "slots_ocupados": sum(bin(b).count('1') for b in self._bits.values()),
+                "desde": self.desde.isoformat() if self.desde else None,
+                "hasta": self.hasta.isoformat() if self.hasta else None,
+                "actualizado": self.actualizado,
+            }
@@ -0,0 +1,218 @@
+"""
+Mantenimiento de las tablas de resumen usadas por los reportes
+(resumen_reserva_sala, resumen_reserva_participante, resumen_reserva_programa,
+resumen_reserva_rol y resumen_sancion_rol).
+
+Los endpoints que crean, modifican o eliminan reservas llaman a
+aplicar_reservas() dentro de su misma transacción:
+    - con signo +1 después de crear la reserva o de cambiar su estado,
+    - con signo -1 antes de cambiar su estado o de eliminarla.
+Así cada resumen suma o resta el aporte de esas reservas sin recalcular todo.
+El registro de asistencias solo cambia resumen_reserva_rol y usa
+aplicar_asistencias() de la misma forma; las altas y bajas de sanciones usan
+aplicar_sanciones().
+
+resumen_reserva_programa, resumen_reserva_rol y resumen_sancion_rol se
+calculan con las inscripciones actuales de cada participante, así que el -1
+coincide con el +1 solo si las inscripciones no cambiaron en el medio. Por
+eso, después de cambiar inscripciones (la importación lo hace sola) hay que
+llamar a recalcular_inscripciones().
+
+Para recalcular los resúmenes desde cero (por ejemplo después de aplicar la
+migración o de una carga masiva de datos), desde backend/:
+    python resumenes.py
+"""
+import time
+
+from database import get_connection
+
+
+def _sql_resumen_sala(filtro):
+    return f"""
+        INSERT INTO resumen_reserva_sala
+            (nombre_sala, edificio, fecha, id_turno, estado,
+             reservas, participantes, reservas_con_participantes)
+        SELECT * FROM (
+            SELECT
+                r.nombre_sala, r.edificio, r.fecha, r.id_turno, r.estado,
+                %(signo)s * COUNT(*) AS reservas,
+                %(signo)s * COALESCE(SUM(p.cantidad), 0) AS participantes,
+                %(signo)s * COUNT(p.cantidad) AS reservas_con_participantes
+            FROM reserva r
+            LEFT JOIN (
+                SELECT rp.id_reserva, COUNT(*) AS cantidad
+                FROM reserva_participante rp
+                WHERE {filtro.format(col='rp.id_reserva')}
+                GROUP BY rp.id_reserva
+            ) p ON p.id_reserva = r.id_reserva
+            WHERE {filtro.format(col='r.id_reserva')}
+            GROUP BY r.nombre_sala, r.edificio, r.fecha, r.id_turno, r.estado
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            reservas = resumen_reserva_sala.reservas + delta.reservas,
+            participantes = resumen_reserva_sala.participantes + delta.participantes,
+            reservas_con_participantes =
+                resumen_reserva_sala.reservas_con_participantes + delta.reservas_con_participantes
+    """
+
+
+def _sql_resumen_participante(filtro):
+    return f"""
+        INSERT INTO resumen_reserva_participante (ci_participante, reservas)
+        SELECT * FROM (
+            SELECT rp.ci_participante, %(signo)s * COUNT(*) AS reservas
+            FROM reserva_participante rp
+            WHERE {filtro.format(col='rp.id_reserva')}
+            GROUP BY rp.ci_participante
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            reservas = resumen_reserva_participante.reservas + delta.reservas
+    """
+
+
+def _sql_resumen_programa(filtro):
+    return f"""
+        INSERT INTO resumen_reserva_programa
+            (nombre_programa, edificio, reservas, participaciones)
+        SELECT * FROM (
+            SELECT
+                ppa.nombre_programa, r.edificio,
+                %(signo)s * COUNT(DISTINCT r.id_reserva) AS reservas,
+                %(signo)s * COUNT(*) AS participaciones
+            FROM reserva r
+            JOIN reserva_participante rp ON r.id_reserva = rp.id_reserva
+            JOIN participante_programa_academico ppa ON rp.ci_participante = ppa.ci_participante
+            WHERE {filtro.format(col='r.id_reserva')}
+            GROUP BY ppa.nombre_programa, r.edificio
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            reservas = resumen_reserva_programa.reservas + delta.reservas,
+            participaciones = resumen_reserva_programa.participaciones + delta.participaciones
+    """
+
+
+def _sql_resumen_rol(filtro):
+    return f"""
+        INSERT INTO resumen_reserva_rol (rol, reservas, asistencias, inasistencias)
+        SELECT * FROM (
+            SELECT
+                ppa.rol,
+                %(signo)s * COUNT(DISTINCT rp.id_reserva) AS reservas,
+                %(signo)s * COALESCE(SUM(rp.asistencia = 1), 0) AS asistencias,
+                %(signo)s * COALESCE(SUM(rp.asistencia = 0), 0) AS inasistencias
+            FROM reserva_participante rp
+            JOIN participante_programa_academico ppa ON rp.ci_participante = ppa.ci_participante
+            WHERE {filtro.format(col='rp.id_reserva')}
+            GROUP BY ppa.rol
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            reservas = resumen_reserva_rol.reservas + delta.reservas,
+            asistencias = resumen_reserva_rol.asistencias + delta.asistencias,
+            inasistencias = resumen_reserva_rol.inasistencias + delta.inasistencias
+    """
+
+
+def _sql_resumen_sancion_rol(filtro):
+    return f"""
+        INSERT INTO resumen_sancion_rol (rol, fecha_inicio, fecha_fin, sanciones)
+        SELECT * FROM (
+            SELECT ppa.rol, sp.fecha_inicio, sp.fecha_fin, %(signo)s * COUNT(*) AS sanciones
+            FROM sancion_participante sp
+            JOIN participante_programa_academico ppa ON sp.ci_participante = ppa.ci_participante
+            WHERE {filtro.format(col='sp.id_sancion')}
+            GROUP BY ppa.rol, sp.fecha_inicio, sp.fecha_fin
+        ) AS delta
+        ON DUPLICATE KEY UPDATE
+            sanciones = resumen_sancion_rol.sanciones + delta.sanciones
+    """
+
+
+_RESUMENES_RESERVA = (_sql_resumen_sala, _sql_resumen_participante, _sql_resumen_programa, _sql_resumen_rol)
+
+
+def _ejecutar_resumenes(cursor, armadores, filtro, params):
+    # filtro lleva {col} en lugar de la columna id de cada tabla
+    for armar in armadores:
+        cursor.execute(armar(filtro), params)
+
+
+def _filtro_ids(ids, signo):
+    """Filtro "{col} IN (...)" y sus parámetros con nombre para los ids indicados."""
+    params = {'signo': signo}
+    marcadores = []
+    for i, id_fila in enumerate(ids):
+        params[f'id{i}'] = id_fila
+        marcadores.append(f'%(id{i})s')
+    return "{col} IN (" + ', '.join(marcadores) + ")", params
+
+
+def aplicar_reservas(cursor, ids_reserva, signo):
+    """
+    Suma (signo=1) o resta (signo=-1) a los resúmenes el aporte actual de las
+    reservas indicadas. Debe ejecutarse en la misma transacción que el cambio.
+    """
+    ids_reserva = list(ids_reserva)
+    if not ids_reserva:
+        return
+    _ejecutar_resumenes(cursor, _RESUMENES_RESERVA, *_filtro_ids(ids_reserva, signo))
+
+
+def aplicar_asistencias(cursor, ids_reserva, signo):
+    """
+    Como aplicar_reservas(), pero solo para resumen_reserva_rol, que es el
+    único resumen que depende de las asistencias registradas.
+    """
+    ids_reserva = list(ids_reserva)
+    if not ids_reserva:
+        return
+    _ejecutar_resumenes(cursor, (_sql_resumen_rol,), *_filtro_ids(ids_reserva, signo))
+
+
+def aplicar_sanciones(cursor, ids_sancion, signo):
+    """
+    Suma (signo=1, después del alta) o resta (signo=-1, antes de la baja) las
+    sanciones indicadas de resumen_sancion_rol, en la misma transacción.
+    """
+    ids_sancion = list(ids_sancion)
+    if not ids_sancion:
+        return
+    _ejecutar_resumenes(cursor, (_sql_resumen_sancion_rol,), *_filtro_ids(ids_sancion, signo))
+
+
+def recalcular(cursor):
+    """Vacía los resúmenes y los recalcula a partir de todas las reservas y sanciones, sin commit."""
+    # DELETE y no TRUNCATE: TRUNCATE hace commit implícito y dejaría los
+    # reportes vacíos mientras se recalcula
+    cursor.execute("DELETE FROM resumen_reserva_sala")
+    cursor.execute("DELETE FROM resumen_reserva_participante")
+    cursor.execute("DELETE FROM resumen_reserva_programa")
+    cursor.execute("DELETE FROM resumen_reserva_rol")
+    cursor.execute("DELETE FROM resumen_sancion_rol")
+    _ejecutar_resumenes(cursor, _RESUMENES_RESERVA + (_sql_resumen_sancion_rol,), "1 = 1", {'signo': 1})
+
+
+def recalcular_inscripciones(cursor):
+    """
+    Recalcula los resúmenes que dependen de las inscripciones (por programa y
+    por rol) con las inscripciones actuales, sin commit.
+    """
+    cursor.execute("DELETE FROM resumen_reserva_programa")
+    cursor.execute("DELETE FROM resumen_reserva_rol")
+    cursor.execute("DELETE FROM resumen_sancion_rol")
+    _ejecutar_resumenes(cursor, (_sql_resumen_programa, _sql_resumen_rol, _sql_resumen_sancion_rol),
+                        "1 = 1", {'signo': 1})
+
+
+def reconstruir(conn):
+    """Recalcula los resúmenes en una sola transacción."""
+    cursor = conn.cursor()
+    recalcular(cursor)
+    conn.commit()
+    cursor.close()
+
+
+if __name__ == '__main__':
+    inicio = time.monotonic()
+    with get_connection() as conn:
+        reconstruir(conn)
+    print(f"Resúmenes reconstruidos en {time.monotonic() - inicio:.2f}s")
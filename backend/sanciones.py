@@ -0,0 +1,107 @@
+import threading
+from datetime import date
+
+
+# ============================================
+# ÍNDICE EN MEMORIA DE SANCIONES VIGENTES
+# ============================================
+
+SQL_SANCIONES_VIGENTES = """
+    SELECT id_sancion, ci_participante, fecha_inicio, fecha_fin
+    FROM sancion_participante
+    WHERE fecha_fin >= CURDATE()
+"""
+
+
+class IndiceSanciones:
+    """
+    Sanciones vigentes o futuras agrupadas por CI, para verificar una reserva
+    sin consultar la base.
+
+    - recargar() reemplaza el índice con el contenido de sancion_participante.
+    - agregar() y quitar() lo mantienen al día con los cambios hechos por este
+      proceso. Los de otros procesos se ven en la siguiente recarga.
+    - Un cambio hecho mientras corre una recarga se vuelve a aplicar sobre el
+      resultado, así la recarga no pisa datos más nuevos que su consulta.
+    """
+
+    def __init__(self):
+        self._por_ci = {}      # ci -> {id_sancion: (fecha_inicio, fecha_fin)}
+        self._ci_sancion = {}  # id_sancion -> ci
+        self._diario = None    # cambios durante una recarga en curso
+        self._lock = threading.Lock()
+        self.cargado = False
+        self._stats = {"recargas": 0, "consultas": 0, "bloqueos": 0}
+
+    def recargar(self, conn):
+        with self._lock:
+            self._diario = []
+        try:
+            cursor = conn.cursor()
+            cursor.execute(SQL_SANCIONES_VIGENTES)
+            filas = cursor.fetchall()
+            cursor.close()
+        except Exception:
+            with self._lock:
+                self._diario = None
+            raise
+
+        por_ci, ci_sancion = {}, {}
+        for id_sancion, ci, inicio, fin in filas:
+            por_ci.setdefault(ci, {})[id_sancion] = (inicio, fin)
+            ci_sancion[id_sancion] = ci
+
+        with self._lock:
+            self._por_ci, self._ci_sancion = por_ci, ci_sancion
+            for cambio, args in self._diario:
+                cambio(*args)
+            self._diario = None
+            self.cargado = True
+            self._stats["recargas"] += 1
+
+    def agregar(self, id_sancion, ci, fecha_inicio, fecha_fin):
+        with self._lock:
+            self._agregar(id_sancion, ci, fecha_inicio, fecha_fin)
+            if self._diario is not None:
+                self._diario.append((self._agregar, (id_sancion, ci, fecha_inicio, fecha_fin)))
+
+    def quitar(self, id_sancion):
+        with self._lock:
+            self._quitar(id_sancion)
+            if self._diario is not None:
+                self._diario.append((self._quitar, (id_sancion,)))
+
+    def _agregar(self, id_sancion, ci, fecha_inicio, fecha_fin):
+        self._por_ci.setdefault(ci, {})[id_sancion] = (fecha_inicio, fecha_fin)
+        self._ci_sancion[id_sancion] = ci
+
+    def _quitar(self, id_sancion):
+        ci = self._ci_sancion.pop(id_sancion, None)
+        sanciones = self._por_ci.get(ci)
+        if sanciones is not None:
+            sanciones.pop(id_sancion, None)
+            if not sanciones:
+                del self._por_ci[ci]
+
+    def vigente(self, ci, *fechas):
+        """
+        Devuelve (fecha_inicio, fecha_fin) de una sanción del participante que
+        cubre hoy o alguna de las fechas dadas, o None si no tiene.
+        """
+        fechas = (date.today(),) + fechas
+        with self._lock:
+            self._stats["consultas"] += 1
+            for inicio, fin in self._por_ci.get(ci, {}).values():
+                if any(inicio <= f <= fin for f in fechas):
+                    self._stats["bloqueos"] += 1
+                    return inicio, fin
+        return None
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "participantes": len(self._por_ci),
+                "sanciones": len(self._ci_sancion),
+                "cargado": self.cargado,
+            }
@@ -0,0 +1,62 @@
+import logging
+import threading
+
+
+logger = logging.getLogger('tareas')
+
+
+# ============================================
+# TAREAS PERIÓDICAS EN SEGUNDO PLANO
+# ============================================
+
+class TareaPeriodica:
+    """
+    Ejecuta `funcion` cada `intervalo` segundos en un hilo daemon, empezando
+    apenas se inicia. Los errores se registran y no detienen la tarea.
+    iniciar() es idempotente: hay un solo hilo por proceso aunque la app se cree
+    más de una vez.
+    """
+
+    def __init__(self, nombre, intervalo, funcion):
+        self.nombre = nombre
+        self.intervalo = intervalo
+        self.funcion = funcion
+        self.ejecuciones = 0
+        self.errores = 0
+        self._detener = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is not None or self.intervalo <= 0:
+                return
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._correr, name=f'tarea-{self.nombre}', daemon=True)
+            self._hilo.start()
+
+    def _correr(self):
+        while True:
+            try:
+                self.funcion()
+                self.ejecuciones += 1
+            except Exception:
+                self.errores += 1
+                logger.exception("Error en la tarea %s", self.nombre)
+            if self._detener.wait(self.intervalo):
+                return
+
+    def detener(self, espera=5):
+        with self._lock:
+            hilo, self._hilo = self._hilo, None
+        self._detener.set()
+        if hilo is not None:
+            hilo.join(espera)
+
+    def estadisticas(self):
+        return {
+            "activa": self._hilo is not None,
+            "intervalo": self.intervalo,
+            "ejecuciones": self.ejecuciones,
+            "errores": self.errores,
+        }
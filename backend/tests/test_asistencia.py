@@ -0,0 +1,143 @@
+"""
+Pruebas de la cola de asistencias, con conexiones falsas. Desde backend/:
+    python -m unittest discover -s tests
+"""
+import threading
+import time
+import unittest
+
+from asistencia import ColaAsistencias
+
+
+class BaseFalsa:
+    """
+    get_connection() falso. Guarda los parámetros de cada UPDATE de
+    asistencias confirmado y falla las primeras `fallas` conexiones.
+    """
+
+    def __init__(self, fallas=0):
+        self.fallas = fallas
+        self.updates = []
+        self.sentencias = []
+        self.escrito = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if self.fallas:
+                self.fallas -= 1
+                raise ConnectionError("sin base")
+        return ConexionFalsa(self)
+
+    def registros(self):
+        with self._lock:
+            return [tuple(p[i:i + 2]) for p in self.updates for i in range(0, len(p), 2)]
+
+
+class ConexionFalsa:
+    def __init__(self, base):
+        self.base = base
+        self.pendiente = None
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.base.sentencias.append(' '.join(sql.split()[:3]))
+        if sql.lstrip().startswith('UPDATE reserva_participante'):
+            self.pendiente = list(params)
+            self.rowcount = len(params) // 2
+
+    def commit(self):
+        if self.pendiente is not None:
+            with self.base._lock:
+                self.base.updates.append(self.pendiente)
+            self.base.escrito.set()
+
+    def close(self):
+        pass
+
+
+class ColaAsistenciasTest(unittest.TestCase):
+
+    def test_unifica_repetidos_en_un_solo_update(self):
+        base = BaseFalsa()
+        cola = ColaAsistencias(base, intervalo_ms=60000)
+        cola.encolar([(1, '111'), (1, '111'), (2, '222')])
+        cola.iniciar()
+        cola.detener()
+        self.assertEqual(len(base.updates), 1)
+        self.assertEqual(sorted(base.registros()), [(1, '111'), (2, '222')])
+        stats = cola.estadisticas()
+        self.assertEqual((stats["recibidos"], stats["escritos"], stats["pendientes"]), (3, 2, 0))
+
+    def test_actualiza_el_resumen_por_rol_en_la_misma_transaccion(self):
+        base = BaseFalsa()
+        cola = ColaAsistencias(base, intervalo_ms=60000)
+        cola.encolar([(1, '111')])
+        cola.iniciar()
+        cola.detener()
+        self.assertEqual(base.sentencias, [
+            'INSERT INTO resumen_reserva_rol',
+            'UPDATE reserva_participante rp',
+            'INSERT INTO resumen_reserva_rol',
+        ])
+
+    def test_escribe_al_juntar_max_filas_sin_esperar_el_intervalo(self):
+        base = BaseFalsa()
+        cola = ColaAsistencias(base, intervalo_ms=60000, max_filas=2)
+        cola.iniciar()
+        cola.encolar([(1, '111'), (2, '222')])
+        self.assertTrue(base.escrito.wait(2))
+        cola.detener()
+
+    def test_reintenta_despues_de_un_error(self):
+        base = BaseFalsa(fallas=2)
+        cola = ColaAsistencias(base, intervalo_ms=10)
+        with self.assertLogs('asistencia', 'ERROR'):
+            cola.iniciar()
+            cola.encolar([(1, '111')])
+            self.assertTrue(base.escrito.wait(2))
+            cola.detener()
+        self.assertEqual(base.registros(), [(1, '111')])
+        self.assertEqual(cola.estadisticas()["errores"], 2)
+
+    def test_detener_escribe_lo_pendiente(self):
+        base = BaseFalsa()
+        cola = ColaAsistencias(base, intervalo_ms=60000)
+        cola.iniciar()
+        cola.encolar([(1, '111'), (2, '222')])
+        inicio = time.monotonic()
+        cola.detener()
+        self.assertLess(time.monotonic() - inicio, 5)
+        self.assertEqual(sorted(base.registros()), [(1, '111'), (2, '222')])
+        self.assertFalse(cola.encolar([(3, '333')]))
+
+    def test_detener_sin_base_descarta_y_termina(self):
+        base = BaseFalsa(fallas=1)
+        cola = ColaAsistencias(base, intervalo_ms=60000)
+        with self.assertLogs('asistencia', 'ERROR') as logs:
+            cola.iniciar()
+            cola.encolar([(1, '111')])
+            cola.detener()
+        self.assertIn('Se descartan 1 asistencias', logs.output[-1])
+        self.assertEqual(base.updates, [])
+        self.assertEqual(cola.estadisticas()["pendientes"], 0)
+
+    def test_rechaza_si_la_cola_esta_llena(self):
+        cola = ColaAsistencias(BaseFalsa(), max_pendientes=2)
+        self.assertTrue(cola.encolar([(1, '111')]))
+        self.assertFalse(cola.encolar([(2, '222'), (3, '333')]))
+        stats = cola.estadisticas()
+        self.assertEqual((stats["rechazados"], stats["pendientes"]), (2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
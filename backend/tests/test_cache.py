@@ -0,0 +1,184 @@
+"""
+Pruebas de los caches en memoria. Desde backend/:
+    python -m unittest discover -s tests
+"""
+import threading
+import time
+import unittest
+
+from cache import CacheGeneracional, CacheTTL
+
+
+class Cargador:
+    """cargar() falso que cuenta sus llamadas y devuelve valor o el número de llamada."""
+
+    def __init__(self, valor=None, antes=None):
+        self.llamadas = 0
+        self.valor = valor
+        self.antes = antes
+
+    def __call__(self):
+        self.llamadas += 1
+        if self.antes is not None:
+            self.antes()
+        return self.valor if self.valor is not None else self.llamadas
+
+
+class CacheTTLTest(unittest.TestCase):
+
+    def test_carga_una_vez_y_despues_acierta(self):
+        cache = CacheTTL(ttl=60)
+        cargar = Cargador('salas')
+        self.assertEqual(cache.obtener_o_cargar('salas', cargar), 'salas')
+        self.assertEqual(cache.obtener_o_cargar('salas', cargar), 'salas')
+        self.assertEqual(cargar.llamadas, 1)
+        stats = cache.estadisticas()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_entrada_vencida_se_vuelve_a_cargar(self):
+        cache = CacheTTL(ttl=0)
+        cargar = Cargador()
+        cache.obtener_o_cargar('turnos', cargar)
+        self.assertEqual(cache.obtener_o_cargar('turnos', cargar), 2)
+        self.assertEqual(cache.estadisticas()["expiradas"], 1)
+
+    def test_desaloja_la_usada_hace_mas_tiempo(self):
+        cache = CacheTTL(ttl=60, max_entradas=2)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.obtener('a')
+        cache.guardar('c', 3)
+        self.assertIsNone(cache.obtener('b'))
+        self.assertEqual((cache.obtener('a'), cache.obtener('c')), (1, 3))
+        self.assertEqual(cache.estadisticas()["desalojadas"], 1)
+
+    def test_invalidar_una_clave_conserva_las_demas(self):
+        cache = CacheTTL(ttl=60)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.invalidar('a')
+        self.assertIsNone(cache.obtener('a'))
+        self.assertEqual(cache.obtener('b'), 2)
+
+    def test_invalidar_sin_claves_vacia_el_cache(self):
+        cache = CacheTTL(ttl=60)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        cache.invalidar()
+        self.assertEqual(cache.estadisticas()["entradas"], 0)
+
+    def test_carga_previa_a_una_invalidacion_no_se_guarda(self):
+        cache = CacheTTL(ttl=60)
+        # La invalidación llega mientras cargar() consulta la base
+        cargar = Cargador('viejo', antes=cache.invalidar)
+        self.assertEqual(cache.obtener_o_cargar('salas', cargar), 'viejo')
+        self.assertIsNone(cache.obtener('salas'))
+        self.assertEqual(cache.obtener_o_cargar('salas', Cargador('nuevo')), 'nuevo')
+        self.assertEqual(cache.obtener('salas'), 'nuevo')
+
+
+class CargaBloqueada:
+    """cargar() que espera a liberar() antes de devolver, para simular una consulta lenta."""
+
+    def __init__(self, valor='reporte', error=None):
+        self.llamadas = 0
+        self.valor = valor
+        self.error = error
+        self.empezo = threading.Event()
+        self._liberar = threading.Event()
+
+    def liberar(self):
+        self._liberar.set()
+
+    def __call__(self):
+        self.llamadas += 1
+        self.empezo.set()
+        self._liberar.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.valor
+
+
+def pedir_en_hilos(cache, clave, cargar, cantidad):
+    """Lanza `cantidad` hilos que piden la clave; devuelve (hilos, resultados)."""
+    resultados = []
+
+    def pedir():
+        try:
+            resultados.append(cache.obtener_o_cargar(clave, cargar))
+        except Exception as e:
+            resultados.append(e)
+
+    hilos = [threading.Thread(target=pedir) for _ in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    return hilos, resultados
+
+
+def esperar_compartidas(cache, cantidad):
+    limite = time.monotonic() + 5
+    while cache.estadisticas()["compartidas"] < cantidad and time.monotonic() < limite:
+        time.sleep(0.005)
+
+
+class CacheGeneracionalTest(unittest.TestCase):
+
+    def test_un_solo_cargar_para_pedidos_simultaneos(self):
+        cache = CacheGeneracional(ttl=60)
+        cargar = CargaBloqueada()
+        hilos, resultados = pedir_en_hilos(cache, 'ocupacion', cargar, 8)
+        esperar_compartidas(cache, 7)
+        cargar.liberar()
+        for hilo in hilos:
+            hilo.join(5)
+        self.assertEqual(cargar.llamadas, 1)
+        self.assertEqual(resultados, ['reporte'] * 8)
+        stats = cache.estadisticas()
+        self.assertEqual((stats["misses"], stats["compartidas"], stats["en_curso"]), (1, 7, 0))
+        self.assertEqual(cache.obtener_o_cargar('ocupacion', Cargador('otro')), 'reporte')
+
+    def test_error_se_entrega_a_todos_y_no_se_guarda(self):
+        cache = CacheGeneracional(ttl=60)
+        cargar = CargaBloqueada(error=RuntimeError('sin base'))
+        hilos, resultados = pedir_en_hilos(cache, 'ocupacion', cargar, 4)
+        esperar_compartidas(cache, 3)
+        cargar.liberar()
+        for hilo in hilos:
+            hilo.join(5)
+        self.assertEqual(cargar.llamadas, 1)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in resultados))
+        self.assertEqual(cache.obtener_o_cargar('ocupacion', Cargador('nuevo')), 'nuevo')
+
+    def test_carga_de_una_generacion_anterior_no_se_guarda(self):
+        cache = CacheGeneracional(ttl=60)
+        vieja = CargaBloqueada('viejo')
+        hilos, resultados = pedir_en_hilos(cache, 'ocupacion', vieja, 1)
+        vieja.empezo.wait(5)
+        # Una escritura mientras se carga: los pedidos nuevos no se suman a
+        # la carga vieja sino que cargan de nuevo
+        cache.nueva_generacion()
+        nueva = Cargador('nuevo')
+        self.assertEqual(cache.obtener_o_cargar('ocupacion', nueva), 'nuevo')
+        vieja.liberar()
+        hilos[0].join(5)
+        self.assertEqual(resultados, ['viejo'])
+        self.assertEqual(cache.obtener_o_cargar('ocupacion', Cargador('otro')), 'nuevo')
+        self.assertEqual(nueva.llamadas, 1)
+
+    def test_nueva_generacion_descarta_las_entradas(self):
+        cache = CacheGeneracional(ttl=60)
+        cache.obtener_o_cargar('a', Cargador('viejo'))
+        cache.nueva_generacion()
+        self.assertEqual(cache.obtener_o_cargar('a', Cargador('nuevo')), 'nuevo')
+        self.assertEqual(cache.estadisticas()["generacion"], 1)
+
+    def test_desaloja_la_usada_hace_mas_tiempo(self):
+        cache = CacheGeneracional(ttl=60, max_entradas=2)
+        for clave in ('a', 'b', 'a', 'c'):
+            cache.obtener_o_cargar(clave, Cargador(clave))
+        self.assertEqual(cache.obtener_o_cargar('b', Cargador('b2')), 'b2')
+        self.assertEqual(cache.estadisticas()["desalojadas"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
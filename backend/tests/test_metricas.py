@@ -0,0 +1,55 @@
+"""
+Pruebas de la normalización de SQL de las métricas. Desde backend/:
+    python -m unittest discover -s tests
+"""
+import unittest
+
+from asistencia import SQL_MARCAR_ASISTENCIA
+from consultas import sql_slots_activos
+from metricas import normalizar_sql
+
+
+def etiquetas(armar, tamanos=(1, 2, 7)):
+    return {normalizar_sql(armar(n)) for n in tamanos}
+
+
+class NormalizarSqlTest(unittest.TestCase):
+
+    def test_lista_in(self):
+        self.assertEqual(
+            etiquetas(lambda n: f"SELECT * FROM reserva WHERE id_reserva IN ({', '.join(['%s'] * n)})"),
+            {'SELECT * FROM reserva WHERE id_reserva IN (?...)'}
+        )
+
+    def test_lista_de_tuplas(self):
+        self.assertEqual(len(etiquetas(sql_slots_activos)), 1)
+        self.assertEqual(
+            len(etiquetas(lambda n: SQL_MARCAR_ASISTENCIA.format(filas=', '.join(['(%s, %s)'] * n)))), 1
+        )
+
+    def test_values_de_varias_filas(self):
+        normalizadas = etiquetas(lambda n: (
+            "INSERT INTO reserva_participante (ci_participante, id_reserva, fecha_solicitud_reserva, asistencia) "
+            "VALUES " + ', '.join(['(%s, %s, NOW(), NULL)'] * n)
+        ))
+        self.assertEqual(normalizadas, {
+            'INSERT INTO reserva_participante (ci_participante, id_reserva, fecha_solicitud_reserva, asistencia) '
+            'VALUES (?...)'
+        })
+
+    def test_values_con_alias(self):
+        self.assertEqual(
+            etiquetas(lambda n: "INSERT INTO participante (ci, nombre) VALUES "
+                                + ', '.join(['(%s, %s)'] * n) + " AS nuevo ON DUPLICATE KEY UPDATE nombre = nuevo.nombre"),
+            {'INSERT INTO participante (ci, nombre) VALUES (?...) AS nuevo ON DUPLICATE KEY UPDATE nombre = nuevo.nombre'}
+        )
+
+    def test_columnas_y_funciones_no_se_colapsan(self):
+        self.assertEqual(
+            normalizar_sql("SELECT ROUND(SUM(x), 2) FROM t WHERE (a, b) IN ((%s, %s)) AND c = 'x'"),
+            'SELECT ROUND(SUM(x), ?) FROM t WHERE (a, b) IN (?...) AND c = ?'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
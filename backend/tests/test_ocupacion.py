@@ -0,0 +1,115 @@
+"""
+Pruebas del índice de ocupación. Desde backend/:
+    python -m unittest discover -s tests
+"""
+import unittest
+from datetime import date
+
+from eventos import evento_reserva
+from ocupacion import IndiceOcupacion
+
+FECHA = date(2025, 3, 5)
+CLAVE = ('S1', 'E1', FECHA)
+TURNO = 3
+
+
+def evento(tipo, id_reserva, estado, estado_anterior=None):
+    return evento_reserva(tipo, id_reserva, 'S1', 'E1', FECHA, TURNO, estado, estado_anterior)
+
+
+class AplicarEventosTest(unittest.TestCase):
+
+    def setUp(self):
+        self.indice = IndiceOcupacion()
+        # B ocupa el slot; A es otra reserva del mismo slot ya cancelada
+        self.indice.aplicar(evento('creada', 'B', 'activa'))
+
+    def test_creada_ocupa_el_slot(self):
+        self.assertEqual(self.indice._bits, {CLAVE: 1 << TURNO})
+
+    def test_eliminar_reserva_cancelada_no_libera_el_slot(self):
+        self.indice.aplicar(evento('eliminada', 'A', 'cancelada', 'cancelada'))
+        self.assertEqual(self.indice._bits, {CLAVE: 1 << TURNO})
+
+    def test_cambio_de_estado_de_reserva_no_activa_no_libera_el_slot(self):
+        self.indice.aplicar(evento('estado', 'A', 'finalizada', 'cancelada'))
+        self.assertEqual(self.indice._bits, {CLAVE: 1 << TURNO})
+
+    def test_cancelar_reserva_activa_libera_el_slot(self):
+        self.indice.aplicar(evento('cancelada', 'B', 'cancelada', 'activa'))
+        self.assertEqual(self.indice._bits, {})
+
+    def test_eliminar_reserva_activa_libera_el_slot(self):
+        self.indice.aplicar(evento('eliminada', 'B', 'activa', 'activa'))
+        self.assertEqual(self.indice._bits, {})
+
+    def test_liberar_un_turno_conserva_los_demas(self):
+        self.indice.aplicar(evento_reserva('creada', 'C', 'S1', 'E1', FECHA, 5, 'activa'))
+        self.indice.aplicar(evento('cancelada', 'B', 'cancelada', 'activa'))
+        self.assertEqual(self.indice._bits, {CLAVE: 1 << 5})
+
+    def test_reactivar_vuelve_a_ocupar(self):
+        self.indice.aplicar(evento('cancelada', 'B', 'cancelada', 'activa'))
+        self.indice.aplicar(evento('estado', 'B', 'activa', 'cancelada'))
+        self.assertEqual(self.indice._bits, {CLAVE: 1 << TURNO})
+
+
+class ConexionFalsa:
+    """Devuelve `filas` para la consulta de ocupación; durante() corre mientras tanto."""
+
+    def __init__(self, filas, durante=None):
+        self.filas = filas
+        self.durante = durante
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if self.durante is not None:
+            self.durante()
+
+    def fetchall(self):
+        return list(self.filas)
+
+    def close(self):
+        pass
+
+
+class RecargaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.indice = IndiceOcupacion()
+        self.hoy = date.today()
+        self.clave = ('S1', 'E1', self.hoy)
+
+    def evento_hoy(self, tipo, id_reserva, estado, estado_anterior=None, turno=TURNO):
+        return evento_reserva(tipo, id_reserva, 'S1', 'E1', self.hoy, turno, estado, estado_anterior)
+
+    def test_recargar_reemplaza_los_bits(self):
+        self.indice.aplicar(self.evento_hoy('creada', 'A', 'activa', turno=5))
+        self.indice.recargar(ConexionFalsa([('S1', 'E1', self.hoy, 1 << TURNO)]))
+        self.assertTrue(self.indice.cargado)
+        self.assertEqual(self.indice._bits, {self.clave: 1 << TURNO})
+
+    def test_reserva_creada_durante_la_recarga_no_se_pierde(self):
+        conn = ConexionFalsa([], durante=lambda: self.indice.aplicar(self.evento_hoy('creada', 'B', 'activa')))
+        self.indice.recargar(conn)
+        self.assertEqual(self.indice._bits, {self.clave: 1 << TURNO})
+
+    def test_cancelacion_durante_la_recarga_no_reaparece(self):
+        # La consulta todavía ve ocupado el slot que se liberó mientras corría
+        conn = ConexionFalsa(
+            [('S1', 'E1', self.hoy, 1 << TURNO)],
+            durante=lambda: self.indice.aplicar(self.evento_hoy('cancelada', 'B', 'cancelada', 'activa'))
+        )
+        self.indice.recargar(conn)
+        self.assertEqual(self.indice._bits, {})
+
+    def test_sin_recarga_en_curso_no_se_anotan_eventos(self):
+        self.indice.recargar(ConexionFalsa([]))
+        self.indice.aplicar(self.evento_hoy('creada', 'B', 'activa'))
+        self.assertIsNone(self.indice._diario)
+
+
+if __name__ == '__main__':
+    unittest.main()
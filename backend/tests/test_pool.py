@@ -0,0 +1,186 @@
+"""
+Pruebas del pool de conexiones, con conexiones falsas en lugar de MySQL.
+Desde backend/:
+    python -m unittest discover -s tests
+"""
+import threading
+import time
+import unittest
+
+import mysql.connector
+
+from database import PoolConexiones, PoolCerradoError, PoolTimeoutError
+
+
+class ConexionFalsa:
+    def __init__(self):
+        self.cerrada = False
+        self.caida = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def ping(self, reconnect=False):
+        if self.caida:
+            raise mysql.connector.errors.OperationalError("sin conexión")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def is_connected(self):
+        return not self.caida
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolFalso(PoolConexiones):
+    """PoolConexiones que crea ConexionFalsa y las guarda en creadas."""
+
+    def __init__(self, **opciones):
+        super().__init__({}, **opciones)
+        self.creadas = []
+
+    def _crear(self):
+        raw = ConexionFalsa()
+        self.creadas.append(raw)
+        with self._cond:
+            self._stats["creadas"] += 1
+        return raw, time.monotonic()
+
+
+def devolver_despues(conexion, segundos):
+    hilo = threading.Timer(segundos, conexion.close)
+    hilo.start()
+    return hilo
+
+
+class PrestamoTest(unittest.TestCase):
+
+    def test_reutiliza_la_conexion_devuelta(self):
+        pool = PoolFalso(size=1, max_overflow=0)
+        with pool.obtener():
+            pass
+        with pool.obtener():
+            pass
+        self.assertEqual(len(pool.creadas), 1)
+        self.assertEqual(pool.estadisticas()["prestamos"], 2)
+
+    def test_devolver_revierte_la_transaccion_abierta(self):
+        pool = PoolFalso(size=1, max_overflow=0)
+        conexion = pool.obtener()
+        pool.creadas[0].in_transaction = True
+        conexion.close()
+        self.assertEqual(pool.creadas[0].rollbacks, 1)
+
+    def test_timeout_sin_conexiones_libres(self):
+        pool = PoolFalso(size=1, max_overflow=0, timeout=0.05)
+        pool.obtener()
+        with self.assertRaises(PoolTimeoutError):
+            pool.obtener()
+        self.assertEqual(pool.estadisticas()["timeouts"], 1)
+
+    def test_espera_a_que_se_devuelva_una_conexion(self):
+        pool = PoolFalso(size=1, max_overflow=0, timeout=2)
+        hilo = devolver_despues(pool.obtener(), 0.05)
+        pool.obtener().close()
+        hilo.join()
+        stats = pool.estadisticas()
+        self.assertEqual(stats["esperas"], 1)
+        self.assertGreater(stats["tiempo_espera_max"], 0)
+        self.assertEqual(len(pool.creadas), 1)
+
+
+class DesbordeTest(unittest.TestCase):
+
+    def test_abre_hasta_size_mas_max_overflow(self):
+        pool = PoolFalso(size=1, max_overflow=2, timeout=0.05)
+        prestadas = [pool.obtener() for _ in range(3)]
+        with self.assertRaises(PoolTimeoutError):
+            pool.obtener()
+        for conexion in prestadas:
+            conexion.close()
+
+    def test_cierra_las_de_desborde_al_devolverse(self):
+        pool = PoolFalso(size=1, max_overflow=2)
+        prestadas = [pool.obtener() for _ in range(3)]
+        for conexion in prestadas:
+            conexion.close()
+        stats = pool.estadisticas()
+        self.assertEqual((stats["abiertas"], stats["libres"]), (1, 1))
+        self.assertEqual([raw.cerrada for raw in pool.creadas], [False, True, True])
+
+
+class ReciclajeTest(unittest.TestCase):
+
+    def test_recicla_la_conexion_vieja(self):
+        pool = PoolFalso(size=1, max_overflow=0, recycle=0)
+        pool.obtener().close()
+        time.sleep(0.01)
+        pool.obtener().close()
+        self.assertEqual(len(pool.creadas), 2)
+        self.assertTrue(pool.creadas[0].cerrada)
+        self.assertEqual(pool.estadisticas()["recicladas"], 1)
+
+    def test_descarta_la_conexion_que_no_responde(self):
+        pool = PoolFalso(size=1, max_overflow=0)
+        pool.obtener().close()
+        pool.creadas[0].caida = True
+        pool.obtener().close()
+        self.assertEqual(len(pool.creadas), 2)
+        self.assertEqual(pool.estadisticas()["descartadas"], 1)
+
+
+class CierreTest(unittest.TestCase):
+
+    def test_no_presta_despues_de_cerrar(self):
+        pool = PoolFalso(size=1, max_overflow=0)
+        pool.obtener().close()
+        pool.cerrar()
+        self.assertTrue(pool.creadas[0].cerrada)
+        with self.assertRaises(PoolCerradoError):
+            pool.obtener()
+
+    def test_despierta_a_quien_espera_una_conexion(self):
+        pool = PoolFalso(size=1, max_overflow=0, timeout=5)
+        prestada = pool.obtener()
+        errores = []
+
+        def pedir():
+            try:
+                pool.obtener()
+            except PoolCerradoError as e:
+                errores.append(e)
+
+        hilo = threading.Thread(target=pedir)
+        hilo.start()
+        time.sleep(0.05)
+        pool.cerrar()
+        hilo.join(1)
+        self.assertEqual(len(errores), 1)
+        prestada.close()
+
+    def test_espera_las_prestadas_y_cierra_al_devolver(self):
+        pool = PoolFalso(size=2, max_overflow=0)
+        libre = pool.obtener()
+        prestada = pool.obtener()
+        libre.close()
+        hilo = devolver_despues(prestada, 0.05)
+        pool.cerrar(espera=2)
+        hilo.join()
+        stats = pool.estadisticas()
+        self.assertEqual((stats["prestadas"], stats["abiertas"], stats["libres"]), (0, 0, 0))
+        self.assertTrue(all(raw.cerrada for raw in pool.creadas))
+
+    def test_devuelta_tras_el_cierre_se_cierra(self):
+        pool = PoolFalso(size=1, max_overflow=0)
+        prestada = pool.obtener()
+        pool.cerrar(espera=0)
+        self.assertFalse(pool.creadas[0].cerrada)
+        prestada.close()
+        self.assertTrue(pool.creadas[0].cerrada)
+        self.assertEqual(pool.estadisticas()["abiertas"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
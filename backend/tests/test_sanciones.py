@@ -0,0 +1,94 @@
+"""
+Pruebas del índice de sanciones, con una conexión falsa. Desde backend/:
+    python -m unittest discover -s tests
+"""
+import unittest
+from datetime import date, timedelta
+
+from sanciones import IndiceSanciones
+
+HOY = date.today()
+SEMANA = timedelta(days=7)
+
+
+class ConexionFalsa:
+    """
+    Conexión que devuelve `filas` para la consulta de sanciones. durante() se
+    ejecuta mientras corre la consulta, para simular cambios concurrentes.
+    """
+
+    def __init__(self, filas, durante=None, error=None):
+        self.filas = filas
+        self.durante = durante
+        self.error = error
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        if self.durante is not None:
+            self.durante()
+        if self.error is not None:
+            raise self.error
+
+    def fetchall(self):
+        return list(self.filas)
+
+    def close(self):
+        pass
+
+
+class IndiceSancionesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.indice = IndiceSanciones()
+
+    def test_recargar_carga_las_sanciones_por_ci(self):
+        self.indice.recargar(ConexionFalsa([(1, '111', HOY, HOY + SEMANA)]))
+        self.assertTrue(self.indice.cargado)
+        self.assertEqual(self.indice.vigente('111'), (HOY, HOY + SEMANA))
+        self.assertIsNone(self.indice.vigente('222'))
+
+    def test_sancion_futura_solo_bloquea_sus_fechas(self):
+        inicio, fin = HOY + SEMANA, HOY + 2 * SEMANA
+        self.indice.recargar(ConexionFalsa([(1, '111', inicio, fin)]))
+        self.assertIsNone(self.indice.vigente('111'))
+        self.assertIsNone(self.indice.vigente('111', HOY + timedelta(days=1)))
+        self.assertEqual(self.indice.vigente('111', fin), (inicio, fin))
+
+    def test_alta_durante_la_recarga_no_se_pierde(self):
+        # La consulta no ve la sanción 2, creada mientras corría
+        conn = ConexionFalsa(
+            [(1, '111', HOY, HOY + SEMANA)],
+            durante=lambda: self.indice.agregar(2, '222', HOY, HOY + SEMANA)
+        )
+        self.indice.recargar(conn)
+        self.assertIsNotNone(self.indice.vigente('111'))
+        self.assertIsNotNone(self.indice.vigente('222'))
+
+    def test_baja_durante_la_recarga_no_reaparece(self):
+        # La consulta todavía ve la sanción 1, eliminada mientras corría
+        self.indice.agregar(1, '111', HOY, HOY + SEMANA)
+        conn = ConexionFalsa([(1, '111', HOY, HOY + SEMANA)], durante=lambda: self.indice.quitar(1))
+        self.indice.recargar(conn)
+        self.assertIsNone(self.indice.vigente('111'))
+        self.assertEqual(self.indice.estadisticas()["participantes"], 0)
+
+    def test_recarga_fallida_conserva_el_indice(self):
+        self.indice.recargar(ConexionFalsa([(1, '111', HOY, HOY + SEMANA)]))
+        with self.assertRaises(RuntimeError):
+            self.indice.recargar(ConexionFalsa([], error=RuntimeError('sin base')))
+        self.assertIsNotNone(self.indice.vigente('111'))
+        # Sin recarga en curso los cambios ya no se anotan en el diario
+        self.indice.agregar(2, '222', HOY, HOY)
+        self.assertIsNone(self.indice._diario)
+
+    def test_la_recarga_reemplaza_lo_anterior(self):
+        self.indice.agregar(1, '111', HOY, HOY + SEMANA)
+        self.indice.recargar(ConexionFalsa([(2, '222', HOY, HOY + SEMANA)]))
+        self.assertIsNone(self.indice.vigente('111'))
+        self.assertIsNotNone(self.indice.vigente('222'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Punto de entrada para servidores WSGI de producción.
+
+Con gunicorn (Linux/macOS), varios procesos con varios hilos cada uno; la
+configuración, incluido el tamaño del pool por worker, está en gunicorn.conf.py:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Con waitress (cualquier sistema operativo), un proceso con WEB_THREADS hilos
+y un pool de conexiones permanentes del mismo tamaño:
+    python wsgi.py
+"""
+import os
+import signal
+
+from app import create_app, apagar
+
+
+def servir_con_waitress():
+    from waitress import serve
+
+    hilos = int(os.getenv('WEB_THREADS', '8'))
+    espera = float(os.getenv('GRACEFUL_TIMEOUT', '30'))
+    # Una conexión permanente por hilo; el desborde sigue DB_POOL_MAX_OVERFLOW
+    app = create_app(pool_size=hilos, hilos=hilos)
+
+    # waitress termina con KeyboardInterrupt; SIGTERM se trata igual para
+    # poder cerrar el pool de forma ordenada
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        serve(app, host='0.0.0.0', port=int(os.getenv('PORT', '5000')), threads=hilos)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        apagar(espera)
+
+
+if __name__ == '__main__':
+    servir_con_waitress()
+else:
+    # gunicorn importa wsgi:app una vez en cada worker, después del fork
+    app = create_app()